@@ -0,0 +1,176 @@
+"""handler แบบ async สำหรับ endpoint อ่านข้อมูลที่ถูกเรียกบ่อย
+
+เปิดด้วย GAP_DB_ASYNC=1 → main.py เรียก install() หลังประกาศ route ทั้งหมด
+route sync ที่ path/method ตรงกันถูกแทนที่ (ตำแหน่งเดิม) ด้วย handler ในไฟล์นี้ (ไม่ต้องผ่าน threadpool)
+มีแต่ endpoint อ่าน — endpoint เขียนทั้งหมดยังเป็น sync
+ใช้ aiosqlite สำหรับ SQLite และ asyncpg เมื่อ GAP_DB_URL เป็น Postgres
+"""
+from typing import List, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request, Response
+from fastapi.routing import APIRoute
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import fastjson
+import httpcache
+import workqueue
+from data import get_async_engine
+from evaluation import evaluate_user, get_summary
+from model import (
+    PersonalDB, PersonalBasic, FarmDB, FarmOut, DurianDB, DurianOut,
+    ActivityLevel, ActivityOut, AssessmentCategoryOut, AnswerDB,
+    GAPRequestDB, GAPRequestOut, InspectionDB, InspectionOut, CertificationDB, CertificationOut,
+    Page,
+)
+from paging import PAGE_LIMIT, PAGE_LIMIT_MAX, columns, keyset_result, keyset_stmt
+from querybudget import budget
+from rubric import ANSWER_STATUS_COLUMNS, get_rubric, with_status
+
+
+router = APIRouter()
+
+
+def install(app: FastAPI) -> None:
+    """แทน route sync ด้วย handler async ของ path/method เดียวกัน — แต่ละ path มี handler เดียว (operation id ไม่ซ้ำ)"""
+    async_routes = {(r.path, m): r for r in router.routes for m in r.methods}
+    replaced = set()
+    for i, route in enumerate(app.router.routes):
+        if isinstance(route, APIRoute):
+            keys = [(route.path, m) for m in route.methods]
+            if all(k in async_routes for k in keys):
+                app.router.routes[i] = async_routes[keys[0]]
+                replaced.update(keys)
+    missing = async_routes.keys() - replaced
+    if missing:
+        raise RuntimeError(f"async routes without a sync counterpart: {sorted(missing)}")
+
+
+def _session() -> AsyncSession:
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+async def _page(session: AsyncSession, stmt, key, limit: int, after: Optional[int], descending: bool = False):
+    rows = (await session.exec(keyset_stmt(stmt, key, limit, after, descending))).all()
+    return fastjson.respond(keyset_result(rows, key, limit))
+
+
+async def _ensure_user(session: AsyncSession, user_id):
+    if await session.get(PersonalDB, user_id) is None:
+        raise HTTPException(404, "User not found")
+
+
+# ---------------- Users / Farms / Durians ----------------
+@router.get("/personals", response_model=Page[PersonalBasic], tags=["Users"])
+@budget(1)
+async def list_person_basic(limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        stmt = select(*columns(PersonalDB, PersonalBasic))
+        return await _page(session, stmt, PersonalDB.user_id, limit, after)
+
+
+@router.get("/farms/by-user/{user_id}", response_model=Page[FarmOut], tags=["Farms"])
+@budget(1)
+async def list_farms_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        stmt = select(*columns(FarmDB, FarmOut)).where(FarmDB.user_id == user_id)
+        return await _page(session, stmt, FarmDB.farm_id, limit, after)
+
+
+@router.get("/durians/by-user/{user_id}", response_model=Page[DurianOut], tags=["Durians"])
+@budget(1)
+async def list_durians_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        stmt = select(*columns(DurianDB, DurianOut)).where(DurianDB.user_id == user_id)
+        return await _page(session, stmt, DurianDB.durian_id, limit, after)
+
+
+# ---------------- Assessment ----------------
+# rubric / evaluation เป็นโค้ด sync ร่วมกับ main.py → เรียกผ่าน run_sync
+# (IO ยังวิ่งผ่าน driver async ไม่บล็อก event loop)
+@router.get("/categories", response_model=List[AssessmentCategoryOut], tags=["Assess"])
+@budget(4)
+async def list_categories(request: Request, response: Response):
+    async with _session() as session:
+        rubric = await session.run_sync(get_rubric)
+    headers = httpcache.master_headers(rubric)
+    if httpcache.is_fresh(request, headers):
+        return httpcache.not_modified(headers)
+    response.headers.update(headers)
+    return fastjson.respond([c._asdict() for c in rubric.categories], response)
+
+
+@router.get("/activities", response_model=List[ActivityOut], tags=["Assess"])
+@budget(4)
+async def list_activities(request: Request, response: Response,
+                          categoryapp_id: Optional[int] = None, activity_type: Optional[ActivityLevel] = None):
+    async with _session() as session:
+        rubric = await session.run_sync(get_rubric)
+    headers = httpcache.master_headers(rubric)
+    if httpcache.is_fresh(request, headers):
+        return httpcache.not_modified(headers)
+    response.headers.update(headers)
+    return fastjson.respond([
+        a._asdict() for a in rubric.activities
+        if (categoryapp_id is None or a.categoryapp_id == categoryapp_id)
+        and (activity_type is None or a.activity_type == activity_type)
+    ], response)
+
+
+@router.get("/activities/with-status", response_model=List[dict], tags=["Assess"])
+@budget(5)
+async def activities_with_status(request: Request, response: Response, user_id: int):
+    async with _session() as session:
+        rubric = await session.run_sync(get_rubric)
+        summary = await session.run_sync(get_summary, user_id)
+        headers = httpcache.user_headers(rubric, user_id, summary)
+        if httpcache.is_fresh(request, headers):
+            return httpcache.not_modified(headers)
+        response.headers.update(headers)
+        answers = (await session.exec(select(*ANSWER_STATUS_COLUMNS).where(AnswerDB.user_id == user_id))).all()
+        return fastjson.respond(with_status(rubric, answers), response)
+
+
+@router.get("/assessment/evaluate", tags=["Assess"])
+@budget(5)
+async def evaluate(request: Request, response: Response, user_id: int):
+    async with _session() as session:
+        rubric = await session.run_sync(get_rubric)
+        if not rubric.activities: raise HTTPException(400, "No activities configured")
+        summary = await session.run_sync(get_summary, user_id)  # ถือไว้ใน identity map ให้ evaluate_user ใช้ต่อ
+        headers = httpcache.user_headers(rubric, user_id, summary)
+        if httpcache.is_fresh(request, headers):
+            return httpcache.not_modified(headers)
+        response.headers.update(headers)
+        return await session.run_sync(evaluate_user, user_id)
+
+
+# ---------------- GAP lifecycle (read) ----------------
+@router.get("/inspections/queue", response_model=Page[GAPRequestOut], tags=["GAP/Inspector"])
+@budget(1)
+async def inspection_queue(limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        rows = (await session.exec(workqueue.queue_stmt(limit, after, workqueue.now()))).all()
+        return fastjson.respond(keyset_result(rows, GAPRequestDB.request_id, limit))
+
+
+@router.get("/inspections/by-request/{request_id}", response_model=Page[InspectionOut], tags=["GAP/Admin"])
+@budget(1)
+async def list_inspections_by_request(request_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        stmt = select(*columns(InspectionDB, InspectionOut)).where(InspectionDB.request_id == request_id)
+        return await _page(session, stmt, InspectionDB.inspector_id, limit, after, descending=True)
+
+
+@router.get("/certifications/by-user/{user_id}", response_model=Page[CertificationOut], tags=["GAP/User"])
+@budget(2)
+async def list_certs_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    async with _session() as session:
+        await _ensure_user(session, user_id)
+        stmt = (
+            select(*columns(CertificationDB, CertificationOut))
+            .join(GAPRequestDB, GAPRequestDB.request_id == CertificationDB.request_id)
+            .join(FarmDB, FarmDB.farm_id == GAPRequestDB.farm_id)
+            .where(FarmDB.user_id == user_id)
+        )
+        return await _page(session, stmt, CertificationDB.cert_id, limit, after)
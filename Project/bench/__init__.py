@@ -0,0 +1 @@
+"""benchmark / load test ของ API รันจากโฟลเดอร์ Project เช่น  python -m bench.async_throughput"""
@@ -0,0 +1,89 @@
+"""เทียบ throughput ของ endpoint อ่านข้อมูล โหมด sync (threadpool) กับ async (GAP_DB_ASYNC=1)
+
+    python -m bench.async_throughput --clients 50,200,1000 --requests 20
+
+แต่ละโหมดรันใน subprocess แยก (engine ถูกสร้างตอน import) บน SQLite ชั่วคราว
+ยิงผ่าน ASGI ในโปรเซส ไม่ใช้ network
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench.common import PERSON, asgi_client, summarize, temp_db_url
+
+
+async def _prepare(client, users: int):
+    await client.post("/seed/master")
+    acts = (await client.get("/activities")).json()
+    for _ in range(users):
+        uid = (await client.post("/personals", json=PERSON)).json()["user_id"]
+        await client.post("/farms", json={"user_id": uid, "location": "bench"})
+        await client.post("/answers/bulk", json={"user_id": uid, "items": [
+            {"activity_id": a["activity_id"], "answer_text": "ok", "result_each": 1} for a in acts
+        ]})
+
+
+async def _run_level(client, clients: int, per_client: int, users: int) -> dict:
+    paths = [
+        "/assessment/evaluate?user_id={u}", "/activities/with-status?user_id={u}",
+        "/farms/by-user/{u}", "/categories", "/personals?limit=50",
+    ]
+    lat = []
+
+    async def worker(n: int):
+        for i in range(per_client):
+            u = (n + i) % users + 1
+            t0 = time.perf_counter()
+            r = await client.get(paths[(n + i) % len(paths)].format(u=u))
+            lat.append(time.perf_counter() - t0)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    elapsed = time.perf_counter() - t0
+    return {"clients": clients, "rps": round(len(lat) / elapsed, 1), **summarize(lat)}
+
+
+async def _child(levels, per_client: int, users: int):
+    import main
+    async with asgi_client(main.app) as client:
+        await _prepare(client, users)
+        for c in levels:
+            print(json.dumps(await _run_level(client, c, per_client, users)), flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", default="50,200,1000")
+    ap.add_argument("--requests", type=int, default=20, help="requests per client")
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--child", action="store_true")
+    args = ap.parse_args()
+    levels = [int(x) for x in args.clients.split(",")]
+
+    if args.child:
+        asyncio.run(_child(levels, args.requests, args.users))
+        return
+
+    results = {}
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        env = dict(os.environ, GAP_DB_URL=temp_db_url(f"gap_{mode}_"), GAP_DB_ASYNC=flag)
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.async_throughput", "--child", "--clients", args.clients,
+             "--requests", str(args.requests), "--users", str(args.users)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        results[mode] = {r["clients"]: r for r in map(json.loads, out.splitlines())}
+
+    print(f"{'clients':>8} {'sync rps':>10} {'async rps':>10} {'sync p95':>10} {'async p95':>10}")
+    for c in levels:
+        s, a = results["sync"][c], results["async"][c]
+        print(f"{c:>8} {s['rps']:>10} {a['rps']:>10} {s['p95_ms']:>10} {a['p95_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
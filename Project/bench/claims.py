@@ -0,0 +1,94 @@
+"""ผู้ตรวจหลายคนรับงานจากคิวพร้อมกัน (POST /inspections/queue/claim) จนคิวหมด
+
+    python -m bench.claims --inspectors 50,500,2000 --depth 20000
+
+ผู้ตรวจแต่ละคน claim ซ้ำจนได้ [] (แถวที่ถูก claim มี lease อยู่ จึงไม่ถูกแจกอีก)
+--ack: PATCH สถานะเป็น อยู่ระหว่างตรวจ หลัง claim ทุกครั้งด้วย (เขียนเพิ่มอีกหนึ่ง transaction ต่องาน)
+ตรวจว่าไม่มีคำขอใดถูกรับซ้ำและไม่ตกหล่น แล้วรายงาน claim/s และ latency ของ claim
+รอบละ DB ชั่วคราวใหม่ (SQLite) หรือ GAP_DB_URL ที่ตั้งไว้ ยิงผ่าน ASGI ในโปรเซส
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from bench.common import asgi_client, summarize, temp_db_url
+
+
+def _fill(depth: int) -> None:
+    from sqlalchemy import insert
+    from data import engine
+    from model import GAPRequestDB, GapStatus
+
+    start = date(2025, 1, 1)
+    rows = [{"farm_id": n + 1, "request_date": start + timedelta(days=n % 365),
+             "timeline_status": GapStatus.Pending.value} for n in range(depth)]
+    with engine.begin() as conn:
+        conn.execute(insert(GAPRequestDB), rows)
+
+
+async def _child(inspectors: int, depth: int, batch: int, ack: bool) -> dict:
+    import main
+    _fill(depth)
+    claimed = Counter()
+    lat = []
+
+    async def inspector(n: int):
+        async with asgi_client(main.app) as client:
+            while True:
+                t0 = time.perf_counter()
+                r = await client.post("/inspections/queue/claim", params={"inspector": f"i{n}", "limit": batch})
+                lat.append(time.perf_counter() - t0)
+                r.raise_for_status()
+                if not r.json():
+                    return
+                for item in r.json():
+                    claimed[item["request_id"]] += 1
+                    if ack:
+                        (await client.patch(f"/gap-requests/status/{item['request_id']}",
+                                            params={"timeline_status": "อยู่ระหว่างตรวจ"})).raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(inspector(n) for n in range(inspectors)))
+    elapsed = time.perf_counter() - t0
+    return {
+        "inspectors": inspectors, "claimed": len(claimed),
+        "duplicates": sum(1 for c in claimed.values() if c > 1), "missing": depth - len(claimed),
+        "claims_per_s": round(len(claimed) / elapsed, 1), **summarize(lat),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--inspectors", default="50,500,2000")
+    ap.add_argument("--depth", type=int, default=20000, help="จำนวนคำขอในคิวตอนเริ่ม")
+    ap.add_argument("--batch", type=int, default=1, help="limit ต่อการ claim")
+    ap.add_argument("--ack", action="store_true")
+    ap.add_argument("--child", type=int)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child, args.depth, args.batch, args.ack))))
+        return
+
+    print(f"{'inspectors':>10} {'claimed':>8} {'dup':>5} {'missing':>8} {'claims/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for n in (int(x) for x in args.inspectors.split(",")):
+        env = dict(os.environ)
+        env.setdefault("GAP_DB_URL", temp_db_url("gap_claims_"))
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.claims", "--child", str(n), "--depth", str(args.depth),
+             "--batch", str(args.batch), *(["--ack"] if args.ack else [])],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(out.splitlines()[-1])
+        print(f"{r['inspectors']:>10} {r['claimed']:>8} {r['duplicates']:>5} {r['missing']:>8} {r['claims_per_s']:>9} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""ตัวช่วยร่วมของ benchmark: DB ชั่วคราว, client ในโปรเซส, สถิติ latency"""
+import math
+import os
+import tempfile
+
+
+def temp_db_url(prefix: str = "gapbench") -> str:
+    # ต้องตั้ง GAP_DB_URL ก่อน import data/main (engine ถูกสร้างตอน import)
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    return f"sqlite:///{path}"
+
+
+def use_temp_db(prefix: str = "gapbench") -> str:
+    url = os.environ.get("GAP_DB_URL") or temp_db_url(prefix)
+    os.environ["GAP_DB_URL"] = url
+    return url
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = max(0, min(len(xs) - 1, math.ceil(p / 100 * len(xs)) - 1))
+    return xs[k]
+
+
+def summarize(latencies_s) -> dict:
+    ms = [x * 1000 for x in latencies_s]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def asgi_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+PERSON = {
+    "name": "ทดสอบ", "surname": "โหลด", "phone_number": "0800000000", "user_type": "Individual",
+    "idcard_file": "uploads/idcard.jpg", "birth": "1980-01-01", "religion": "พุทธ",
+    "id_number": "0000000000000", "village_name": "บ้านทดสอบ", "house_number": "1", "road": "-",
+    "alley": "-", "province": "จันทบุรี", "district": "เมือง", "subdistrict": "ตลาด",
+}
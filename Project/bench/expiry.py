@@ -0,0 +1,115 @@
+"""ตัวสแกนเกียรติบัตรใกล้หมดอายุ (expiry.scan) บนเกียรติบัตรจำนวนมาก
+
+    python -m bench.expiry --certs 1000000
+
+สร้างเกียรติบัตรสังเคราะห์ (วันหมดอายุกระจาย 4 ปีรอบวันนี้) แล้วสแกนสองแบบ:
+chunk ตาม GAP_EXPIRY_CHUNK กับ chunk เดียวทั้งช่วง (INSERT ... SELECT ก้อนเดียวต่อแถบ)
+ระหว่างสแกนมีอีก thread เขียนแถวเล็ก ๆ ทุก 5 ms → latency ของ writer นั้นคือเวลาที่ถูก write lock ของตัวสแกนกั้นไว้
+แต่ละแบบใช้สำเนา DB เดียวกัน (outbox ว่าง) รอบสองของแบบ chunk = สแกนซ้ำ (ต้องไม่เพิ่มแถว)
+"""
+import argparse
+import os
+import random
+import shutil
+import threading
+import time
+from datetime import date, timedelta
+
+from bench.common import summarize, temp_db_url
+
+
+def _fill(engine, certs: int, farms: int, seed: int = 42) -> None:
+    from sqlalchemy import insert
+    from bench.common import PERSON
+    from model import CertificationDB, FarmDB, PersonalDB
+
+    rnd = random.Random(seed)
+    today = date.today()
+    people = max(1, farms // 3)
+    with engine.begin() as conn:
+        conn.execute(insert(PersonalDB), [
+            {**PERSON, "birth": date(1980, 1, 1), "id_number": f"{n:013d}"} for n in range(people)])
+        conn.execute(insert(FarmDB), [
+            {"user_id": n % people + 1, "location": f"bench-{n}"} for n in range(farms)])
+    batch = 50000
+    for start in range(0, certs, batch):
+        rows = []
+        for n in range(start, min(certs, start + batch)):
+            expire = today + timedelta(days=rnd.randint(-730, 730))
+            rows.append({"request_id": n + 1, "farm_id": rnd.randint(1, farms), "cert_file": "c",
+                         "issue_date": expire - timedelta(days=1095), "expire_date": expire})
+        with engine.begin() as conn:
+            conn.execute(insert(CertificationDB), rows)
+
+
+def _scan_with_writer(url: str, chunk: int) -> dict:
+    from sqlalchemy import text
+    import expiry
+    from data import EngineProfile, make_engine
+
+    engine = make_engine(EngineProfile.from_env({"GAP_DB_URL": url}))
+    writer = make_engine(EngineProfile.from_env({"GAP_DB_URL": url, "GAP_DB_BUSY_TIMEOUT_MS": "60000"}))
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS bench_writes (id INTEGER PRIMARY KEY, at REAL)"))
+    stop = threading.Event()
+    lat = []
+
+    def write_loop():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            with writer.begin() as conn:
+                conn.execute(text("INSERT INTO bench_writes (at) VALUES (:t)"), {"t": t0})
+            lat.append(time.perf_counter() - t0)
+            time.sleep(0.005)
+
+    th = threading.Thread(target=write_loop)
+    th.start()
+    try:
+        res = expiry.scan(engine, chunk=chunk)
+    finally:
+        stop.set()
+        th.join()
+        engine.dispose()
+        writer.dispose()
+    res["writer"] = summarize(lat)
+    res["writer"]["max_ms"] = round(max(lat) * 1000, 3) if lat else 0.0
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--certs", type=int, default=1000000)
+    ap.add_argument("--farms", type=int, default=100000)
+    ap.add_argument("--chunk", type=int, default=2000)
+    args = ap.parse_args()
+
+    url = temp_db_url("gap_expiry_")
+    os.environ["GAP_DB_URL"] = url
+    os.environ.setdefault("GAP_DB_SYNCHRONOUS", "OFF")
+    os.environ["GAP_EXPIRY_SCAN_INTERVAL"] = "0"
+    from data import engine, init_db
+    init_db()
+    t0 = time.perf_counter()
+    _fill(engine, args.certs, args.farms)
+    engine.dispose()
+    print(f"{args.certs} certificates in {time.perf_counter() - t0:.1f}s")
+
+    path = url[len("sqlite:///"):]
+    runs = [("chunked", args.chunk, True), ("one chunk", args.certs, False)]
+    print(f"{'mode':<12}{'pass':>6}{'matched':>9}{'queued':>9}{'chunks':>8}{'scan s':>8}"
+          f"{'writer p50':>12}{'p99':>9}{'max ms':>9}")
+    for name, chunk, rescan in runs:
+        copy = f"{path}.{name.replace(' ', '_')}"
+        shutil.copyfile(path, copy)
+        for n in range(2 if rescan else 1):
+            res = _scan_with_writer(f"sqlite:///{copy}", chunk)
+            w = res["windows"].values()
+            print(f"{name:<12}{n + 1:>6}{sum(x['matched'] for x in w):>9}{sum(x['queued'] for x in w):>9}"
+                  f"{sum(x['chunks'] for x in w):>8}{res['seconds']:>8}{res['writer']['p50_ms']:>12}"
+                  f"{res['writer']['p99_ms']:>9}{res['writer']['max_ms']:>9}")
+        os.unlink(copy)
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""join ผ่าน user_id: schema เดิม (VARCHAR + CAST ตอน join) กับ INTEGER foreign key
+
+    python -m bench.joins --farmers 20000
+    python -m bench.joins --db /tmp/gap_100k.db      # ใช้ DB สังเคราะห์ที่มีอยู่ (ไม่แก้ไฟล์นี้)
+
+สร้าง/คัดลอก DB สังเคราะห์ (bench.synth) แล้วทำสำเนา legacy ที่แปลง user_id ของ farmdb / duriandb /
+answerdb กลับเป็นข้อความ (index ชื่อเดิมครบ) ยิง query ชุดเดียวกันทั้งสองไฟล์ เทียบ median
+ฝั่ง legacy ใช้ CAST(t.user_id AS INTEGER) = p.user_id แบบที่ rollup / export เคยทำ
+→ index ของ user_id ฝั่งลูกใช้ไม่ได้ ต้องสแกนตารางลูกทั้งตารางเสมอ
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+
+LEGACY_TABLES = ("farmdb", "duriandb", "answerdb")
+
+# ชื่อ: SQL ({on} = เงื่อนไข join ของตารางลูก alias t กับ personaldb alias p)
+QUERIES = {
+    "farms per province": (
+        "SELECT p.province, COUNT(*) FROM farmdb t JOIN personaldb p ON {on} GROUP BY p.province"
+    ),
+    "farms in one district": (
+        "SELECT t.farm_id, t.location, p.name FROM personaldb p JOIN farmdb t ON {on}"
+        " WHERE p.province = :province AND p.district = :district"
+    ),
+    "durians of one surname": (
+        "SELECT t.durian_id, t.durian_type FROM personaldb p JOIN duriandb t ON {on} WHERE p.surname = :surname"
+    ),
+    "answers per district": (
+        "SELECT p.district, COUNT(*) FROM answerdb t JOIN personaldb p ON {on}"
+        " WHERE p.province = :province GROUP BY p.district"
+    ),
+    "certified farms + owner": (
+        "SELECT c.cert_id, t.farm_id, p.name FROM certificationdb c"
+        " JOIN farmdb t ON t.farm_id = c.farm_id JOIN personaldb p ON {on}"
+        " WHERE p.province = :province"
+    ),
+}
+JOIN_ON = {
+    "legacy": "CAST(t.user_id AS INTEGER) = p.user_id",
+    "fk": "t.user_id = p.user_id",
+}
+
+
+def make_legacy(src: str, dst: str) -> None:
+    """สำเนา DB ที่ user_id ของตารางลูกเป็น TEXT ไม่มี foreign key (index ชื่อเดิม)"""
+    shutil.copyfile(src, dst)
+    con = sqlite3.connect(dst)
+    try:
+        for name in LEGACY_TABLES:
+            indexes = [sql for (sql,) in con.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (name,))]
+            cols = [c[1] for c in con.execute(f"PRAGMA table_info({name})")]
+            select = ", ".join("CAST(user_id AS TEXT) AS user_id" if c == "user_id" else c for c in cols)
+            con.executescript(
+                f"PRAGMA foreign_keys = OFF;"
+                f"CREATE TABLE {name}_legacy AS SELECT {select} FROM {name};"
+                f"DROP TABLE {name};"
+                f"ALTER TABLE {name}_legacy RENAME TO {name};"
+            )
+            for sql in indexes:
+                con.execute(sql)
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+
+
+def _params(con) -> dict:
+    # จังหวัด / อำเภอ / นามสกุลที่พบบ่อยสุด (ให้ผลลัพธ์ไม่ว่าง)
+    province, district = con.execute(
+        "SELECT province, district FROM personaldb GROUP BY 1, 2 ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    (surname,) = con.execute(
+        "SELECT surname FROM personaldb GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    return {"province": province, "district": district, "surname": surname}
+
+
+def _time(con, sql: str, params: dict, repeat: int):
+    rows = con.execute(sql, params).fetchall()  # warmup (page cache)
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        con.execute(sql, params).fetchall()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs) * 1000, len(rows)
+
+
+def run(fk_db: str, legacy_db: str, repeat: int) -> dict:
+    out = {}
+    cons = {"legacy": sqlite3.connect(legacy_db), "fk": sqlite3.connect(fk_db)}
+    try:
+        params = _params(cons["fk"])
+        for name, sql in QUERIES.items():
+            res = {kind: _time(con, sql.format(on=JOIN_ON[kind]), params, repeat) for kind, con in cons.items()}
+            if res["legacy"][1] != res["fk"][1]:
+                raise RuntimeError(f"{name}: row count differs {res['legacy'][1]} != {res['fk'][1]}")
+            before, after = res["legacy"][0], res["fk"][0]
+            out[name] = {"rows": res["fk"][1], "before_ms": round(before, 2), "after_ms": round(after, 2),
+                         "speedup": round(before / after, 1) if after else None}
+    finally:
+        for con in cons.values():
+            con.close()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--farmers", type=int, default=20000)
+    ap.add_argument("--db", help="DB สังเคราะห์ที่ migrate แล้ว (ไม่ระบุ = สร้างใหม่ในไดเรกทอรีชั่วคราว)")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="gap_joins_")
+    fk_db = os.path.join(tmp, "fk.db")
+    if args.db:
+        shutil.copyfile(args.db, fk_db)
+    else:
+        from bench import synth
+        os.environ["GAP_DB_URL"] = f"sqlite:///{fk_db}"
+        os.environ.setdefault("GAP_DB_SYNCHRONOUS", "OFF")
+        from data import engine, init_db
+        init_db()
+        synth.generate(engine, args.farmers, progress=None)
+        engine.dispose()
+    with sqlite3.connect(fk_db) as con:
+        con.execute("ANALYZE")
+    legacy_db = os.path.join(tmp, "legacy.db")
+    make_legacy(fk_db, legacy_db)
+
+    res = run(fk_db, legacy_db, args.repeat)
+    print(f"median ms of {args.repeat} runs (before = VARCHAR user_id + CAST, after = INTEGER foreign key)")
+    print(f"{'query':<28}{'rows':>8}{'before':>10}{'after':>10}{'x':>8}")
+    for name, r in res.items():
+        print(f"{name:<28}{r['rows']:>8}{r['before_ms']:>10}{r['after_ms']:>10}{r['speedup']:>8}")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
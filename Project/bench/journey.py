@@ -0,0 +1,194 @@
+"""เล่นซ้ำเส้นทางของเกษตรกรใน client.http ด้วย virtual farmer หลายคนพร้อมกัน
+
+    python -m bench.journey --farmers 20
+    python -m bench.journey --farmers 20 --save bench/baseline.json
+    python -m bench.journey --farmers 20 --compare bench/baseline.json   # exit 1 ถ้าช้าลง/query เพิ่ม
+
+ขั้นตอนเหมือน client.http (seed → ลงทะเบียน → ฟาร์ม/ทุเรียน → ตอบ 46 ข้อ → ให้คะแนน → ประเมิน
+→ ข้อตกลง → GAP request → ตรวจ → เกียรติบัตร) โดย farmer เลขคี่เล่นเคส "ตอบไม่ครบ" แบบผู้ใช้ 2
+ยิงผ่าน ASGI ในโปรเซสบน SQLite ชั่วคราว ไม่ใช้ network
+
+รายงานต่อ endpoint: p50/p95/p99, จำนวน SQL ต่อ request และ throughput รวม
+การเทียบ baseline: query ต่อ request ต้องไม่เพิ่ม (ไม่ขึ้นกับเครื่อง) และ p95 ต้องไม่เกิน
+baseline * (1 + --tolerance) + --slack-ms (latency ของ request ที่วิ่งพร้อมกันแกว่งมาก จึงเผื่อไว้กว้าง)
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+
+from bench.common import PERSON, asgi_client, summarize, use_temp_db
+
+
+class Recorder:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.queries = defaultdict(list)
+
+    def report(self) -> dict:
+        out = {}
+        for label in sorted(self.latency):
+            qs = self.queries[label]
+            out[label] = {**summarize(self.latency[label]), "queries_per_call": round(sum(qs) / len(qs), 2)}
+        return out
+
+
+class Farmer:
+    """หนึ่ง virtual farmer; call() จับเวลาและนับ SQL ต่อ request"""
+
+    def __init__(self, client, rec: Recorder, n: int):
+        self.client, self.rec, self.n = client, rec, n
+
+    async def call(self, method: str, template: str, expect=(200, 201), params=None, json_body=None, **path):
+        import sqltrace
+
+        with sqltrace.track() as q:
+            t0 = time.perf_counter()
+            r = await self.client.request(method, template.format(**path), params=params, json=json_body)
+            elapsed = time.perf_counter() - t0
+        label = f"{method} {template}"
+        self.rec.latency[label].append(elapsed)
+        self.rec.queries[label].append(q.count)
+        if r.status_code not in expect:
+            raise RuntimeError(f"farmer {self.n}: {label} -> {r.status_code} {r.text[:200]}")
+        return r.json()
+
+
+async def setup(client) -> dict:
+    """ส่วน 0) และข้อตกลงที่แอดมินสร้างครั้งเดียว"""
+    await client.post("/seed/master")
+    acts = (await client.get("/activities")).json()
+    agreements = []
+    for text in ("ผู้ใช้ยอมรับว่าจะปฏิบัติตามมาตรฐาน GAP", "ข้อมูลทั้งหมดต้องเป็นความจริง"):
+        agreements.append((await client.post("/agreements", json={"agreement_text": text})).json()["agreement_id"])
+    return {"activity_ids": [a["activity_id"] for a in acts], "agreement_ids": agreements}
+
+
+async def journey(f: Farmer, ctx: dict):
+    complete = f.n % 2 == 0
+    # 1) ลงทะเบียน
+    uid = (await f.call("POST", "/personals", json_body={**PERSON, "name": f"ฟาร์มเมอร์{f.n}"}))["user_id"]
+    await f.call("GET", "/personals", params={"limit": 50})
+    # 2) ฟาร์ม / ทุเรียน
+    farm = await f.call("POST", "/farms", json_body={
+        "user_id": uid, "location": "https://www.google.com/maps?q=14.97,102.08",
+        "titledeed_num": f"TD-{f.n}", "titledeed_file": "uploads/deed.pdf"})
+    await f.call("POST", "/durians", json_body={
+        "user_id": uid, "durian_type": "หมอนทอง", "durian_age": 5, "tree_count": 20,
+        "flowering_startdate": "2025-03-15", "harvest_month": "มิถุนายน", "weight_expected": 1500.5})
+    # 3) ดูหมวด/กิจกรรม
+    await f.call("GET", "/categories")
+    await f.call("GET", "/activities")
+    await f.call("POST", "/activities/search", json_body={
+        "categoryapp_ids": [1, 2, 3], "activity_types": ["Major", "Minor"], "keyword": "บำบัด"})
+    # 4) ตอบคำถาม (ผู้ใช้ 2 ใน client.http ตอบแค่ 3 ข้อ)
+    ids = ctx["activity_ids"] if complete else ctx["activity_ids"][:3]
+    for aid in ids:
+        await f.call("POST", "/answers", json_body={"activity_id": aid, "user_id": uid, "answer_text": "ok"})
+    await f.call("GET", "/activities/with-status", params={"user_id": uid})
+    # 5) แอดมินให้คะแนน → 6) ประเมิน
+    await f.call("PATCH", "/answers/score/{user_id}", user_id=uid, json_body=[
+        {"activity_id": aid, "user_id": uid, "result_each": 1} for aid in ids])
+    result = await f.call("GET", "/assessment/evaluate", params={"user_id": uid})
+    if not complete:
+        return
+    if not result.get("eligible_for_request"):
+        raise RuntimeError(f"farmer {f.n}: expected to pass evaluation, got {result.get('status')}")
+    # 7) ข้อตกลง → GAP request → ตรวจ → เกียรติบัตร
+    for agr in ctx["agreement_ids"]:
+        await f.call("POST", "/agreement-answers", json_body={
+            "agreement_id": agr, "user_id": uid, "agreement_answer": "ยอมรับ"})
+    req = await f.call("POST", "/gap-requests", params={"user_id": uid}, json_body={
+        "farm_id": farm["farm_id"], "request_date": "2025-05-01", "timeline_status": "รอจัดผู้ตรวจสอบ"})
+    rid = req["request_id"]
+    await f.call("GET", "/gap-requests/by-user/{user_id}", user_id=uid)
+    await f.call("PATCH", "/gap-requests/status/{request_id}", request_id=rid,
+                 params={"timeline_status": "อยู่ระหว่างตรวจ"})
+    await f.call("POST", "/inspections", json_body={
+        "request_id": rid, "complete_date": "2025-05-15", "status_result": "ผ่าน"})
+    await f.call("PATCH", "/gap-requests/status/{request_id}", request_id=rid,
+                 params={"timeline_status": "ตรวจเสร็จ"})
+    await f.call("POST", "/certifications", json_body={
+        "request_id": rid, "farm_id": farm["farm_id"], "issue_date": "2025-05-20",
+        "expire_date": "2026-05-20", "cert_file": "cert.pdf", "addition": "-"})
+    await f.call("PATCH", "/gap-requests/status/{request_id}", request_id=rid,
+                 params={"timeline_status": "ออกเกียรติบัตรแล้ว"})
+    await f.call("GET", "/certifications/by-user/{user_id}", user_id=uid)
+    await f.call("GET", "/users/{user_id}/overview", user_id=uid)
+
+
+async def run(farmers: int, rounds: int) -> dict:
+    import main
+
+    rec = Recorder()
+    async with asgi_client(main.app) as client:
+        ctx = await setup(client)
+        # รอบ warmup ไม่นับ (import lazy, cache rubric, เติบโตของไฟล์ DB ช่วงแรก)
+        await asyncio.gather(*(journey(Farmer(client, Recorder(), -1 - n), ctx) for n in range(farmers)))
+        t0 = time.perf_counter()
+        for r in range(rounds):
+            await asyncio.gather(*(journey(Farmer(client, rec, r * farmers + n), ctx) for n in range(farmers)))
+        elapsed = time.perf_counter() - t0
+    total = sum(len(v) for v in rec.latency.values())
+    return {
+        "farmers": farmers, "rounds": rounds,
+        "requests": total, "rps": round(total / elapsed, 1),
+        "journeys_per_s": round(farmers * rounds / elapsed, 2),
+        "endpoints": rec.report(),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    problems = []
+    for label, base in baseline["endpoints"].items():
+        cur = current["endpoints"].get(label)
+        if cur is None:
+            problems.append(f"{label}: missing from this run")
+            continue
+        if cur["queries_per_call"] > base["queries_per_call"]:
+            problems.append(f"{label}: queries/call {base['queries_per_call']} -> {cur['queries_per_call']}")
+        limit = base["p95_ms"] * (1 + tolerance) + slack_ms
+        if cur["p95_ms"] > limit:
+            problems.append(f"{label}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms (limit {limit:.1f}ms)")
+    return problems
+
+
+def print_report(res: dict):
+    print(f"{res['farmers']} farmers x {res['rounds']} rounds: {res['requests']} requests, "
+          f"{res['rps']} req/s, {res['journeys_per_s']} journeys/s")
+    print(f"{'endpoint':<42}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'sql/req':>9}")
+    for label, s in res["endpoints"].items():
+        print(f"{label:<42}{s['count']:>6}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['queries_per_call']:>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--farmers", type=int, default=20)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--save", help="เขียนผลเป็น baseline JSON")
+    ap.add_argument("--compare", help="เทียบกับ baseline JSON, exit 1 ถ้าถดถอย")
+    ap.add_argument("--tolerance", type=float, default=1.0, help="p95 ช้าลงได้กี่เท่า (1.0 = 100%%)")
+    ap.add_argument("--slack-ms", type=float, default=2.0, help="ส่วนเผื่อ noise แบบค่าคงที่")
+    args = ap.parse_args()
+
+    use_temp_db("gap_journey_")
+    res = asyncio.run(run(args.farmers, args.rounds))
+    print_report(res)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(res, json.load(f), args.tolerance, args.slack_ms)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            sys.exit(1)
+        print("no regression")
+
+
+if __name__ == "__main__":
+    main()
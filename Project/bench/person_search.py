@@ -0,0 +1,96 @@
+"""latency ของ GET /personals/search (prefix / fuzzy) บนข้อมูลสังเคราะห์
+
+    python -m bench.person_search --people 200000 --queries 300
+
+เป้าหมาย (SQLite ไฟล์บน SSD, 200k คน, เครื่อง dev ทั่วไป):
+    prefix  p95 <= 10 ms
+    fuzzy   p95 <= 100 ms
+ค่าที่ได้จริงพิมพ์ออกมาพร้อมผล PASS/FAIL เทียบเป้า
+"""
+import argparse
+import random
+import time
+
+from bench.common import summarize, use_temp_db
+
+TARGET_P95_MS = {"prefix": 10.0, "fuzzy": 100.0}
+
+FIRST = ["สม", "สุ", "ประ", "วิ", "อนุ", "กิตติ", "ชัย", "ศรี", "นิ", "พร", "มาลี", "บุญ", "ทอง", "จันทร์", "รัตน์"]
+SECOND = ["ชัย", "ดา", "พร", "ศักดิ์", "รัตน์", "วงศ์", "เดช", "สุข", "ใจ", "ทิพย์", "ศรี", "นันท์", ""]
+FAMILY = ["ประเสริฐ", "กิตติคุณ", "ใจดี", "ทองคำ", "ศรีสุข", "วงศ์ใหญ่", "บุญมา", "แก้วมณี", "สายทอง", "พึ่งบุญ"]
+
+
+def _name(rng: random.Random) -> str:
+    return rng.choice(FIRST) + rng.choice(SECOND)
+
+
+def populate(engine, people: int, seed: int = 7):
+    from datetime import date
+    from sqlalchemy import insert
+    import person_search
+    from model import PersonalDB
+
+    rng = random.Random(seed)
+    rows = []
+    with engine.begin() as conn:
+        for i in range(people):
+            rows.append({
+                "name": _name(rng), "surname": rng.choice(FAMILY) + rng.choice(SECOND),
+                "phone_number": f"08{rng.randrange(10**8):08d}", "user_type": "Individual",
+                "idcard_file": "-", "birth": date(1970, 1, 1), "religion": "พุทธ",
+                "id_number": f"{rng.randrange(10**13):013d}", "village_name": "-", "house_number": "-",
+                "road": "-", "alley": "-", "province": "จันทบุรี", "district": "เมือง", "subdistrict": "-",
+            })
+            if len(rows) == 10000:
+                conn.execute(insert(PersonalDB), rows); rows = []
+        if rows:
+            conn.execute(insert(PersonalDB), rows)
+    person_search.rebuild(engine)
+
+
+def _typo(rng: random.Random, s: str) -> str:
+    if len(s) < 4:
+        return s
+    i = rng.randrange(1, len(s) - 1)
+    return s[:i] + s[i + 1] + s[i] + s[i + 2:]  # สลับตัวอักษรติดกัน
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--people", type=int, default=200000)
+    ap.add_argument("--queries", type=int, default=300)
+    args = ap.parse_args()
+
+    use_temp_db("gap_person_")
+    from sqlmodel import Session, select
+    from data import engine, init_db
+    from model import PersonalDB
+    import person_search
+
+    init_db()
+    t0 = time.perf_counter()
+    populate(engine, args.people)
+    print(f"populated {args.people} people in {time.perf_counter() - t0:.1f}s")
+
+    rng = random.Random(11)
+    with Session(engine) as session:
+        sample = session.exec(select(PersonalDB.name, PersonalDB.surname, PersonalDB.phone_number)
+                              .order_by(PersonalDB.user_id).limit(5000)).all()
+        lat = {"prefix": [], "fuzzy": []}
+        for _ in range(args.queries):
+            name, surname, phone = rng.choice(sample)
+            q = rng.choice([name[:3], surname[:4], phone[:6]])
+            t = time.perf_counter(); person_search.search_prefix(session, q, 20)
+            lat["prefix"].append(time.perf_counter() - t)
+            t = time.perf_counter(); person_search.search_fuzzy(session, _typo(rng, f"{name} {surname}"), 20)
+            lat["fuzzy"].append(time.perf_counter() - t)
+
+    for mode, xs in lat.items():
+        s = summarize(xs)
+        ok = "PASS" if s["p95_ms"] <= TARGET_P95_MS[mode] else "FAIL"
+        print(f"{mode:>6}: p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms "
+              f"(target p95 <= {TARGET_P95_MS[mode]}ms) {ok}")
+
+
+if __name__ == "__main__":
+    main()
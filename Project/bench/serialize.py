@@ -0,0 +1,80 @@
+"""CPU ต่อ request ของ endpoint ที่คืนรายการยาว: โหมดปกติ (response_model + json) กับ GAP_FAST_JSON
+
+    python -m bench.serialize --requests 300
+
+สลับ fastjson.enabled ในโปรเซสเดียวกัน (ข้อมูล/แคชเหมือนกันทั้งสองโหมด) ยิงผ่าน ASGI ไม่ใช้ network
+วัด time.process_time() จึงไม่รวมเวลารอ I/O
+"""
+import argparse
+import asyncio
+import time
+
+from bench.common import PERSON, asgi_client, use_temp_db
+
+
+async def _prepare(client, people: int, farms: int) -> int:
+    await client.post("/seed/master")
+    acts = (await client.get("/activities")).json()
+    uid = (await client.post("/personals", json=PERSON)).json()["user_id"]
+    await client.post("/answers/bulk", json={"user_id": uid, "items": [
+        {"activity_id": a["activity_id"], "answer_text": "ok", "result_each": 1} for a in acts]})
+    for n in range(farms):
+        await client.post("/farms", json={"user_id": uid, "location": f"bench-{n}", "titledeed_num": f"TD-{n}"})
+    for n in range(people):
+        await client.post("/personals", json={**PERSON, "name": f"ทดสอบ{n}", "id_number": f"{n:013d}"})
+    return uid
+
+
+async def _cpu_per_request(client, path: str, n: int) -> float:
+    await client.get(path)  # warmup
+    t0 = time.process_time()
+    for _ in range(n):
+        r = await client.get(path)
+        r.raise_for_status()
+    return (time.process_time() - t0) / n * 1000
+
+
+async def run(requests: int, people: int, farms: int) -> dict:
+    import fastjson
+    import main
+
+    async with asgi_client(main.app) as client:
+        uid = await _prepare(client, people, farms)
+        paths = [
+            "/activities",
+            f"/activities/with-status?user_id={uid}",
+            f"/personals?limit={people}",
+            f"/farms/by-user/{uid}?limit={farms}",
+            f"/personals/search?q=ทดสอบ&limit={min(people, 1000)}",
+        ]
+        out = {}
+        for path in paths:
+            fastjson.enabled = False
+            base = (await client.get(path)).json()
+            before = await _cpu_per_request(client, path, requests)
+            fastjson.enabled = True
+            if (await client.get(path)).json() != base:
+                raise RuntimeError(f"{path}: fast response differs from the validated one")
+            after = await _cpu_per_request(client, path, requests)
+            out[path] = {"before_ms": round(before, 3), "after_ms": round(after, 3),
+                         "speedup": round(before / after, 2) if after else None}
+    return {"encoder": "orjson" if fastjson.orjson else "json", "endpoints": out}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--people", type=int, default=500)
+    ap.add_argument("--farms", type=int, default=200)
+    args = ap.parse_args()
+
+    use_temp_db("gap_serialize_")
+    res = asyncio.run(run(args.requests, args.people, args.farms))
+    print(f"encoder: {res['encoder']}  (CPU ms/request)")
+    print(f"{'endpoint':<52}{'before':>10}{'after':>10}{'x':>7}")
+    for path, r in res["endpoints"].items():
+        print(f"{path:<52}{r['before_ms']:>10}{r['after_ms']:>10}{r['speedup']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""สร้างฐานข้อมูลสังเคราะห์ขนาด production (1k – 5M เกษตรกร)
+
+    python -m bench.synth --farmers 100000 --db /tmp/gap_100k.db
+    GAP_DB_URL=postgresql://... python -m bench.synth --farmers 1000000
+
+เติม PersonalDB, FarmDB, DurianDB, AnswerDB (สูงสุด 46 ข้อ/คน), AgreementAnswerDB,
+GAPRequestDB, InspectionDB, CertificationDB ด้วย insert ทีละ batch (Core executemany)
+พร้อม EvaluationSummaryDB ที่คำนวณระหว่างโหลด แล้วสร้าง trigram ชื่อ / FTS ทีเดียวตอนจบ
+
+การกระจายตัว (ปรับที่ค่าคงที่ด้านล่าง):
+- จังหวัด/อำเภอ ถ่วงตามพื้นที่ปลูกทุเรียนจริง (ภาคตะวันออก/ใต้มากสุด)
+- ความคืบหน้าแบบประเมิน: ยังไม่เริ่ม / ตอบบางส่วน / ตอบครบรอให้คะแนน / ให้คะแนนแล้ว
+- เกียรติบัตรอายุ 3 ปี ออกย้อนหลังกระจาย 4 ปี → มีทั้งหมดอายุแล้ว ใกล้หมด และยังใช้ได้
+ใช้ seed เดิมได้ข้อมูลเดิมทุกครั้ง; รันซ้ำกับ DB เดิมจะต่อท้าย (id ต่อจากค่าสูงสุด)
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from evaluation import fill_summary
+
+
+PROVINCES = {  # จังหวัด: (น้ำหนัก, อำเภอ)
+    "จันทบุรี": (30, ["เมืองจันทบุรี", "ท่าใหม่", "มะขาม", "ขลุง", "โป่งน้ำร้อน", "สอยดาว", "แก่งหางแมว", "นายายอาม"]),
+    "ระยอง": (12, ["แกลง", "วังจันทร์", "เขาชะเมา", "บ้านค่าย", "เมืองระยอง"]),
+    "ตราด": (6, ["เมืองตราด", "เขาสมิง", "บ่อไร่", "แหลมงอบ"]),
+    "ชุมพร": (16, ["เมืองชุมพร", "ท่าแซะ", "หลังสวน", "สวี", "พะโต๊ะ", "ละแม"]),
+    "สุราษฎร์ธานี": (8, ["บ้านนาสาร", "เวียงสระ", "คีรีรัฐนิคม", "ท่าฉาง", "พระแสง"]),
+    "นครศรีธรรมราช": (6, ["ลานสกา", "พรหมคีรี", "ฉวาง", "ทุ่งใหญ่", "นบพิตำ"]),
+    "ยะลา": (7, ["เมืองยะลา", "บันนังสตา", "ธารโต", "รามัน"]),
+    "นราธิวาส": (3, ["สุไหงปาดี", "จะแนะ", "ศรีสาคร"]),
+    "ศรีสะเกษ": (4, ["กันทรลักษ์", "ขุนหาญ", "ศรีรัตนะ"]),
+    "อุตรดิตถ์": (3, ["ลับแล", "เมืองอุตรดิตถ์", "ท่าปลา"]),
+    "ปราจีนบุรี": (2, ["นาดี", "ประจันตคาม", "กบินทร์บุรี"]),
+    "ชลบุรี": (2, ["บ่อทอง", "เกาะจันทร์", "บ้านบึง"]),
+    "พังงา": (1, ["กะปง", "ตะกั่วป่า"]),
+}
+DURIAN_TYPES = {"หมอนทอง": 60, "ชะนี": 15, "ก้านยาว": 9, "พวงมณี": 7, "หลงลับแล": 4, "หลินลับแล": 2, "กระดุม": 3}
+HARVEST_MONTHS = ["เมษายน", "พฤษภาคม", "มิถุนายน", "กรกฎาคม", "สิงหาคม"]
+# ความคืบหน้าแบบประเมินของเกษตรกร
+STAGES = {"new": 15, "partial": 25, "answered": 15, "scored": 45}
+PASS_RATE = 0.8          # คนที่ให้คะแนนแล้วผ่าน Major ทุกข้อ (ที่เหลือตก 1–3 ข้อ)
+MINOR_PASS_RATE = 0.9
+REQUEST_RATE = 0.75      # คนที่ผ่านเกณฑ์ → ยื่น GAP
+INSPECTION_PASS_RATE = 0.85
+CERT_YEARS = 3
+TEXT_ANSWERS = ["บ่อน้ำในสวน", "ลำธาร", "น้ำบาดาล", "บำบัดด้วยการตกตะกอน", "มีบันทึก", "ตรวจทุกปี",
+                "ใช้ปุ๋ยอินทรีย์", "ล้างอุปกรณ์หลังใช้", "ตามคำแนะนำกรมวิชาการเกษตร", "มี"]
+
+FIRST = ["สม", "สุ", "ประ", "วิ", "อนุ", "กิตติ", "ชัย", "ศรี", "นิ", "พร", "มาลี", "บุญ", "ทอง", "จันทร์",
+         "รัตน์", "อำ", "เกียรติ", "ธน", "ปิ", "ยุท", "วรร", "สุริ", "อรุ", "เพ็ญ"]
+SECOND = ["ชัย", "ดา", "พร", "ศักดิ์", "รัตน์", "วงศ์", "เดช", "สุข", "ใจ", "ทิพย์", "ศรี", "นันท์", "พล", "นภา",
+          "ธร", "วุฒิ", "กานต์", "ยา", ""]
+FAMILY = ["ประเสริฐ", "กิตติคุณ", "ใจดี", "ทองคำ", "ศรีสุข", "วงศ์ใหญ่", "บุญมา", "แก้วมณี", "สายทอง", "พึ่งบุญ",
+          "จันทร์หอม", "รักษ์สวน", "สวนดี", "มีสุข", "เพชรรัตน์", "ชาวสวน", "ทรัพย์มาก", "อินทร์แก้ว"]
+FAMILY_SUFFIX = ["", "", "", "กุล", "วงศ์", "ศรี", "สกุล", "พันธ์"]
+
+TODAY = date.today()
+
+
+def _weighted(d: dict):
+    keys = list(d)
+    weights = [v[0] if isinstance(v, tuple) else v for v in d.values()]
+    return keys, weights
+
+
+class Generator:
+    """สร้างแถวทีละกลุ่มของเกษตรกร โดยกำหนด id เองทุกตาราง (ไม่ต้องอ่านกลับจาก DB)"""
+
+    def __init__(self, seed: int, rubric, activities, agreement_ids, next_ids: dict):
+        self.rng = random.Random(seed)
+        self.rubric = rubric
+        self.activities = activities  # [(activity_id, activity_type, เป็นคำถามอัปโหลดไฟล์)]
+        self.agreement_ids = agreement_ids
+        self.next = dict(next_ids)
+        self._prov = _weighted(PROVINCES)
+        self._durian = _weighted(DURIAN_TYPES)
+        self._stage = _weighted(STAGES)
+
+    def _id(self, table: str) -> int:
+        v = self.next[table]
+        self.next[table] = v + 1
+        return v
+
+    def _days_ago(self, lo: int, hi: int) -> date:
+        return TODAY - timedelta(days=self.rng.randint(lo, hi))
+
+    def batch(self, n: int) -> dict:
+        rng = self.rng
+        rows = {k: [] for k in TABLES}
+        for _ in range(n):
+            uid = self._id("personal")
+            province = rng.choices(*self._prov)[0]
+            rows["personal"].append({
+                "user_id": uid,
+                "name": rng.choice(FIRST) + rng.choice(SECOND),
+                "surname": rng.choice(FAMILY) + rng.choice(FAMILY_SUFFIX),
+                "phone_number": f"0{rng.choice('689')}{rng.randrange(10**8):08d}",
+                "user_type": "Individual" if rng.random() < 0.93 else "Juristic",
+                "idcard_file": f"uploads/idcard_{uid}.jpg",
+                "birth": date(1950, 1, 1) + timedelta(days=rng.randrange(50 * 365)),
+                "religion": "พุทธ" if province not in ("ยะลา", "นราธิวาส") or rng.random() < 0.3 else "อิสลาม",
+                "id_number": f"{rng.randint(1, 8)}{rng.randrange(10**12):012d}",
+                "village_name": f"บ้าน{rng.choice(FAMILY)}",
+                "house_number": f"{rng.randint(1, 299)}/{rng.randint(1, 9)}",
+                "road": "-", "alley": "-",
+                "province": province,
+                "district": rng.choice(PROVINCES[province][1]),
+                "subdistrict": "-",
+            })
+            farm_ids = []
+            for _f in range(rng.choices((1, 2, 3), (70, 22, 8))[0]):
+                fid = self._id("farm")
+                farm_ids.append(fid)
+                rows["farm"].append({
+                    "farm_id": fid, "user_id": uid,
+                    "location": f"https://www.google.com/maps?q={rng.uniform(5.8, 17.5):.6f},{rng.uniform(98.5, 104.5):.6f}",
+                    "titledeed_num": f"TD-{fid}", "titledeed_file": f"uploads/deed_{fid}.pdf",
+                })
+            for _d in range(rng.choices((1, 2, 3), (55, 35, 10))[0]):
+                rows["durian"].append({
+                    "durian_id": self._id("durian"), "user_id": uid,
+                    "durian_type": rng.choices(*self._durian)[0],
+                    "durian_age": rng.randint(2, 30), "tree_count": rng.randint(10, 600),
+                    "flowering_startdate": self._days_ago(30, 400),
+                    "harvest_month": rng.choice(HARVEST_MONTHS),
+                    "weight_expected": round(rng.uniform(300, 40000), 1),
+                })
+            self._assessment(rows, uid, farm_ids[0], rng.choices(*self._stage)[0])
+        return rows
+
+    def _assessment(self, rows: dict, user: int, farm_id: int, stage: str):
+        rng = self.rng
+        if stage == "new":
+            return
+        acts = self.activities
+        if stage == "partial":
+            acts = rng.sample(acts, rng.randint(1, len(acts) - 1))
+        scored = stage == "scored"
+        failed = set()
+        if scored and rng.random() >= PASS_RATE:
+            majors = [a[0] for a in acts if a[1] == "Major"]
+            failed = set(rng.sample(majors, min(len(majors), rng.randint(1, 3))))
+        scored_map = {}
+        for aid, level, is_file in acts:
+            result = None
+            if scored:
+                ok = aid not in failed if level == "Major" else rng.random() < MINOR_PASS_RATE
+                result = scored_map[aid] = 1 if ok else 0
+            rows["answer"].append({
+                "answer_id": self._id("answer"), "activity_id": aid, "user_id": user,
+                "answer_file": f"uploads/ans_{user}_{aid}.jpg" if is_file else None,
+                "answer_text": None if is_file else rng.choice(TEXT_ANSWERS),
+                "result_each": result,
+            })
+        if stage in ("answered", "scored"):
+            for agr in self.agreement_ids:
+                rows["agreement"].append({
+                    "ag_answer_id": self._id("agreement"), "agreement_id": agr, "user_id": user,
+                    "agreement_answer": "ยอมรับ",
+                })
+        if not scored_map:
+            return
+        # summary เดียวกับที่ evaluation.rebuild จะสร้าง แต่คำนวณระหว่างโหลดเลย
+        # (SimpleNamespace แทน EvaluationSummaryDB: สร้าง SQLModel ทีละแถวช้ากว่าการคำนวณเอง)
+        summary = SimpleNamespace(user_id=user, answer_version=1)
+        fill_summary(self.rubric, summary, scored_map)
+        rows["summary"].append(vars(summary))
+        if not (summary.eligible and rng.random() < REQUEST_RATE):
+            return
+        # ยื่น GAP → สถานะกระจายตามความคืบหน้า
+        rid = self._id("request")
+        requested = self._days_ago(20, 4 * 365 + 60)
+        stage_roll = rng.random()
+        status = "รอจัดผู้ตรวจสอบ" if stage_roll < 0.08 else "อยู่ระหว่างตรวจ" if stage_roll < 0.15 else "ตรวจเสร็จ"
+        if status == "ตรวจเสร็จ":
+            inspected = min(TODAY, requested + timedelta(days=rng.randint(7, 45)))
+            ok = rng.random() < INSPECTION_PASS_RATE
+            rows["inspection"].append({
+                "inspector_id": self._id("inspection"), "request_id": rid,
+                "complete_date": inspected, "status_result": "ผ่าน" if ok else "ไม่ผ่าน",
+            })
+            if ok:
+                status = "ออกเกียรติบัตรแล้ว"
+                issued = min(TODAY, inspected + timedelta(days=rng.randint(3, 30)))
+                cid = self._id("cert")
+                rows["cert"].append({
+                    "cert_id": cid, "request_id": rid, "farm_id": farm_id,
+                    "issue_date": issued, "expire_date": issued.replace(year=issued.year + CERT_YEARS)
+                    if not (issued.month == 2 and issued.day == 29) else issued + timedelta(days=365 * CERT_YEARS),
+                    "cert_file": f"uploads/cert_{cid}.pdf", "addition": None,
+                })
+        rows["request"].append({"request_id": rid, "farm_id": farm_id, "request_date": requested,
+                                "timeline_status": status})
+
+
+TABLES = {
+    # key ใน Generator.batch → (model, คอลัมน์ primary key)
+    "personal": ("PersonalDB", "user_id"),
+    "farm": ("FarmDB", "farm_id"),
+    "durian": ("DurianDB", "durian_id"),
+    "answer": ("AnswerDB", "answer_id"),
+    "agreement": ("AgreementAnswerDB", "ag_answer_id"),
+    "request": ("GAPRequestDB", "request_id"),
+    "inspection": ("InspectionDB", "inspector_id"),
+    "cert": ("CertificationDB", "cert_id"),
+    "summary": ("EvaluationSummaryDB", None),  # key คือ user_id
+}
+
+
+def _prepare(engine):
+    """seed rubric/ข้อตกลง (ถ้ายังไม่มี) แล้วคืนข้อมูลที่ generator ต้องใช้"""
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    import model
+    import seed
+    from rubric import get_rubric
+
+    with Session(engine) as session:
+        seed.seed_master(session)
+        agreements = session.exec(select(model.AgreementDB.agreement_id)).all()
+        if not agreements:
+            for text in ("ผู้ใช้ยอมรับว่าจะปฏิบัติตามมาตรฐาน GAP", "ข้อมูลทั้งหมดต้องเป็นความจริง"):
+                session.add(model.AgreementDB(agreement_text=text))
+            session.commit()
+            agreements = session.exec(select(model.AgreementDB.agreement_id)).all()
+        acts = [(a.activity_id, a.activity_type, "อัปโหลด" in a.activity_name)
+                for a in session.exec(select(model.ActivityDB).order_by(model.ActivityDB.activity_id)).all()]
+        next_ids = {}
+        for key, (cls, pk) in TABLES.items():
+            if pk is None:
+                continue
+            col = getattr(getattr(model, cls), pk)
+            next_ids[key] = (session.exec(select(func.max(col))).one() or 0) + 1
+        rubric = get_rubric(session)
+    return rubric, acts, list(agreements), next_ids
+
+
+def generate(engine, farmers: int, seed: int = 42, batch: int = 2000, progress=print) -> dict:
+    from sqlalchemy import insert
+    import model
+    import search
+
+    rubric, acts, agreements, next_ids = _prepare(engine)
+    gen = Generator(seed, rubric, acts, agreements, next_ids)
+    counts = {k: 0 for k in TABLES}
+    # FTS trigger ทีละแถวช้ามากตอนโหลดจำนวนมาก → ถอดออก แล้ว rebuild ทีเดียวตอนจบ
+    with engine.begin() as conn:
+        search.drop_fts(conn)
+    t0 = time.perf_counter()
+    done = 0
+    while done < farmers:
+        n = min(batch, farmers - done)
+        rows = gen.batch(n)
+        with engine.begin() as conn:
+            for key, (cls, _pk) in TABLES.items():
+                if rows[key]:
+                    conn.execute(insert(getattr(model, cls)), rows[key])
+                    counts[key] += len(rows[key])
+        done += n
+        if progress and (done % (batch * 25) == 0 or done == farmers):
+            rate = done / (time.perf_counter() - t0)
+            progress(f"{done}/{farmers} farmers ({rate:,.0f}/s)")
+    return {"rows": counts, "load_seconds": round(time.perf_counter() - t0, 1)}
+
+
+def build_derived(engine, progress=print) -> dict:
+    """ตารางที่คำนวณจากข้อมูลหลัก: FTS, trigram ชื่อ, rollup ของ dashboard
+    (summary ผลประเมินเขียนไปพร้อมคำตอบแล้ว)"""
+    import person_search
+    import rollup
+    import search
+
+    out = {}
+    for name, fn in (
+        ("fts", search.ensure_fts),
+        ("person_grams", person_search.rebuild),
+        ("rollups", rollup.rebuild),
+    ):
+        t0 = time.perf_counter()
+        out[name] = fn(engine)
+        if progress:
+            progress(f"{name}: {time.perf_counter() - t0:.1f}s")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--farmers", type=int, default=10000)
+    ap.add_argument("--db", help="ไฟล์ SQLite ปลายทาง (ไม่ระบุ = ใช้ GAP_DB_URL)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--batch", type=int, default=2000, help="จำนวนเกษตรกรต่อ transaction")
+    args = ap.parse_args()
+
+    if args.db:
+        os.environ["GAP_DB_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    elif "GAP_DB_URL" not in os.environ:
+        ap.error("--db or GAP_DB_URL is required (refusing to fill the default database)")
+    # โหลดครั้งเดียว ไม่ต้องการ durability ระหว่างทาง
+    os.environ.setdefault("GAP_DB_SYNCHRONOUS", "OFF")
+
+    from data import engine, init_db
+    init_db()
+    res = generate(engine, args.farmers, args.seed, args.batch)
+    res["derived"] = build_derived(engine)
+    print(res)
+
+
+if __name__ == "__main__":
+    main()
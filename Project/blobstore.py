@@ -0,0 +1,163 @@
+"""ที่เก็บไฟล์แบบ content-addressed (ชื่อไฟล์ = SHA-256 ของเนื้อหา)
+
+ไฟล์เดียวกันอัปโหลดซ้ำ (เช่นสำเนาบัตรประชาชน) จะถูกเก็บครั้งเดียว
+ชนิดไฟล์ตรวจจากเนื้อไฟล์ (sniff_type) ไม่เชื่อ Content-Type ของผู้อัปโหลด → ไฟล์เดียวกันได้ชนิดเดียวกันเสมอ
+
+คอลัมน์ idcard_file / answer_file / titledeed_file / cert_file ควรเก็บ blob id ที่ได้จาก POST /files
+แต่ยังรับข้อความอิสระ (ข้อมูลเดิม/client เดิมใส่ชื่อไฟล์ เช่น "water_source.jpg") — ยังไม่ตรวจด้วย is_blob_id
+
+    GAP_BLOB_DIR        โฟลเดอร์เก็บไฟล์ (ค่าเริ่มต้น: blobs/ ข้าง ๆ ไฟล์นี้)
+    GAP_BLOB_MAX_BYTES  ขนาดสูงสุดต่อไฟล์ (ค่าเริ่มต้น 20 MB)
+
+backend อื่น (เช่น object storage) ให้ implement BlobStore แล้วเปลี่ยน ``store`` ด้านล่าง
+"""
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+
+CHUNK_SIZE = 64 * 1024
+BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+OCTET_STREAM = "application/octet-stream"
+
+# ชนิดที่ยอมให้เบราว์เซอร์เปิดในหน้า (inline) → นามสกุลตอนดาวน์โหลด; ชนิดอื่นส่งเป็น attachment
+# ไม่มี image/svg+xml เพราะ svg รันสคริปต์ได้
+INLINE_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+}
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
+HEAD_BYTES = 16
+
+
+def is_blob_id(value: Optional[str]) -> bool:
+    return bool(value) and BLOB_ID.match(value) is not None
+
+
+def sniff_type(head: bytes) -> str:
+    """ชนิดไฟล์จาก magic bytes ต้นไฟล์; ไม่รู้จัก = application/octet-stream"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    return OCTET_STREAM
+
+
+class BlobWriter(ABC):
+    """รับข้อมูลทีละ chunk พร้อมคำนวณ hash ระหว่างเขียน"""
+
+    def __init__(self):
+        self.size = 0
+        self.head = b""  # HEAD_BYTES แรก สำหรับ sniff_type
+        self._sha = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self._sha.update(chunk)
+        self.size += len(chunk)
+        if len(self.head) < HEAD_BYTES:
+            self.head += chunk[:HEAD_BYTES - len(self.head)]
+        self._write(chunk)
+
+    @abstractmethod
+    def _write(self, chunk: bytes) -> None: ...
+
+    @abstractmethod
+    def commit(self) -> tuple:
+        """ปิดไฟล์แล้วย้ายเข้าที่ คืน (blob_id, created) — created=False ถ้ามีไฟล์นี้อยู่แล้ว"""
+
+    @abstractmethod
+    def abort(self) -> None: ...
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def writer(self) -> BlobWriter: ...
+
+    @abstractmethod
+    def exists(self, blob_id: str) -> bool: ...
+
+    @abstractmethod
+    def open(self, blob_id: str) -> BinaryIO: ...
+
+    def local_path(self, blob_id: str) -> Optional[Path]:
+        """path บนดิสก์ (ให้ส่งไฟล์ด้วย sendfile ได้) หรือ None ถ้า backend ไม่ใช่ไฟล์ในเครื่อง"""
+        return None
+
+    @abstractmethod
+    def delete(self, blob_id: str) -> None: ...
+
+
+# ---------------- local disk ----------------
+class _LocalWriter(BlobWriter):
+    def __init__(self, store: "LocalDiskStore"):
+        super().__init__()
+        self._store = store
+        fd, name = tempfile.mkstemp(dir=store.tmp_dir, prefix="up-")
+        self._tmp = Path(name)
+        self._f = os.fdopen(fd, "wb")
+
+    def _write(self, chunk: bytes) -> None:
+        self._f.write(chunk)
+
+    def commit(self) -> tuple:
+        self._f.close()
+        blob_id = self._sha.hexdigest()
+        dest = self._store.path(blob_id)
+        if dest.exists():
+            self._tmp.unlink()
+            return blob_id, False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp, dest)  # atomic: ผู้อ่านไม่เห็นไฟล์ที่เขียนไม่ครบ
+        return blob_id, True
+
+    def abort(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class LocalDiskStore(BlobStore):
+    """เก็บที่ <root>/ab/cd/<sha256> (แบ่งโฟลเดอร์ย่อยกันโฟลเดอร์เดียวมีไฟล์มากเกินไป)"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"  # อยู่ filesystem เดียวกัน → os.replace เป็น rename
+
+    def path(self, blob_id: str) -> Path:
+        if not is_blob_id(blob_id):
+            raise ValueError(f"invalid blob id {blob_id!r}")
+        return self.root / blob_id[:2] / blob_id[2:4] / blob_id
+
+    def writer(self) -> BlobWriter:
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)  # สร้างตอนอัปโหลดครั้งแรก ไม่ใช่ตอน import
+        return _LocalWriter(self)
+
+    def exists(self, blob_id: str) -> bool:
+        return self.path(blob_id).is_file()
+
+    def open(self, blob_id: str) -> BinaryIO:
+        return self.path(blob_id).open("rb")
+
+    def local_path(self, blob_id: str) -> Optional[Path]:
+        return self.path(blob_id)
+
+    def delete(self, blob_id: str) -> None:
+        self.path(blob_id).unlink(missing_ok=True)
+
+
+MAX_BYTES = int(os.environ.get("GAP_BLOB_MAX_BYTES", 20 * 1024 * 1024))
+store: BlobStore = LocalDiskStore(os.environ.get("GAP_BLOB_DIR", Path(__file__).resolve().with_name("blobs")))
@@ -1,11 +1,155 @@
-from sqlmodel import SQLModel, create_engine
+import os
+from dataclasses import dataclass
+from pathlib import Path
 
+from sqlalchemy import event
+from sqlmodel import create_engine
 
-engine = create_engine("sqlite:///database_project.db", echo=False)
+import sqltrace
 
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+# ค่าเริ่มต้นชี้ไฟล์ข้าง ๆ data.py เสมอ ไม่ขึ้นกับโฟลเดอร์ที่รัน uvicorn
+DEFAULT_URL = f"sqlite:///{Path(__file__).resolve().with_name('database_project.db')}"
+
+
+def _env_bool(env, key: str, default: bool) -> bool:
+    return env.get(key, "1" if default else "0").lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """การตั้งค่า engine ทั้งหมด อ่านจาก environment (GAP_DB_*)"""
+    url: str = DEFAULT_URL
+    echo: bool = False
+    async_db: bool = False
+    # SQLite pragmas
+    wal: bool = True
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 64 * 1024
+    mmap_size: int = 256 * 1024 * 1024
+    foreign_keys: bool = True  # SQLite ไม่ตรวจ foreign key (และไม่ cascade) ถ้าไม่เปิด
+    # connection pool (ไฟล์ SQLite / Postgres)
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+
+    @classmethod
+    def from_env(cls, env=os.environ) -> "EngineProfile":
+        d = cls()
+        url = env.get("GAP_DB_URL", d.url)
+        if url.startswith("postgres://"):  # รูปแบบที่ Heroku/Render ให้มา SQLAlchemy ไม่รับ
+            url = "postgresql://" + url[len("postgres://"):]
+        return cls(
+            url=url,
+            echo=_env_bool(env, "GAP_DB_ECHO", d.echo),
+            async_db=_env_bool(env, "GAP_DB_ASYNC", d.async_db),
+            wal=_env_bool(env, "GAP_DB_WAL", d.wal),
+            synchronous=env.get("GAP_DB_SYNCHRONOUS", d.synchronous).upper(),
+            busy_timeout_ms=int(env.get("GAP_DB_BUSY_TIMEOUT_MS", d.busy_timeout_ms)),
+            cache_size_kb=int(env.get("GAP_DB_CACHE_SIZE_KB", d.cache_size_kb)),
+            mmap_size=int(env.get("GAP_DB_MMAP_SIZE", d.mmap_size)),
+            foreign_keys=_env_bool(env, "GAP_DB_FOREIGN_KEYS", d.foreign_keys),
+            pool_size=int(env.get("GAP_DB_POOL_SIZE", d.pool_size)),
+            max_overflow=int(env.get("GAP_DB_MAX_OVERFLOW", d.max_overflow)),
+            pool_timeout=int(env.get("GAP_DB_POOL_TIMEOUT", d.pool_timeout)),
+            pool_recycle=int(env.get("GAP_DB_POOL_RECYCLE", d.pool_recycle)),
+        )
+
+    @property
+    def backend(self) -> str:
+        return self.url.split("://", 1)[0].split("+", 1)[0]
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.backend == "sqlite"
+
+    @property
+    def in_memory(self) -> bool:
+        return self.is_sqlite and (self.url.endswith(":memory:") or self.url in ("sqlite://", "sqlite:///"))
+
+    def engine_kwargs(self) -> dict:
+        kw = {"echo": self.echo}
+        if self.in_memory:
+            return kw  # SingletonThreadPool ไม่รับค่า pool
+        kw.update(pool_size=self.pool_size, max_overflow=self.max_overflow, pool_timeout=self.pool_timeout)
+        if self.is_sqlite:
+            kw["connect_args"] = {"timeout": self.busy_timeout_ms / 1000}
+        else:
+            kw.update(pool_pre_ping=True, pool_recycle=self.pool_recycle)
+        return kw
+
+    def sqlite_pragmas(self) -> list:
+        out = []
+        if self.wal and not self.in_memory:
+            out.append("PRAGMA journal_mode=WAL")
+        out += [
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            f"PRAGMA cache_size={-self.cache_size_kb}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+        if self.foreign_keys:
+            out.append("PRAGMA foreign_keys=ON")
+        return out
+
 
+def _attach_pragmas(sync_engine, profile: EngineProfile):
+    if not profile.is_sqlite:
+        return
+    pragmas = profile.sqlite_pragmas()
 
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for p in pragmas:
+            cur.execute(p)
+        cur.close()
 
+
+def make_engine(profile: EngineProfile):
+    eng = create_engine(profile.url, **profile.engine_kwargs())
+    _attach_pragmas(eng, profile)
+    sqltrace.install(eng)
+    return eng
+
+
+profile = EngineProfile.from_env()
+DATABASE_URL = profile.url
+ASYNC_DB = profile.async_db
+
+engine = make_engine(profile)
+_async_engine = None
+
+
+def async_url(url: str) -> str:
+    """แปลง URL ของ sync engine เป็น driver async (aiosqlite / asyncpg)"""
+    scheme, rest = url.split("://", 1)
+    base = scheme.split("+", 1)[0]
+    if base == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if base in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    raise ValueError(f"no async driver configured for {scheme!r}")
+
+
+def get_async_engine():
+    # สร้างเมื่อใช้ครั้งแรก เพื่อให้โหมด sync ไม่ต้องติดตั้ง aiosqlite/asyncpg
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        kw = profile.engine_kwargs()
+        kw.pop("connect_args", None)
+        _async_engine = create_async_engine(async_url(DATABASE_URL), **kw)
+        _attach_pragmas(_async_engine.sync_engine, profile)
+        sqltrace.install(_async_engine.sync_engine)
+    return _async_engine
+
+
+def init_db():
+    # DB ว่าง → สร้างตาราง; DB เดิมที่ schema ไม่ตรง → ไม่ start (อัปเกรดด้วย python migrate.py เท่านั้น)
+    import model  # noqa: F401  (register tables)
+    from migrate import ensure_schema
+    ensure_schema(engine)
@@ -0,0 +1,205 @@
+"""สแกนเกียรติบัตรที่ใกล้หมดอายุ แล้วเขียนแจ้งเตือนลง NotificationOutboxDB (ตัวส่งข้อความมาอ่านไปส่งเอง)
+
+    python expiry.py scan [--today 2026-01-01] [--windows 90,30,7] [--chunk 2000]
+    python expiry.py run [--interval 21600]          # วนสแกนเองเรื่อย ๆ ไม่ต้องมี cron
+
+- ช่วงเตือน (GAP_EXPIRY_WINDOWS, ค่าเริ่มต้น 90,30,7 วัน) แบ่งเป็นแถบไม่ซ้อนกัน:
+  หมดใน 0–7 วัน → เตือน 7, 8–30 → เตือน 30, 31–90 → เตือน 90
+  เกียรติบัตรที่สแกนครั้งแรกตอนเหลือ 5 วันจึงได้แค่แจ้งเตือน 7 วัน ไม่ได้ของ 90/30 ที่เลยมาแล้ว
+- ไล่ index ของ expire_date ทีละ chunk (keyset บน (expire_date, cert_id)):
+  อ่านขอบ chunk (และดูว่ามีแถวที่ยังไม่เตือนไหม) นอก transaction เขียน แล้ว
+  INSERT ... SELECT ... ON CONFLICT DO NOTHING ของ chunk นั้นแล้ว commit
+  → ถือ write lock แค่ช่วง insert ไม่เกิน GAP_EXPIRY_CHUNK แถว; chunk ที่เตือนครบแล้วข้ามไม่เขียนเลย
+- unique (cert_id, window_days) → สแกนซ้ำ / หลาย worker สแกนพร้อมกันก็ไม่เกิดแถวซ้ำ
+- app เริ่ม Runner (daemon thread) ตอน startup ทุก GAP_EXPIRY_SCAN_INTERVAL วินาที (0 = ปิด)
+- ความคืบหน้าอยู่ที่ GET /metrics (gap_cert_expiry_*)
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy import DateTime, Engine, Integer, func, literal, tuple_
+from sqlmodel import select
+
+import metrics
+from model import CertificationDB, FarmDB, NotificationOutboxDB
+
+
+log = logging.getLogger("gap.expiry")
+
+WINDOWS = tuple(int(w) for w in os.environ.get("GAP_EXPIRY_WINDOWS", "90,30,7").split(","))
+CHUNK = int(os.environ.get("GAP_EXPIRY_CHUNK", "2000"))
+SCAN_INTERVAL = int(os.environ.get("GAP_EXPIRY_SCAN_INTERVAL", "21600"))
+# พักหลัง chunk ที่เขียน ให้ writer ที่รอ lock อยู่ (busy handler ของ SQLite หลับเป็นช่วง) ได้คิว
+PAUSE = int(os.environ.get("GAP_EXPIRY_PAUSE_MS", "20")) / 1000
+
+OUTBOX_COLUMNS = ["cert_id", "window_days", "user_id", "farm_id", "expire_date", "created_at"]
+
+
+def bands(today: date, windows: Sequence[int] = WINDOWS):
+    """[(window, วันหมดอายุแรก, วันหมดอายุสุดท้าย)] เรียงจากช่วงแคบสุด ไม่ซ้อนกัน"""
+    out, lo = [], today
+    for w in sorted(set(windows)):
+        hi = today + timedelta(days=w)
+        out.append((w, lo, hi))
+        lo = hi + timedelta(days=1)
+    return out
+
+
+def _insert(engine: Engine):
+    name = engine.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"outbox insert not supported on {name}")
+    return insert
+
+
+def _key():
+    return tuple_(CertificationDB.expire_date, CertificationDB.cert_id)
+
+
+def _chunk_stmt(engine: Engine, window: int, cond, now: datetime):
+    src = (
+        select(
+            CertificationDB.cert_id, literal(window, Integer), FarmDB.user_id, CertificationDB.farm_id,
+            CertificationDB.expire_date, literal(now, DateTime),
+        )
+        .select_from(CertificationDB)
+        .outerjoin(FarmDB, FarmDB.farm_id == CertificationDB.farm_id)
+        .where(*cond)  # SQLite ต้องมี WHERE ก่อน ON CONFLICT ของ INSERT ... SELECT
+    )
+    return (
+        _insert(engine)(NotificationOutboxDB)
+        .from_select(OUTBOX_COLUMNS, src)
+        .on_conflict_do_nothing(index_elements=["cert_id", "window_days"])
+    )
+
+
+def scan(
+    engine: Engine,
+    today: Optional[date] = None,
+    windows: Sequence[int] = WINDOWS,
+    chunk: int = CHUNK,
+    stop: Optional[threading.Event] = None,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict:
+    """สแกนหนึ่งรอบ คืน {window: {matched, queued, chunks}} (queued = แถวใหม่ใน outbox)"""
+    today = today or date.today()
+    t0 = time.perf_counter()
+    out: Dict = {"today": today.isoformat(), "windows": {}}
+    result = "error"
+    try:
+        for window, lo, hi in bands(today, windows):
+            label = str(window)
+            band = CertificationDB.expire_date.between(lo, hi)
+            with engine.connect() as conn:
+                total = conn.execute(select(func.count()).select_from(CertificationDB).where(band)).scalar_one()
+            stats = out["windows"][window] = {"matched": 0, "queued": 0, "chunks": 0}
+            metrics.cert_expiry_progress.set(0 if total else 1, label)
+            after = None
+            while True:
+                if stop is not None and stop.is_set():
+                    result = "stopped"
+                    return out
+                cond = [band] if after is None else [band, _key() > tuple_(*after)]
+                # ขอบของ chunk + มีแถวที่ยังไม่อยู่ใน outbox ไหม: อ่านอย่างเดียว ไม่ถือ write lock
+                with engine.connect() as conn:
+                    keys = conn.execute(
+                        select(CertificationDB.expire_date, CertificationDB.cert_id,
+                               NotificationOutboxDB.notification_id.is_(None))
+                        .outerjoin(NotificationOutboxDB, (NotificationOutboxDB.cert_id == CertificationDB.cert_id)
+                                   & (NotificationOutboxDB.window_days == window))
+                        .where(*cond).order_by(CertificationDB.expire_date, CertificationDB.cert_id).limit(chunk)
+                    ).all()
+                if not keys:
+                    break
+                upto = tuple(keys[-1][:2])
+                queued = 0
+                if any(k[2] for k in keys):  # สแกนซ้ำ: chunk ที่เตือนครบแล้วไม่ต้องเขียน (ไม่แย่ง write lock)
+                    with engine.begin() as conn:
+                        queued = conn.execute(
+                            _chunk_stmt(engine, window, [*cond, _key() <= tuple_(*upto)], datetime.now(timezone.utc))
+                        ).rowcount
+                    if PAUSE:
+                        time.sleep(PAUSE)
+                after = upto
+                stats["matched"] += len(keys)
+                stats["queued"] += queued
+                stats["chunks"] += 1
+                metrics.cert_expiry_scanned.inc(label, amount=len(keys))
+                metrics.cert_expiry_queued.inc(label, amount=queued)
+                metrics.cert_expiry_chunks.inc(label)
+                metrics.cert_expiry_progress.set(min(1, stats["matched"] / total) if total else 1, label)
+                if progress:
+                    progress(f"{window}d: {stats['matched']}/{total} matched, {stats['queued']} queued")
+        result = "ok"
+        metrics.cert_expiry_last_success.set(time.time())
+        return out
+    finally:
+        out["seconds"] = round(time.perf_counter() - t0, 3)
+        metrics.cert_expiry_runs.inc(result)
+        metrics.cert_expiry_duration.observe(time.perf_counter() - t0)
+
+
+class Runner:
+    """scan() ทันทีหนึ่งรอบแล้วทุก interval วินาที ใน daemon thread"""
+
+    def __init__(self, engine: Engine, interval: float = SCAN_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="gap-cert-expiry", daemon=True)
+
+    def start(self) -> "Runner":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10) -> None:
+        # หยุดระหว่าง chunk ได้ ไม่ต้องรอจบทั้งรอบ
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                res = scan(self.engine, stop=self._stop)
+                log.info("certificate expiry scan: %s", res)
+            except Exception:
+                log.exception("certificate expiry scan failed")
+            self._stop.wait(self.interval)
+
+
+def start_runner(engine: Engine, interval: float = SCAN_INTERVAL) -> Optional[Runner]:
+    return Runner(engine, interval).start() if interval > 0 else None
+
+
+if __name__ == "__main__":
+    from data import engine, init_db
+
+    ap = argparse.ArgumentParser(description="certificate expiry scanner")
+    ap.add_argument("command", choices=["scan", "run"])
+    ap.add_argument("--today", type=date.fromisoformat, help="สแกนเหมือนวันนี้เป็นวันที่นี้ (YYYY-MM-DD)")
+    ap.add_argument("--windows", default=",".join(map(str, WINDOWS)))
+    ap.add_argument("--chunk", type=int, default=CHUNK)
+    ap.add_argument("--interval", type=int, default=SCAN_INTERVAL or 21600)
+    args = ap.parse_args()
+
+    init_db()
+    windows = [int(w) for w in args.windows.split(",")]
+    if args.command == "scan":
+        print(scan(engine, args.today, windows, args.chunk, progress=print))
+    else:
+        logging.basicConfig(level=logging.INFO)
+        try:
+            while True:
+                log.info("certificate expiry scan: %s", scan(engine, args.today, windows, args.chunk))
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
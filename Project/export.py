@@ -0,0 +1,170 @@
+"""ส่งออกข้อมูลทั้งตารางเป็น CSV / NDJSON แบบ stream (GET /export/{entity})
+
+อ่านด้วย yield_per (server-side cursor บน Postgres, fetchmany บน SQLite) แล้วเขียนออกทีละชุด
+หน่วยความจำจึงคงที่ไม่ขึ้นกับขนาดตาราง ไม่สร้าง ORM object และไม่ประกอบ JSON array ทั้งก้อน
+
+entity:
+- personals         เกษตรกร
+- farms             ฟาร์ม + ชื่อ/ที่อยู่เจ้าของ
+- gap-requests      คำขอ GAP + ที่อยู่เจ้าของฟาร์ม
+- certifications    เกียรติบัตร + ที่อยู่เจ้าของฟาร์ม
+- certified-farms   ฟาร์ม + เจ้าของ + เกียรติบัตรล่าสุด (JOIN ครั้งเดียว ไม่ lookup ทีละแถว)
+
+ตัวกรอง: province (ของเจ้าของ), since/until (ช่วงวันที่ของ entity รวมปลาย), status
+(timeline_status ของคำขอ หรือ valid/expired ของเกียรติบัตร)
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from model import CertificationDB, FarmDB, GAPRequestDB, PersonalDB
+
+
+YIELD_PER = 1000
+CERT_STATUSES = ("valid", "expired")
+
+_owner = FarmDB.user_id == PersonalDB.user_id
+
+
+@dataclass(frozen=True)
+class Export:
+    build: Callable[[], object]  # → select ของคอลัมน์ที่ส่งออก เรียงตาม key
+    date_col: Optional[object] = None  # คอลัมน์ที่ since/until กรอง
+    status: Optional[str] = None  # "timeline" / "cert" / None = ไม่รับ status
+
+
+def _owner_cols():
+    return (
+        PersonalDB.name.label("owner_name"), PersonalDB.surname.label("owner_surname"),
+        PersonalDB.province, PersonalDB.district,
+    )
+
+
+def _personals():
+    return select(*PersonalDB.__table__.c).order_by(PersonalDB.user_id)
+
+
+def _farms():
+    return (
+        select(*FarmDB.__table__.c, *_owner_cols())
+        .outerjoin(PersonalDB, _owner).order_by(FarmDB.farm_id)
+    )
+
+
+def _gap_requests():
+    # ระบุคอลัมน์เอง: claimed_by / claim_expires_at เป็นสถานะภายในของคิวผู้ตรวจ ไม่ออกไปกับไฟล์ export
+    return (
+        select(GAPRequestDB.request_id, GAPRequestDB.farm_id, GAPRequestDB.request_date, GAPRequestDB.timeline_status,
+               FarmDB.user_id, PersonalDB.province, PersonalDB.district)
+        .outerjoin(FarmDB, FarmDB.farm_id == GAPRequestDB.farm_id)
+        .outerjoin(PersonalDB, _owner).order_by(GAPRequestDB.request_id)
+    )
+
+
+def _certifications():
+    return (
+        select(*CertificationDB.__table__.c, FarmDB.user_id, PersonalDB.province, PersonalDB.district)
+        .outerjoin(FarmDB, FarmDB.farm_id == CertificationDB.farm_id)
+        .outerjoin(PersonalDB, _owner).order_by(CertificationDB.cert_id)
+    )
+
+
+def _latest_cert():
+    # เกียรติบัตรล่าสุดของแต่ละฟาร์ม (issue_date ใหม่สุด, ซ้ำวันใช้ cert_id มากสุด)
+    rank = func.row_number().over(
+        partition_by=CertificationDB.farm_id,
+        order_by=(CertificationDB.issue_date.desc(), CertificationDB.cert_id.desc()),
+    ).label("rank")
+    return select(*CertificationDB.__table__.c, rank).subquery("latest_cert")
+
+
+_latest = _latest_cert()
+
+
+def _certified_farms():
+    return (
+        select(
+            *FarmDB.__table__.c, *_owner_cols(), PersonalDB.phone_number,
+            _latest.c.cert_id, _latest.c.request_id, _latest.c.issue_date, _latest.c.expire_date,
+            _latest.c.cert_file,
+        )
+        .join(_latest, (_latest.c.farm_id == FarmDB.farm_id) & (_latest.c.rank == 1))
+        .outerjoin(PersonalDB, _owner).order_by(FarmDB.farm_id)
+    )
+
+
+ENTITIES = {
+    "personals": Export(_personals),
+    "farms": Export(_farms),
+    "gap-requests": Export(_gap_requests, GAPRequestDB.request_date, "timeline"),
+    "certifications": Export(_certifications, CertificationDB.issue_date, "cert"),
+    "certified-farms": Export(_certified_farms, _latest.c.issue_date, "cert"),
+}
+
+
+def build(
+    entity: str,
+    province: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    status: Optional[str] = None,
+    today: Optional[date] = None,
+):
+    """select ที่กรองแล้ว; ValueError ถ้าตัวกรองใช้กับ entity นี้ไม่ได้"""
+    spec = ENTITIES[entity]
+    stmt = spec.build()
+    if province is not None:
+        stmt = stmt.where(PersonalDB.province == province)
+    if since is not None or until is not None:
+        if spec.date_col is None:
+            raise ValueError(f"{entity} has no date to filter by")
+        if since is not None:
+            stmt = stmt.where(spec.date_col >= since)
+        if until is not None:
+            stmt = stmt.where(spec.date_col <= until)
+    if status is not None:
+        if spec.status == "timeline":
+            stmt = stmt.where(GAPRequestDB.timeline_status == status)
+        elif spec.status == "cert" and status in CERT_STATUSES:
+            expire = stmt.selected_columns.expire_date
+            today = today or date.today()
+            stmt = stmt.where(expire >= today if status == "valid" else expire < today)
+        else:
+            allowed = "any timeline_status" if spec.status == "timeline" else " / ".join(CERT_STATUSES)
+            raise ValueError(f"status for {entity}: {allowed}" if spec.status else f"{entity} has no status")
+    return stmt
+
+
+def _json_default(v):
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v)
+
+
+def stream(engine, stmt, fmt: str = "csv", yield_per: int = YIELD_PER) -> Iterator[str]:
+    """generator ถือ Session เอง (ทำงานหลัง handler return แล้ว); หนึ่ง chunk ต่อ yield_per แถว"""
+    with Session(engine) as session:
+        result = session.exec(stmt.execution_options(yield_per=yield_per))
+        keys = list(result.keys())
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(keys)
+            for rows in result.partitions():
+                writer.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0); buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=_json_default) + "\n"
+                    for row in rows
+                )
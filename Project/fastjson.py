@@ -0,0 +1,67 @@
+"""โหมดตอบกลับเร็วสำหรับ endpoint ที่คืนรายการยาว (เปิดด้วย GAP_FAST_JSON=1)
+
+ปกติ FastAPI จะ validate ค่าที่ handler คืนผ่าน response_model อีกรอบ แล้ว jsonable_encoder
++ json.dumps ของ stdlib — กิน CPU ส่วนใหญ่ของ endpoint ที่คืนหลายร้อยแถว
+handler ที่ข้อมูลมาจาก query ของเราเอง (tuple จาก Core select, dict จาก rubric) ปลอดภัยอยู่แล้ว
+จึงข้ามขั้นนั้นได้:
+
+    return fastjson.respond(rows, response)   # ปิดอยู่ → คืน rows ให้ FastAPI ทำตามปกติ
+
+- encoder: orjson ถ้าติดตั้ง (pip install orjson) ไม่งั้น json ของ stdlib แบบไม่เว้นวรรค
+- header ที่ handler ตั้งไว้บน response (ETag, Cache-Control) ถูกคัดลอกไปด้วย
+- OpenAPI ยังแสดง response_model เดิม
+
+วัดผล:  python -m bench.serialize
+"""
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Optional
+
+from fastapi import Response
+
+
+enabled = os.environ.get("GAP_FAST_JSON", "0").lower() in ("1", "true", "yes", "on")
+
+try:
+    import orjson
+except ImportError:  # ไม่บังคับ
+    orjson = None
+
+
+def _default(v):
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    if isinstance(v, Enum):
+        return v.value
+    if hasattr(v, "_asdict"):  # Row / NamedTuple
+        return v._asdict()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+_SKIP_HEADERS = {"content-length", "content-type"}
+
+
+def respond(content: Any, response: Optional[Response] = None):
+    """ตอบด้วย FastJSONResponse (ข้าม response_model) เมื่อเปิดโหมดเร็ว ไม่งั้นคืน content ตามเดิม"""
+    if not enabled:
+        return content
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in _SKIP_HEADERS}
+    status = response.status_code if response is not None and response.status_code else 200
+    return FastJSONResponse(content, status_code=status, headers=headers)
@@ -0,0 +1,74 @@
+"""conditional GET: ETag / Last-Modified / Cache-Control ของ response ที่ client แคชได้
+
+    headers = httpcache.master_headers(rubric)       # หรือ user_headers(rubric, user_id, summary)
+    if httpcache.is_fresh(request, headers):
+        return httpcache.not_modified(headers)      # 304 ไม่ต้อง query/serialize ต่อ
+    response.headers.update(headers)
+
+- master data (หมวด/กิจกรรม): public ให้ edge proxy แคชได้ GAP_MASTER_MAX_AGE วินาที (ค่าเริ่มต้น 300)
+- ข้อมูลราย user: private, no-cache → เก็บไว้ที่เครื่องได้แต่ต้องถามซ้ำทุกครั้ง (ได้ 304 ถ้าไม่เปลี่ยน)
+"""
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from evaluation import view_etag
+from model import EvaluationSummaryDB
+from rubric import Rubric, master_etag
+
+
+MASTER_MAX_AGE = int(os.environ.get("GAP_MASTER_MAX_AGE", "300"))
+MASTER_CACHE_CONTROL = f"public, max-age={MASTER_MAX_AGE}"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite คืน datetime แบบไม่มี timezone (เก็บเป็น UTC อยู่แล้ว)
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).astimezone(timezone.utc).replace(microsecond=0)
+
+
+def latest(*stamps: Optional[datetime]) -> Optional[datetime]:
+    stamps = [_utc(s) for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+
+def validators(etag: str, last_modified: Optional[datetime], cache_control: str) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_fresh(request: Request, headers: Dict[str, str]) -> bool:
+    """If-None-Match มีก่อน If-Modified-Since (RFC 9110 §13.2.2)"""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        etag = headers["ETag"]
+        tags = {t.strip() for t in inm.split(",")}
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    ims = request.headers.get("if-modified-since")
+    if ims and "Last-Modified" in headers:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return _utc(parsedate_to_datetime(headers["Last-Modified"])) <= _utc(since)
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def master_headers(rubric: Rubric) -> Dict[str, str]:
+    """หมวด / กิจกรรม: เปลี่ยนเมื่อ TableVersionDB["master"] เปลี่ยน"""
+    return validators(master_etag(rubric), rubric.updated_at, MASTER_CACHE_CONTROL)
+
+
+def user_headers(rubric: Rubric, user_id, summary: Optional[EvaluationSummaryDB]) -> Dict[str, str]:
+    """with-status / evaluate: master data + answer_version ของ user"""
+    last_modified = latest(rubric.updated_at, summary.updated_at if summary else None)
+    return validators(view_etag(rubric, user_id, summary), last_modified, PRIVATE_CACHE_CONTROL)
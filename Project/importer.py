@@ -0,0 +1,237 @@
+"""นำเข้าเกษตรกร / ฟาร์ม / ทุเรียน จำนวนมากจาก CSV หรือ XLSX (POST /import/{kind} และ CLI)
+
+    python importer.py personals farmers.csv
+    python importer.py farms farms.xlsx --batch 5000
+
+- แถวแรกเป็นชื่อคอลัมน์ตามฟิลด์ของ Personal / Farm / Durian ใน model.py
+- farms / durians ระบุเจ้าของด้วยคอลัมน์ id_number (เลขบัตรประชาชน) หรือ user_id
+  แปลง id_number → user_id ด้วย query เดียวต่อชุด ไม่ใช่ทีละแถว
+- อ่านทีละแถว ตรวจด้วย Pydantic แล้วเขียนทีละชุด (executemany + commit ต่อชุด)
+- แถวที่ผิดถูกรายงานพร้อมเลขแถว (แถวหัวตาราง = 1) แถวอื่นในชุดยังเข้าได้ตามปกติ
+- personals: id_number ต้องไม่ซ้ำกับที่มีอยู่/ในไฟล์; เติม trigram ค้นชื่อและ rollup ของ dashboard ด้วย
+
+XLSX ต้องติดตั้ง openpyxl (ไม่บังคับ ถ้าใช้แค่ CSV); ไฟล์ที่ไม่ใช่ XLSX → zipfile.BadZipFile
+"""
+import argparse
+import codecs
+import csv
+import sys
+import zipfile
+from collections import Counter
+from datetime import date, datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Engine, insert
+from sqlmodel import Session, select
+
+import rollup
+from model import Durian, DurianDB, Farm, FarmDB, Personal, PersonalDB
+from person_search import index_people
+
+
+BATCH = 5000
+MAX_ERRORS = 1000  # เก็บรายละเอียดไว้เท่านี้ (นับทั้งหมดใน failed)
+
+KINDS: Dict[str, Tuple[type, type]] = {
+    "personals": (Personal, PersonalDB),
+    "farms": (Farm, FarmDB),
+    "durians": (Durian, DurianDB),
+}
+
+
+# ---------------- อ่านไฟล์ ----------------
+def _cell(v):
+    # ค่าจาก XLSX เป็นชนิดจริง → ให้ Pydantic แปลงจากข้อความเหมือน CSV
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    if isinstance(v, datetime):
+        v = v.date() if not v.time() else v
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v).strip()
+
+
+def read_csv(stream: IO[bytes]) -> Iterator[dict]:
+    """อ่าน CSV (UTF-8 มีหรือไม่มี BOM) จาก binary stream ทีละแถว"""
+    text = codecs.getreader("utf-8-sig")(stream)
+    for row in csv.DictReader(text):
+        yield {k.strip(): _cell(v) for k, v in row.items() if k}
+
+
+def read_xlsx(stream: IO[bytes]) -> Iterator[dict]:
+    """sheet แรกของ XLSX แบบ read-only (ไม่โหลดทั้งไฟล์เข้า memory)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("XLSX import requires openpyxl (pip install openpyxl)")
+    try:
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    except KeyError as e:  # zip ที่ไม่ใช่ workbook (ไม่มี [Content_Types].xml / workbook.xml)
+        raise zipfile.BadZipFile(f"not an XLSX workbook: {e}") from e
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        for values in rows:
+            if any(v is not None for v in values):
+                yield {k: _cell(v) for k, v in zip(header, values) if k}
+    finally:
+        wb.close()
+
+
+READERS = {"csv": read_csv, "xlsx": read_xlsx}
+
+
+# ---------------- นำเข้า ----------------
+class ImportReport:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, row: int, *messages: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "errors": list(messages)})
+
+    def as_dict(self) -> dict:
+        return {"kind": self.kind, "rows": self.rows, "inserted": self.inserted,
+                "failed": self.failed, "errors": sorted(self.errors, key=lambda e: e["row"])}
+
+
+def _messages(e: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+
+def _validate(model: type, line: int, raw: dict, report: ImportReport) -> Optional[BaseModel]:
+    try:
+        # ช่องว่าง = ไม่มีค่า (ฟิลด์ Optional เป็น None, ฟิลด์บังคับแจ้ง error)
+        return model(**{k: v for k, v in raw.items() if v not in (None, "")})
+    except ValidationError as e:
+        report.fail(line, *_messages(e))
+        return None
+
+
+def _existing_ids(session: Session, id_numbers: Iterable[str]) -> Dict[str, List[int]]:
+    out: Dict[str, List[int]] = {}
+    ids = list(set(id_numbers))
+    if ids:
+        for id_number, user_id in session.exec(
+            select(PersonalDB.id_number, PersonalDB.user_id).where(PersonalDB.id_number.in_(ids))
+        ):
+            out.setdefault(id_number, []).append(user_id)
+    return out
+
+
+def _import_personals(session: Session, batch: List[Tuple[int, dict]], report: ImportReport, seen: set) -> None:
+    valid: List[Tuple[int, Personal]] = []
+    for line, raw in batch:
+        item = _validate(Personal, line, raw, report)
+        if item is not None:
+            valid.append((line, item))
+    existing = _existing_ids(session, (item.id_number for _, item in valid))
+    rows = []
+    for line, item in valid:
+        if item.id_number in existing or item.id_number in seen:
+            report.fail(line, f"id_number: {item.id_number} already exists")
+            continue
+        seen.add(item.id_number)
+        rows.append(item.model_dump())
+    if not rows:
+        return
+    session.connection().execute(insert(PersonalDB), rows)  # Core executemany (ไม่ผ่าน ORM bulk)
+    # executemany ไม่คืน id → อ่านกลับด้วย id_number (index) เพื่อทำ trigram / rollup
+    people = session.exec(
+        select(PersonalDB.user_id, PersonalDB.name, PersonalDB.surname, PersonalDB.province, PersonalDB.district)
+        .where(PersonalDB.id_number.in_([r["id_number"] for r in rows]))
+    ).all()
+    index_people(session, people, new=True)
+    rollup.bump(session, Counter(rollup.key("farmers", (p.province, p.district)) for p in people))
+    report.inserted += len(rows)
+
+
+def _import_owned(session: Session, model: type, table: type, batch: List[Tuple[int, dict]],
+                  report: ImportReport) -> None:
+    owners = _existing_ids(session, (raw["id_number"] for _, raw in batch if raw.get("id_number")))
+    valid: List[Tuple[int, BaseModel]] = []
+    for line, raw in batch:
+        id_number = raw.get("id_number")
+        if id_number:
+            found = owners.get(id_number, [])
+            if len(found) != 1:
+                report.fail(line, f"id_number: {id_number} " + ("not found" if not found else "matches several users"))
+                continue
+            raw = {**raw, "user_id": found[0]}
+        item = _validate(model, line, raw, report)
+        if item is not None:
+            valid.append((line, item))
+    # user_id เป็น foreign key → แถวที่อ้าง user ที่ไม่มีจะทำให้ทั้งชุด insert ไม่ได้ จึงตัดออกก่อน
+    ids = list({item.user_id for _, item in valid})
+    known = set(session.exec(select(PersonalDB.user_id).where(PersonalDB.user_id.in_(ids))).all()) if ids else set()
+    rows = []
+    for line, item in valid:
+        if item.user_id not in known:
+            report.fail(line, f"user_id: {item.user_id} not found")
+            continue
+        rows.append(item.model_dump())
+    if rows:
+        session.connection().execute(insert(table), rows)
+        report.inserted += len(rows)
+
+
+def import_rows(engine: Engine, kind: str, rows: Iterable[dict], batch: int = BATCH) -> dict:
+    """นำเข้าแถว (dict ชื่อคอลัมน์ → ค่า) ทีละ batch ต่อ transaction"""
+    model, table = KINDS[kind]
+    report = ImportReport(kind)
+    seen: set = set()  # id_number ที่นำเข้าไปแล้วในไฟล์นี้
+
+    def flush(pending):
+        with Session(engine) as session:
+            if kind == "personals":
+                _import_personals(session, pending, report, seen)
+            else:
+                _import_owned(session, model, table, pending, report)
+            session.commit()
+
+    pending: List[Tuple[int, dict]] = []
+    for n, raw in enumerate(rows):
+        report.rows += 1
+        pending.append((n + 2, raw))  # แถวที่ 1 = หัวตาราง
+        if len(pending) >= batch:
+            flush(pending)
+            pending = []
+    if pending:
+        flush(pending)
+    return report.as_dict()
+
+
+def import_file(engine: Engine, kind: str, stream: IO[bytes], fmt: str = "csv", batch: int = BATCH) -> dict:
+    return import_rows(engine, kind, READERS[fmt](stream), batch)
+
+
+if __name__ == "__main__":
+    import time
+
+    from data import engine, init_db
+
+    ap = argparse.ArgumentParser(description="bulk import from CSV/XLSX")
+    ap.add_argument("kind", choices=sorted(KINDS))
+    ap.add_argument("path")
+    ap.add_argument("--batch", type=int, default=BATCH)
+    args = ap.parse_args()
+
+    init_db()
+    fmt = "xlsx" if args.path.lower().endswith(".xlsx") else "csv"
+    t0 = time.perf_counter()
+    with open(args.path, "rb") as f:
+        res = import_file(engine, args.kind, f, fmt, args.batch)
+    elapsed = time.perf_counter() - t0
+    for err in res["errors"]:
+        print(f"row {err['row']}: {'; '.join(err['errors'])}", file=sys.stderr)
+    print(f"{res['kind']}: {res['inserted']}/{res['rows']} rows imported, {res['failed']} failed "
+          f"in {elapsed:.1f}s ({res['rows'] / max(elapsed, 1e-9):.0f} rows/s)")
+    sys.exit(1 if res["failed"] else 0)
@@ -1,38 +1,96 @@
+import csv
+import json
+import tempfile
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import date
 from typing import List, Optional, Dict, Literal
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select, desc
-from data import engine, init_db
+from data import ASYNC_DB, engine, init_db, profile as db_profile
+import blobstore
+import expiry
+import export
+import fastjson
+import httpcache
+import importer
+import metrics
+import seed
+import workqueue
+from metrics import MetricsMiddleware
+from querybudget import QueryBudgetMiddleware, budget
+from rubric import ANSWER_STATUS_COLUMNS, get_rubric, with_status, cache as rubric_cache
+from person_search import index_people, search_fuzzy, search_prefix
+import rollup
+from search import search_activity_ids, search_answers
+from paging import PAGE_LIMIT, PAGE_LIMIT_MAX, columns, keyset_page, keyset_result
+from evaluation import (
+    BATCH_CHUNK, answer_etag, apply_changes, apply_changes_many, evaluate_many, evaluate_user, for_update,
+    get_summary, lock_users, user_id_page,
+)
 from model import (
     # core
-    PersonalDB, Personal, PersonalOut, PersonalUpdate,
+    PersonalDB, Personal, PersonalOut, PersonalUpdate, PersonalHit,
     FarmDB, Farm, FarmOut, FarmUpdate,
     DurianDB, Durian, DurianOut,DurianUpdate,
 
 
     # assess
-    AssessmentCategoryDB, AssessmentCategoryOut,
-    ActivityDB, ActivityOut, ActivityLevel, ActivitySearch,
-    AnswerDB, Answer, AnswerOut,
-    CriteriaDB,
+    AssessmentCategoryOut,
+    ActivityOut, ActivityLevel, ActivitySearch, AnswerSearch,
+    AnswerDB, Answer, AnswerOut, ScoreItem, EvaluateBatch,
+    AnswerSheet, AnswerSheetItem, AnswerBulkItemResult, AnswerBulkResult, EvaluationSummaryDB,
 
 
     # agreement & lifecycle
     AgreementDB, Agreement, AgreementOut,
     AgreementAnswerDB, AgreementAnswer, AgreementAnswerOut,
-    GAPRequestDB, GAPRequest, GAPRequestOut,
+    GAPRequestDB, GAPRequest, GAPRequestOut, GAPRequestClaim, GapStatus,
     InspectionDB, Inspection, InspectionOut,
     CertificationDB, Certification, CertificationOut,
+
+
+    # pagination
+    Page, CursorPage, PersonalBasic,
+
+    # files
+    BlobDB, BlobOut,
+
+    # import
+    ImportResult,
+
+    # overview
+    UserOverview,
 )
 
 
-app = FastAPI(title="GAP Durian Assessment API", version="1.3.0")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # สแกนเกียรติบัตรใกล้หมดอายุเป็นระยะ (GAP_EXPIRY_SCAN_INTERVAL=0 ปิด เช่นเมื่อรัน expiry.py ผ่าน cron แทน)
+    # SQLite :memory: แยก DB ต่อ thread → thread ของ runner จะไม่เห็นตาราง
+    runner = None if db_profile.in_memory else expiry.start_runner(engine)
+    yield
+    if runner is not None:
+        runner.stop()
+
+
+app = FastAPI(title="GAP Durian Assessment API", version="1.3.0", lifespan=lifespan)
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(MetricsMiddleware)
 init_db()
 
 
 
 
+
 # ---------------- helpers ----------------
-def _ensure_user(session: Session, user_id: str):
+def _ensure_user(session: Session, user_id: int):
     if session.get(PersonalDB, user_id) is None:
         raise HTTPException(404, "User not found")
 
@@ -48,128 +106,155 @@ def _score01(v: Optional[int]):
 
 # ---------------- seed master ----------------
 @app.post("/seed/master", tags=["Master/Seed"])
+@budget(7)
 def seed_master():
     with Session(engine) as session:
-        if session.exec(select(AssessmentCategoryDB)).first():
+        if not seed.seed_master(session):
             return {"message": "Already seeded"}
+        return {"message": "seeded"}
 
 
-        cats = [
-            "การจัดการน้ำ", "การจัดการที่ดิน", "การใช้ปุ๋ยและยา",
-            "ยานพาหนะและอุปกรณ์", "การเก็บเกี่ยว", "การพักผลผลิต",
-            "สถานที่ต่างๆ", "ผู้ปฏิบัติงาน"
-        ]
-        for name in cats:
-            session.add(AssessmentCategoryDB(category_name=name))
-        session.commit()
-
-
-        specs = [
-            # 1–7 (cat1)
-            (1,"แหล่งน้ำที่ใช้ในการปลูกมาจากไหน?", "Major"),
-            (1,"อัปโหลดรูปภาพ แหล่งน้ํา การเพาะปลูก", "Major"),
-            (1,"แหล่งน้ําที่ใช้ในการปลูกทุเรียนผ่านการบําบัดมาก่อนหรือไม่?", "Major"),
-            (1,"อัปโหลดรูปภาพการบำบัดน้ำ", "Major"),
-            (1,"แหล่งน้ำที่ใช้หลังจากเก็บเกี่ยวผลผลิตมาจากไหน?", "Major"),
-            (1,"มีเก็บตัวอย่างน้ำวิเคราะห์การปนเปื้อนในระยะเริ่มการผลิตหรือไม่?", "Minor"),
-            (1,"วิธีที่ใช้บำบัดน้ำเสียคืออะไร?", "Minor"),
-            # 8–15 (cat2)
-            (2,"พื้นที่เพาะปลูกของคุณไม่เสี่ยงต่อการปนเปื้อนวัตถุหรือสิ่งอันตรายใช่หรือไม่?", "Major"),
-            (2,"ถ้าพื้นที่ของคุณมีความเสี่ยง คุณมีการบำบัดให้อยู่ในระดับปลอดภัยหรือไม่?", "Major"),
-            (2,"พื้นที่ปลูกเป็นไปตามข้อกำหนดของกฎหมายที่เกี่ยวข้องหรือไม่?", "Major"),
-            (2,"มีการบันทึกการใช้สารเคมีกับพื้นที่ปลูก ครบถ้วนหรือไม่?", "Major"),
-            (2,"มีการเก็บตัวอย่างดินเพื่อตรวจวิเคราะห์การปนเปื้อนในระยะเริ่มต้น และมีใบแจ้งผลวิเคราะห์ยืนยันหรือไม่?", "Minor"),
-            (2,"พื้นที่ปลูกใหม่ไม่ส่งผลกระทบต่อสิ่งแวดล้อม หรือมีมาตรการป้องกันผลกระทบไว้แล้วใช่หรือไม่?", "Minor"),
-            (2,"แนบรูปผังแปลง พร้อมคำอธิบายว่าคำนึงถึงสิ่งแวดล้อมอย่างไร", "Minor"),
-            (2,"มีการจัดทำรหัสแปลงปลูกและข้อมูลประจำแปลง ครบถ้วน", "Minor"),
-            # 16–21 (cat3)
-            (3,"คุณใช้สิ่งขับถ่ายของคนเป็นปุ๋ยหรือไม่?", "Major"),
-            (3,"ใช้สารเคมีตามคำแนะนำ และหยุดใช้ก่อนเก็บเกี่ยวตามฉลากหรือไม่?", "Major"),
-            (3,"หากเคยตรวจพบสารพิษตกค้างเกินค่ามาตรฐาน มีการป้องกันซ้ำหรือไม่?", "Major"),
-            (3,"ใช้วัตถุอันตรายที่ห้ามตามกฎหมายหรือไม่?", "Major"),
-            (3,"ส่งออกปฏิบัติตามข้อกำหนดประเทศคู่ค้าหรือไม่?", "Major"),
-            (3,"เลือกใช้ปุ๋ย/ปรับปรุงดินที่ขึ้นทะเบียนหรือไม่?", "Minor"),
-            # 22–26 (cat4)
-            (4,"วัสดุสัมผัสผลผลิตไม่ก่อปนเปื้อนหรือไม่?", "Major"),
-            (4,"ล้างอุปกรณ์ทุกครั้งและจัดการน้ำล้างถูกต้องหรือไม่?", "Major"),
-            (4,"ภาชนะของเสีย/สารเคมี/ปุ๋ย แยกจากภาชนะเก็บเกี่ยวหรือไม่?", "Minor"),
-            (4,"ตรวจสอบเครื่องมือที่ต้องการความแม่นยำอย่างน้อยปีละครั้งหรือไม่?", "Minor"),
-            (4,"สถานที่ปฏิบัติงานมีสุขลักษณะเพียงพอหรือไม่?", "Minor"),
-            # 27–30 (cat5)
-            (5,"เก็บเกี่ยวเมื่ออายุเหมาะสม/ตามข้อกำหนด", "Major"),
-            (5,"คัดแยกผลผลิตไม่ได้คุณภาพออกก่อนส่ง", "Minor"),
-            (5,"มีวิธีป้องกันการเสื่อมคุณภาพก่อนขนส่ง", "Minor"),
-            (5,"มีการดูแลก่อนขนส่ง", "Minor"),
-            # 31 (cat6)
-            (6,"ผลผลิตที่คัดเลือก/บรรจุ/พัก ไม่สัมผัสพื้นดินโดยตรง", "Minor"),
-            # 32–38 (cat7)
-            (7,"มีที่เก็บสารเคมีเฉพาะ แยกชนิด ป้องกันปนเปื้อน", "Major"),
-            (7,"สารเคมีเหลือใช้ปิดฝาสนิท/ติดข้อมูลครบ", "Minor"),
-            (7,"กำจัดภาชนะสารเคมีหมดแล้วอย่างถูกต้อง", "Minor"),
-            (7,"ภาชนะหมดอายุ/เสื่อมสภาพถูกแยกเก็บ/ทำลายถูกต้อง", "Minor"),
-            (7,"ที่เก็บภาชนะ/อุปกรณ์ แยกจากสารเคมี/ปุ๋ย และกันสัตว์พาหะ", "Minor"),
-            (7,"มีมาตรการกันสัตว์เลี้ยงในพื้นที่ปฏิบัติงาน", "Minor"),
-            (7,"พื้นที่จัดการปุ๋ย/ปรับปรุงดิน/หมักอินทรีย์ เป็นสัดส่วน", "Minor"),
-            (7,"สถานที่พัก/ขนย้าย/เก็บรักษา มีสุขลักษณะ", "Minor"),
-            # 39–46 (cat8)
-            (8,"จัดการสุขลักษณะป้องกันปนเปื้อน", "Major"),
-            (8,"ผู้สัมผัสผลผลิตดูแลสุขลักษณะ", "Major"),
-            (8,"มีความรู้สารเคมีและวิธีใช้", "Major"),
-            (8,"ตรวจสุขภาพประจำปี", "Minor"),
-            (8,"รู้สุขลักษณะส่วนบุคคล", "Minor"),
-            (8,"รู้การปฐมพยาบาลเบื้องต้น", "Minor"),
-            (8,"สวมอุปกรณ์ป้องกันครบ", "Minor"),
-            (8,"อาบน้ำเปลี่ยนเสื้อผ้าหลังฉีดพ่น", "Minor"),
-        ]
-        for cid, name, typ in specs:
-            session.add(ActivityDB(categoryapp_id=cid, activity_name=name, activity_type=ActivityLevel(typ)))
-        session.commit()
 
 
-        major_req = {1:5, 2:4, 3:5, 4:2, 5:1, 6:0, 7:1, 8:3}
-        for cid, req in major_req.items():
-            session.add(CriteriaDB(categoryapp_id=cid, activity_type=ActivityLevel.Major, score_require=req))
-        session.add(CriteriaDB(categoryapp_id=None, activity_type=ActivityLevel.Minor, score_require=16))
-        session.commit()
-        return {"message": "seeded"}
+# ---------------- Files ----------------
+@app.post("/files", response_model=BlobOut, status_code=201, tags=["Files"])
+@budget(3, repeat=2)
+async def upload_file(request: Request, filename: Optional[str] = None):
+    """อัปโหลดไฟล์เป็น raw body (ไม่ใช่ multipart) เช่น
+    ``curl --data-binary @idcard.jpg /files?filename=idcard.jpg``
+
+    เขียนลงดิสก์ทีละ chunk ไม่โหลดทั้งไฟล์เข้า memory; ได้ blob_id ไปใส่ใน *_file
+    content_type ตรวจจากเนื้อไฟล์ (blobstore.sniff_type) ไม่ใช้ header Content-Type ของ request
+    """
+    writer = blobstore.store.writer()
+    try:
+        async for chunk in request.stream():
+            if writer.size + len(chunk) > blobstore.MAX_BYTES:
+                raise HTTPException(413, f"File larger than {blobstore.MAX_BYTES} bytes")
+            if chunk:
+                await run_in_threadpool(writer.write, chunk)
+        if writer.size == 0:
+            raise HTTPException(422, "Empty file")
+        blob_id, _created = await run_in_threadpool(writer.commit)
+    except BaseException:
+        writer.abort()
+        raise
+    content_type = blobstore.sniff_type(writer.head)
+    return await run_in_threadpool(_register_blob, blob_id, writer.size, content_type, filename)
+
+
+def _register_blob(blob_id: str, size: int, content_type: str, filename: Optional[str]) -> BlobOut:
+    with Session(engine) as session:
+        row = session.get(BlobDB, blob_id)
+        if row is None:
+            try:
+                row = BlobDB(blob_id=blob_id, size=size, content_type=content_type, filename=filename)
+                session.add(row); session.commit(); session.refresh(row)
+                return BlobOut(**row.model_dump())
+            except IntegrityError:  # อัปโหลดไฟล์เดียวกันพร้อมกัน
+                session.rollback()
+                row = session.get(BlobDB, blob_id)
+        # filename ของแถวเป็นของผู้อัปโหลดคนแรก → ตอบชื่อที่ request นี้ส่งมา
+        return BlobOut(**row.model_dump(exclude={"filename"}), filename=filename, deduplicated=True)
+
+
+@app.get("/files/{blob_id}", tags=["Files"])
+@budget(1)
+def download_file(blob_id: str):
+    """รองรับ Range (ดาวน์โหลดต่อ/ดูบางส่วน); server ที่รองรับ pathsend จะส่งไฟล์แบบ zero-copy"""
+    if not blobstore.is_blob_id(blob_id):
+        raise HTTPException(404, "File not found")
+    with Session(engine) as session:
+        row = session.get(BlobDB, blob_id)
+    if row is None or not blobstore.store.exists(blob_id):
+        raise HTTPException(404, "File not found")
+    # แถวเก่าอาจเก็บ Content-Type ที่ผู้อัปโหลดส่งมาเอง (เช่น text/html) → เปิดในหน้าได้เฉพาะชนิดใน INLINE_TYPES
+    # ชื่อไฟล์มาจาก blob_id ไม่ใช่ชื่อของผู้อัปโหลดคนแรก (ไฟล์เดียวกันใช้ร่วมกันหลายคน)
+    ext = blobstore.INLINE_TYPES.get(row.content_type)
+    media_type = row.content_type if ext else blobstore.OCTET_STREAM
+    disposition = "inline" if ext else "attachment"
+    # เนื้อหาไม่เปลี่ยนตาม blob_id → cache ได้ตลอด
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{blob_id}"',
+        "X-Content-Type-Options": "nosniff",
+        "Content-Disposition": f'{disposition}; filename="{blob_id}{ext or ".bin"}"',
+    }
+    path = blobstore.store.local_path(blob_id)
+    if path is None:  # backend ที่ไม่ใช่ดิสก์ในเครื่อง
+        f = blobstore.store.open(blob_id)
+        chunks = iter(lambda: f.read(blobstore.CHUNK_SIZE), b"")
+        return StreamingResponse(chunks, media_type=media_type, headers=headers,
+                                 background=BackgroundTask(f.close))
+    return FileResponse(path, media_type=media_type, headers=headers)
 
 
 
 
 # ---------------- Personal ----------------
 @app.post("/personals", response_model=PersonalOut, status_code=201, tags=["Users"])
+@budget(5)
 def create_personal(item: Personal):
     with Session(engine) as session:
         row = PersonalDB(**item.model_dump())
-        session.add(row); session.commit(); session.refresh(row)
+        session.add(row); session.flush()
+        index_people(session, [row])
+        rollup.bump(session, {rollup.key("farmers", (row.province, row.district)): 1})
+        session.commit(); session.refresh(row)
         return row
 
+@app.get("/personals/search", response_model=CursorPage[PersonalHit], tags=["Users"])
+@budget(2)
+def search_personals(
+    q: str = Query(..., min_length=1),
+    mode: Literal["prefix", "fuzzy"] = "prefix",
+    limit: int = Query(20, ge=1, le=PAGE_LIMIT_MAX),
+    after: Optional[str] = None,
+):
+    """ค้นหาบุคคล: prefix ของชื่อ/นามสกุล/เบอร์โทร/เลขบัตร หรือ fuzzy (พิมพ์ผิด/บางส่วน) พร้อมคะแนน
+
+    after = next_cursor ของหน้าก่อน (token ของแถวสุดท้าย ใช้กับ q / mode เดิมเท่านั้น)
+    """
+    with Session(engine) as session:
+        try:
+            if mode == "fuzzy":
+                return fastjson.respond(search_fuzzy(session, q, limit, after))
+            return fastjson.respond(search_prefix(session, q, limit, after))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
 @app.get("/personals/by-name-surname/{name}/{surname}", response_model=List[PersonalOut], tags=["Users"])
+@budget(1)
 def check_ID_by_name(name: str, surname: str):
     with Session(engine) as session:
         return session.exec(select(PersonalDB).where(PersonalDB.name == name, PersonalDB.surname == surname)).all()
         
 
-@app.get("/personals", response_model=List[dict], tags=["Users"])
-def list_person_basic():
+@app.get("/personals", response_model=Page[PersonalBasic], tags=["Users"])
+@budget(1)
+def list_person_basic(limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
     with Session(engine) as session:
-        rows = session.exec(select(PersonalDB)).all()
-        return [{"user_id": r.user_id, "name": r.name, "surname": r.surname} for r in rows]
+        stmt = select(*columns(PersonalDB, PersonalBasic))
+        return fastjson.respond(keyset_page(session, stmt, PersonalDB.user_id, limit, after))
 
 @app.put("/personals/by-user/{user_id}", response_model=PersonalOut, tags=["Users"])
-def update_personal_by_user(user_id: str, personal_update: PersonalUpdate):
+@budget(10, repeat=2)  # ย้ายจังหวัด/อำเภอ → นับ rollup ของ user ใหม่
+def update_personal_by_user(user_id: int, personal_update: PersonalUpdate):
     with Session(engine) as session:
         
         personal = session.get(PersonalDB, user_id)
 
         if personal != None:
             
+            old_location = (personal.province, personal.district)
             update_data = personal_update.dict(exclude_unset=True)
             for key, value in update_data.items():
                 if key != "user_id": 
                     setattr(personal, key, value)
             
             session.add(personal)
+            index_people(session, [personal])
+            if (personal.province, personal.district) != old_location:
+                rollup.move_user(session, personal.user_id, old_location)
             session.commit()
             session.refresh(personal)
             print(personal)
@@ -182,6 +267,7 @@ def update_personal_by_user(user_id: str, personal_update: PersonalUpdate):
 
 # ---------------- Durian ----------------
 @app.post("/durians", response_model=DurianOut, status_code=201, tags=["Durians"])
+@budget(3)
 def create_durian(item: Durian):
     with Session(engine) as session:
         _ensure_user(session, item.user_id)
@@ -189,13 +275,16 @@ def create_durian(item: Durian):
         session.add(row); session.commit(); session.refresh(row)
         return row
 
-@app.get("/durians/by-user/{user_id}", response_model=List[DurianOut], tags=["Durians"])
-def list_durians_by_user(user_id: str):
+@app.get("/durians/by-user/{user_id}", response_model=Page[DurianOut], tags=["Durians"])
+@budget(1)
+def list_durians_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
     with Session(engine) as session:
-        return session.exec(select(DurianDB).where(DurianDB.user_id == user_id)).all()
+        stmt = select(*columns(DurianDB, DurianOut)).where(DurianDB.user_id == user_id)
+        return fastjson.respond(keyset_page(session, stmt, DurianDB.durian_id, limit, after))
 
 @app.put("/durians/by-user/{user_id}", response_model=DurianOut, tags=["Durians"])
-def update_durian_by_user(user_id: str, durian_update: DurianUpdate):
+@budget(3)
+def update_durian_by_user(user_id: int, durian_update: DurianUpdate):
     with Session(engine) as session:
         
         durian = session.exec(select(DurianDB).where(DurianDB.user_id == user_id)).first()
@@ -220,6 +309,7 @@ def update_durian_by_user(user_id: str, durian_update: DurianUpdate):
 
 # ---------------- Farm ----------------
 @app.post("/farms", response_model=FarmOut, status_code=201, tags=["Farms"])
+@budget(3)
 def create_farm(item: Farm):
     with Session(engine) as session:
         _ensure_user(session, item.user_id)
@@ -228,13 +318,16 @@ def create_farm(item: Farm):
         return row
 
 
-@app.get("/farms/by-user/{user_id}", response_model=List[FarmOut], tags=["Farms"])
-def list_farms_by_user(user_id: str):
+@app.get("/farms/by-user/{user_id}", response_model=Page[FarmOut], tags=["Farms"])
+@budget(1)
+def list_farms_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
     with Session(engine) as session:
-        return session.exec(select(FarmDB).where(FarmDB.user_id == user_id)).all()
+        stmt = select(*columns(FarmDB, FarmOut)).where(FarmDB.user_id == user_id)
+        return fastjson.respond(keyset_page(session, stmt, FarmDB.farm_id, limit, after))
 
 @app.put("/farms/by-user/{user_id}", response_model=FarmOut, tags=["Farms"])
-def update_farms_by_user(user_id: str, durian_update: FarmUpdate):
+@budget(3)
+def update_farms_by_user(user_id: int, durian_update: FarmUpdate):
     with Session(engine) as session:
         
         farm = session.exec(select(FarmDB).where(FarmDB.user_id == user_id)).first()
@@ -262,63 +355,200 @@ def update_farms_by_user(user_id: str, durian_update: FarmUpdate):
 
 # ---------------- Assessment (Categories/Activities/Answers/Evaluate) ----------------
 @app.get("/categories", response_model=List[AssessmentCategoryOut], tags=["Assess"])
-def list_categories():
+@budget(4)
+def list_categories(request: Request, response: Response):
     with Session(engine) as session:
-        return session.exec(select(AssessmentCategoryDB)).all()
+        rubric = get_rubric(session)
+    headers = httpcache.master_headers(rubric)
+    if httpcache.is_fresh(request, headers):
+        return httpcache.not_modified(headers)
+    response.headers.update(headers)
+    return fastjson.respond([c._asdict() for c in rubric.categories], response)
 
 
 @app.get("/activities", response_model=List[ActivityOut], tags=["Assess"])
-def list_activities(categoryapp_id: Optional[int] = None, activity_type: Optional[ActivityLevel] = None):
+@budget(4)
+def list_activities(request: Request, response: Response,
+                    categoryapp_id: Optional[int] = None, activity_type: Optional[ActivityLevel] = None):
     with Session(engine) as session:
-        stmt = select(ActivityDB)
-        if categoryapp_id is not None:
-            stmt = stmt.where(ActivityDB.categoryapp_id == categoryapp_id)
-        if activity_type is not None:
-            stmt = stmt.where(ActivityDB.activity_type == activity_type)
-        return session.exec(stmt).all()
+        rubric = get_rubric(session)
+    headers = httpcache.master_headers(rubric)
+    if httpcache.is_fresh(request, headers):
+        return httpcache.not_modified(headers)
+    response.headers.update(headers)
+    return fastjson.respond([
+        a._asdict() for a in rubric.activities
+        if (categoryapp_id is None or a.categoryapp_id == categoryapp_id)
+        and (activity_type is None or a.activity_type == activity_type)
+    ], response)
+
+
+@app.get("/rubric/stats", tags=["Master/Seed"])
+@budget(0)
+def rubric_stats():
+    return rubric_cache.stats()
+
+
+@app.get("/metrics", tags=["Master/Seed"], include_in_schema=False)
+@budget(0)
+def read_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.post("/activities/search", response_model=List[ActivityOut], tags=["Assess"])
+@budget(4)
 def search_activities(payload: ActivitySearch):
+    """ถ้ามี keyword ผลลัพธ์เรียงตามความเกี่ยวข้อง (FTS) ไม่งั้นเรียงตาม activity_id"""
     with Session(engine) as session:
-        stmt = select(ActivityDB)
-        if payload.categoryapp_ids:
-            stmt = stmt.where(ActivityDB.categoryapp_id.in_(payload.categoryapp_ids))
-        if payload.activity_types:
-            stmt = stmt.where(ActivityDB.activity_type.in_(payload.activity_types))
+        acts = get_rubric(session).activities
         if payload.keyword:
-            stmt = stmt.where(ActivityDB.activity_name.contains(payload.keyword))
-        return session.exec(stmt).all()
+            by_id = {a.activity_id: a for a in acts}
+            acts = [by_id[i] for i in search_activity_ids(session, payload.keyword) if i in by_id]
+    cats = set(payload.categoryapp_ids or ())
+    types = set(payload.activity_types or ())
+    return [
+        a._asdict() for a in acts
+        if (not cats or a.categoryapp_id in cats) and (not types or a.activity_type in types)
+    ]
+
+
+@app.post("/answers/search", response_model=List[AnswerOut], tags=["Assess/Admin"])
+@budget(2)
+def search_answers_text(payload: AnswerSearch):
+    with Session(engine) as session:
+        return search_answers(session, payload.keyword, payload.limit,
+                              user_id=payload.user_id, activity_ids=payload.activity_ids)
+
+
+def _write_answer(session: Session, item: Answer) -> AnswerDB:
+    # ค่าเดิม (old) อ่านหลังได้ lock → request ที่เขียนข้อเดียวกันพร้อมกันไม่ปรับ summary จากค่าเดิมเดียวกันซ้ำ
+    lock_users(session, [item.user_id])
+    exist = session.exec(for_update(select(AnswerDB).where(
+        AnswerDB.user_id == item.user_id, AnswerDB.activity_id == item.activity_id
+    ))).first()
+    old = exist.result_each if exist else None
+    if exist:
+        for k, v in item.model_dump(exclude_unset=True).items():
+            setattr(exist, k, v)
+        row = exist
+    else:
+        row = AnswerDB(**item.model_dump(exclude_unset=True))
+    session.add(row)
+    apply_changes(session, item.user_id, [(item.activity_id, old, row.result_each)])
+    session.commit()
+    return row
 
 
 @app.post("/answers", response_model=AnswerOut, status_code=201, tags=["Assess"])
+@budget(10)
 def insert_answer(item: Answer):
     with Session(engine) as session:
         _ensure_user(session, item.user_id)
-        if session.get(ActivityDB, item.activity_id) is None:
+        if item.activity_id not in get_rubric(session).activity_map:
             raise HTTPException(404, "Activity not found")
         if not item.answer_text and not item.answer_file and item.result_each is None:
             raise HTTPException(422, "Require answer_text or answer_file")
         _score01(item.result_each)
-        exist = session.exec(select(AnswerDB).where(
-            AnswerDB.user_id == item.user_id, AnswerDB.activity_id == item.activity_id
-        )).first()
-        if exist:
-            for k, v in item.model_dump(exclude_unset=True).items():
-                setattr(exist, k, v)
-            session.add(exist); session.commit(); session.refresh(exist)
-            return exist
-        row = AnswerDB(**item.model_dump(exclude_unset=True))
-        session.add(row); session.commit(); session.refresh(row)
+        try:
+            row = _write_answer(session, item)
+        except IntegrityError:
+            # อีก request insert (user, activity) เดียวกันไปก่อน → อัปเดตแถวนั้นแทน
+            session.rollback()
+            row = _write_answer(session, item)
+        session.refresh(row)
         return row
 
+def _write_sheet(session: Session, user_id: int, items: Dict[int, AnswerSheetItem]) -> Dict[int, tuple]:
+    """upsert คำตอบหลายข้อของ user เดียวแล้ว commit ครั้งเดียว คืน {activity_id: (status, row)}"""
+    lock_users(session, [user_id])  # เหมือน _write_answer
+    existing = {r.activity_id: r for r in session.exec(for_update(select(AnswerDB).where(
+        AnswerDB.user_id == user_id, AnswerDB.activity_id.in_(list(items))
+    ))).all()}
+    out, changes, new_rows = {}, [], []
+    for aid, it in items.items():
+        data = it.model_dump(exclude_unset=True)
+        rec = existing.get(aid)
+        if rec is not None:
+            old = rec.result_each
+            for k, v in data.items():
+                setattr(rec, k, v)
+            out[aid] = ("updated", rec)
+            session.add(rec)
+            changes.append((aid, old, rec.result_each))
+        else:
+            row = AnswerDB(user_id=user_id, **data)
+            new_rows.append(row.model_dump(exclude={"answer_id"}))
+            changes.append((aid, None, row.result_each))
+    if new_rows:
+        # executemany ครั้งเดียวแล้วอ่านกลับ แทน INSERT ... RETURNING ทีละแถวของ ORM
+        session.exec(insert(AnswerDB), params=new_rows)
+        for rec in session.exec(select(AnswerDB).where(
+            AnswerDB.user_id == user_id, AnswerDB.activity_id.in_([r["activity_id"] for r in new_rows])
+        )).all():
+            out[rec.activity_id] = ("created", rec)
+    apply_changes(session, user_id, changes)
+    session.commit()
+    return out
+
+
+@app.post("/answers/bulk", response_model=AnswerBulkResult, tags=["Assess"])
+@budget(10, repeat=2)
+def insert_answers_bulk(sheet: AnswerSheet):
+    """ส่งคำตอบทั้งแบบประเมินครั้งเดียว: ตรวจกับ rubric ในแคช แล้ว upsert ใน transaction เดียว
+
+    ข้อที่ไม่ผ่านการตรวจจะถูกรายงานรายข้อ ส่วนข้อที่ถูกต้องยังบันทึกตามปกติ
+    """
+    with Session(engine, expire_on_commit=False) as session:
+        _ensure_user(session, sheet.user_id)
+        activity_map = get_rubric(session).activity_map
+        errors: Dict[int, str] = {}
+        valid: Dict[int, AnswerSheetItem] = {}
+        last = {it.activity_id: i for i, it in enumerate(sheet.items)}
+        for i, it in enumerate(sheet.items):
+            if it.activity_id not in activity_map:
+                errors[i] = "Activity not found"
+            elif not it.answer_text and not it.answer_file and it.result_each is None:
+                errors[i] = "Require answer_text or answer_file"
+            elif it.result_each not in (None, 0, 1):
+                errors[i] = "result_each must be 0 or 1"
+            elif last[it.activity_id] != i:
+                errors[i] = "duplicate activity_id (later item wins)"
+            else:
+                valid[it.activity_id] = it
+
+        written: Dict[int, tuple] = {}
+        if valid:
+            try:
+                written = _write_sheet(session, sheet.user_id, valid)
+            except IntegrityError:
+                # มีคำตอบข้อเดียวกันถูก insert พร้อมกัน → โหลดใหม่แล้วทำซ้ำครั้งเดียว
+                session.rollback()
+                written = _write_sheet(session, sheet.user_id, valid)
+
+        results = []
+        for i, it in enumerate(sheet.items):
+            if i in errors:
+                results.append(AnswerBulkItemResult(activity_id=it.activity_id, status="error", detail=errors[i]))
+            else:
+                status, rec = written[it.activity_id]
+                results.append(AnswerBulkItemResult(activity_id=it.activity_id, status=status, answer_id=rec.answer_id))
+        return AnswerBulkResult(
+            user_id=sheet.user_id,
+            created=sum(1 for r in results if r.status == "created"),
+            updated=sum(1 for r in results if r.status == "updated"),
+            errors=len(errors),
+            items=results,
+        )
+
+
 @app.put("/answers", response_model=AnswerOut, status_code=201, tags=["Assess"])
+@budget(9)
 def update_answer(item: Answer):
     with Session(engine) as session:
 
         _ensure_user(session, item.user_id)
 
-        if session.get(ActivityDB, item.activity_id) is None:
+        if item.activity_id not in get_rubric(session).activity_map:
             raise HTTPException(status_code=404, detail="Activity not found")
 
         if not item.answer_text and not item.answer_file:
@@ -333,6 +563,7 @@ def update_answer(item: Answer):
                 exist.answer_file = item.answer_file
 
             session.add(exist)
+            apply_changes(session, item.user_id, [])
             session.commit()
             session.refresh(exist)
             print(exist)
@@ -341,142 +572,183 @@ def update_answer(item: Answer):
         raise HTTPException(status_code=404, detail="not found")
 
 @app.get("/activities/with-status", response_model=List[dict], tags=["Assess"])
-def activities_with_status(user_id: str):
-    with Session(engine) as session:
-        acts = session.exec(select(ActivityDB)).all()
-        answers = session.exec(select(AnswerDB).where(AnswerDB.user_id == user_id)).all()
-        ans_map = {a.activity_id: a for a in answers}
-        out = []
-        for a in acts:
-            rec = ans_map.get(a.activity_id)
-            out.append({
-                "activity_id": a.activity_id,
-                "categoryapp_id": a.categoryapp_id,
-                "activity_type": a.activity_type,
-                "activity_name": a.activity_name,
-                "answered": rec is not None,
-                "scored": (rec is not None and rec.result_each is not None),
-                "result_each": (rec.result_each if rec else None),
-                "answer_id": (rec.answer_id if rec else None),
-                "answer_text": (rec.answer_text if rec else None),
-                "answer_file": (rec.answer_file if rec else None),
-            })
-        return out
+@budget(5)
+def activities_with_status(request: Request, response: Response, user_id: int):
+    """ส่ง If-None-Match (ETag ครั้งก่อน) → 304 ถ้ากิจกรรมและคำตอบของ user ไม่เปลี่ยน (query เดียว)"""
+    with Session(engine) as session:
+        rubric = get_rubric(session)
+        summary = get_summary(session, user_id)
+        headers = httpcache.user_headers(rubric, user_id, summary)
+        if httpcache.is_fresh(request, headers):
+            return httpcache.not_modified(headers)
+        response.headers.update(headers)
+        answers = session.exec(select(*ANSWER_STATUS_COLUMNS).where(AnswerDB.user_id == user_id)).all()
+        return fastjson.respond(with_status(rubric, answers), response)
+
+
+def _score_answers(session: Session, items: List[ScoreItem], locked: bool = False) -> List[AnswerDB]:
+    """ให้คะแนนหลายข้อ: ตรวจค่าทั้งหมดก่อน → lock → โหลดคำตอบด้วย query เดียว → flush เป็น batch
+
+    ค่าเดิมของคำตอบอ่านหลังได้ lock (locked=True: ผู้เรียกถือไว้แล้ว) → ผู้ให้คะแนนสองคนพร้อมกัน
+    ไม่บวก delta จากค่าเดิมเดียวกันซ้ำ; ผู้เรียก commit เอง (ครั้งเดียว)
+    """
+    bad = [{"user_id": it.user_id, "activity_id": it.activity_id, "result_each": it.result_each}
+           for it in items if it.result_each not in (None, 0, 1)]
+    if bad:
+        raise HTTPException(422, detail={"msg": "result_each must be 0 or 1", "items": bad})
+
+    wanted = {(it.user_id, it.activity_id): it.result_each for it in items}  # ซ้ำ → ตัวหลังชนะ
+    pairs = list(wanted)
+    found: Dict[tuple, AnswerDB] = {}
+    users = {u for u, _ in pairs}
+    if not locked:
+        lock_users(session, users)
+    for i in range(0, len(pairs), 500):
+        chunk = pairs[i:i + 500]
+        if len(users) == 1:
+            cond = (AnswerDB.user_id == chunk[0][0]) & AnswerDB.activity_id.in_([a for _, a in chunk])
+        else:
+            cond = tuple_(AnswerDB.user_id, AnswerDB.activity_id).in_(chunk)
+        for rec in session.exec(for_update(select(AnswerDB).where(cond))).all():
+            found[(rec.user_id, rec.activity_id)] = rec
+
+    missing = [p for p in pairs if p not in found]
+    if missing:
+        detail = {"msg": "พบ activity ที่ยังไม่มีคำตอบ จึงยังให้คะแนนไม่ได้"}
+        if len(users) == 1:
+            detail["missing_activity_ids"] = [a for _, a in missing]
+        else:
+            detail["missing"] = [{"user_id": u, "activity_id": a} for u, a in missing]
+        raise HTTPException(status_code=400, detail=detail)
+
+    changes: Dict[int, list] = {}
+    for key, val in wanted.items():
+        rec = found[key]
+        changes.setdefault(key[0], []).append((key[1], rec.result_each, val))
+        rec.result_each = val
+        session.add(rec)
+    apply_changes_many(session, changes)
+    return [found[k] for k in pairs]
+
+
+def _precondition_failed(session: Session, user_id: int):
+    session.rollback()
+    current = answer_etag(user_id, get_summary(session, user_id))
+    raise HTTPException(412, detail={"msg": "คำตอบถูกแก้ไขไปแล้ว", "etag": current})
+
+
+def _lock_if_match(session: Session, user_id: int, if_match: str) -> bool:
+    """ตรวจ If-Match ใน WHERE ของ UPDATE แทนการอ่านแล้วเทียบ → ถือ lock ของ summary จน commit
+    (SQLite: write lock ทั้ง DB) admin สองคนที่ส่ง ETag เดียวกันจึงผ่านได้คนเดียว
+
+    คืน True ถ้าผ่านเพราะ user ยังไม่มี summary (ETag เวอร์ชัน 0) → ผู้เรียกต้องเป็นคนสร้างแถวแรก
+    """
+    prefix = f'"a{user_id}.'
+    versions = [
+        int(t[len(prefix):-1]) for t in (t.strip() for t in if_match.split(","))
+        if t.startswith(prefix) and t.endswith('"') and t[len(prefix):-1].isdigit()
+    ]
+    res = session.connection().execute(
+        update(EvaluationSummaryDB)
+        .where(EvaluationSummaryDB.user_id == user_id, EvaluationSummaryDB.answer_version.in_(versions))
+        .values(answer_version=EvaluationSummaryDB.answer_version)
+    )
+    if res.rowcount:
+        return False
+    if 0 in versions and get_summary(session, user_id) is None:
+        return True
+    _precondition_failed(session, user_id)
 
 
 @app.patch("/answers/score/{user_id}", response_model=List[AnswerOut], tags=["Assess/Admin"])
-def admin_score(user_id: int, items: List[Answer] = Body(...)):
-    with Session(engine) as session:
+@budget(9)
+def admin_score(user_id: int, response: Response, items: List[Answer] = Body(...),
+                if_match: Optional[str] = Header(None)):
+    """ให้คะแนนทั้งชุดของ user ใน transaction เดียว
+
+    ส่ง If-Match (ETag จาก response ก่อนหน้า) เพื่อกันเขียนทับคะแนนที่ถูกแก้ไปแล้ว → 412
+    """
+    with Session(engine, expire_on_commit=False) as session:
         _ensure_user(session, user_id)
-        target_ids = [it.activity_id for it in items]
-        exists = session.exec(
-            select(AnswerDB.activity_id).where(
-                AnswerDB.user_id == user_id,
-                AnswerDB.activity_id.in_(target_ids)
-            )
-        ).all()
-        exist_set = set(exists)
-        missing = [aid for aid in target_ids if aid not in exist_set]
-        if missing:
-            raise HTTPException(status_code=400, detail={
-                "msg": "พบ activity ที่ยังไม่มีคำตอบ จึงยังให้คะแนนไม่ได้",
-                "missing_activity_ids": missing
-            })
-        out: List[AnswerDB] = []
-        for it in items:
-            _score01(it.result_each)
-            rec = session.exec(select(AnswerDB).where(
-                AnswerDB.user_id == user_id, AnswerDB.activity_id == it.activity_id
-            )).first()
-            rec.result_each = it.result_each
-            session.add(rec); session.commit(); session.refresh(rec)
-            out.append(rec)
+        first_write, locked = False, False
+        if if_match is not None and if_match.strip() != "*":
+            first_write = _lock_if_match(session, user_id, if_match)
+            locked = True
+        out = _score_answers(session, [
+            ScoreItem(user_id=user_id, activity_id=it.activity_id, result_each=it.result_each) for it in items
+        ], locked=locked)
+        if first_write and get_summary(session, user_id).answer_version != 1:
+            # อีก request สร้าง summary ของ user นี้ไปก่อน (ตอนตรวจยังไม่มีแถวให้ lock)
+            _precondition_failed(session, user_id)
+        session.commit()
+        response.headers["ETag"] = answer_etag(user_id, get_summary(session, user_id))
         return out
 
 
-@app.get("/assessment/evaluate", tags=["Assess"])
-def evaluate(user_id: str):
-    with Session(engine) as session:
-        acts = session.exec(select(ActivityDB)).all()
-        if not acts: raise HTTPException(400, "No activities configured")
-
-
-        bycat: Dict[int, Dict[str, List[int]]] = {}
-        for a in acts:
-            bycat.setdefault(a.categoryapp_id, {"Major": [], "Minor": []})
-            bycat[a.categoryapp_id][a.activity_type.value].append(a.activity_id)
-
-
-        scored = session.exec(select(AnswerDB).where(
-            AnswerDB.user_id == user_id, AnswerDB.result_each != None  # noqa
-        )).all()
-        scored_map = {a.activity_id: a.result_each for a in scored}
-
-
-        missing = {}
-        for cid, grp in bycat.items():
-            miss_major = [x for x in grp["Major"] if x not in scored_map]
-            miss_minor = [x for x in grp["Minor"] if x not in scored_map]
-            if miss_major or miss_minor:
-                cat = session.get(AssessmentCategoryDB, cid)
-                missing[cid] = {
-                    "category_name": cat.category_name if cat else str(cid),
-                    "Major_missing": miss_major,
-                    "Minor_missing": miss_minor
-                }
-        if missing:
-            return {"user_id": user_id, "status": "incomplete", "missing": missing}
-
-
-        per_cat_major: Dict[int, int] = {}
-        minor_total = 0
-        amap = {a.activity_id: (a.categoryapp_id, a.activity_type) for a in acts}
-        for aid, val in scored_map.items():
-            cid, typ = amap[aid]
-            if typ == ActivityLevel.Major:
-                per_cat_major[cid] = per_cat_major.get(cid, 0) + (1 if val == 1 else 0)
-            else:
-                minor_total += (1 if val == 1 else 0)
-
-
-        crits = session.exec(select(CriteriaDB)).all()
-        major_req = {c.categoryapp_id: c.score_require for c in crits if c.activity_type == ActivityLevel.Major}
-        minor_req = next((c.score_require for c in crits if c.activity_type == ActivityLevel.Minor), None)
+@app.patch("/answers/score", response_model=List[AnswerOut], tags=["Assess/Admin"])
+@budget(8)
+def admin_score_bulk(items: List[ScoreItem] = Body(...)):
+    """ผู้ตรวจส่งคะแนนของหลาย user (เช่น ทั้งวัน) ใน request/transaction เดียว"""
+    with Session(engine, expire_on_commit=False) as session:
+        out = _score_answers(session, items)
+        session.commit()
+        return out
 
 
-        per_cat_result = {}
-        all_major_ok = True
-        for cid in sorted(bycat.keys()):
-            got = per_cat_major.get(cid, 0)
-            req = major_req.get(cid, None)
-            cat = session.get(AssessmentCategoryDB, cid)
-            if req is None:
-                per_cat_result[cid] = {"category_name": cat.category_name, "major_pass": got, "major_require": None, "status": "no_criteria"}
-                all_major_ok = False
+@app.get("/assessment/evaluate", tags=["Assess"])
+@budget(5)
+def evaluate(request: Request, response: Response, user_id: int):
+    with Session(engine) as session:
+        rubric = get_rubric(session)
+        if not rubric.activities: raise HTTPException(400, "No activities configured")
+        summary = get_summary(session, user_id)  # ถือไว้ใน identity map ให้ evaluate_user ใช้ต่อ
+        headers = httpcache.user_headers(rubric, user_id, summary)
+        if httpcache.is_fresh(request, headers):
+            return httpcache.not_modified(headers)
+        response.headers.update(headers)
+        return evaluate_user(session, user_id)
+
+
+def _evaluate_stream(user_ids: Optional[List[int]], province: Optional[str]):
+    """NDJSON หนึ่งบรรทัดต่อ user — เปิด Session สั้น ๆ ต่อ chunk แล้วปิดก่อน yield
+    (client อ่านช้าก็ไม่ถือ connection / snapshot ของ DB ค้างไว้ตลอด stream)"""
+    after, pos = 0, 0
+    while True:
+        with Session(engine) as session:
+            if user_ids is None:
+                ids = user_id_page(session, province, after)
+                after = ids[-1] if ids else after
             else:
-                ok = got >= req
-                per_cat_result[cid] = {"category_name": cat.category_name, "major_pass": got, "major_require": req, "status": "pass" if ok else "fail"}
-                if not ok: all_major_ok = False
-
-
-        minor_ok = True if minor_req is None else (minor_total >= minor_req)
-        eligible = all_major_ok and minor_ok
+                ids, pos = user_ids[pos:pos + BATCH_CHUNK], pos + BATCH_CHUNK
+            if not ids:
+                return
+            rows = list(evaluate_many(session, ids))
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+@app.post("/assessment/evaluate/batch", tags=["Assess"])
+@budget(None)  # 1 query ต่อ 1,000 user
+def evaluate_batch(body: EvaluateBatch):
+    """ผลเหมือน /assessment/evaluate ของแต่ละ user, stream เป็น NDJSON ตามลำดับ user_ids"""
+    if body.user_ids is not None and body.province is not None:
+        raise HTTPException(422, "Specify user_ids or province, not both")
+    with Session(engine) as session:
+        if not get_rubric(session).activities: raise HTTPException(400, "No activities configured")
+    return StreamingResponse(_evaluate_stream(body.user_ids, body.province), media_type="application/x-ndjson")
 
 
-        return {
-            "user_id": user_id,
-            "status": "complete",
-            "per_category": per_cat_result,
-            "minor_total_pass": minor_total,
-            "minor_require": minor_req,
-            "eligible_for_request": eligible
-        }
+@app.get("/assessment/evaluate/all", tags=["Assess"])
+@budget(None)
+def evaluate_all(province: Optional[str] = None):
+    """ทุกเกษตรกร (หรือเฉพาะจังหวัด) เรียงตาม user_id"""
+    return evaluate_batch(EvaluateBatch(province=province))
 
 
 
 
 # ---------------- Agreement / GAP lifecycle ----------------
 @app.post("/agreements", response_model=AgreementOut, status_code=201, tags=["GAP/Admin"])
+@budget(2)
 def create_agreement(item: Agreement):
     with Session(engine) as session:
         row = AgreementDB(**item.model_dump())
@@ -485,6 +757,7 @@ def create_agreement(item: Agreement):
 
 
 @app.post("/agreement-answers", response_model=AgreementAnswerOut, status_code=201, tags=["GAP/User"])
+@budget(4)
 def create_agreement_answer(item: AgreementAnswer):
     with Session(engine) as session:
         _ensure_user(session, item.user_id)
@@ -496,14 +769,16 @@ def create_agreement_answer(item: AgreementAnswer):
 
 
 @app.post("/gap-requests", response_model=GAPRequestOut, status_code=201, tags=["GAP/Admin"])
-def create_gap_request(item: GAPRequest, user_id: str):
+@budget(10)
+def create_gap_request(item: GAPRequest, user_id: int):
     with Session(engine) as session:
         farm = session.get(FarmDB, item.farm_id)
         if not farm: raise HTTPException(404, "Farm not found")
         if farm.user_id != user_id: raise HTTPException(403, "ไม่ใช่เจ้าของฟาร์ม")
 
 
-        result = evaluate(user_id=user_id)
+        if not get_rubric(session).activities: raise HTTPException(400, "No activities configured")
+        result = evaluate_user(session, user_id)
         if result.get("status") != "complete" or not result.get("eligible_for_request"):
             raise HTTPException(400, "ยังไม่ผ่านเกณฑ์ประเมิน")
 
@@ -521,77 +796,299 @@ def create_gap_request(item: GAPRequest, user_id: str):
 
 
         row = GAPRequestDB(**item.model_dump())
-        session.add(row); session.commit(); session.refresh(row)
+        session.add(row)
+        location = rollup.location_of(session, user_id=user_id)
+        rollup.bump(session, {rollup.key("gap_requests", location, row.timeline_status, rollup.month_of(row.request_date)): 1})
+        session.commit(); session.refresh(row)
         return row
 
 
 @app.patch("/gap-requests/status/{request_id}", response_model=GAPRequestOut, tags=["GAP/Admin"])
-def update_gap_request_status(request_id: int, timeline_status: str):
-    """อัปเดตสถานะคำขอ (เช่น รอจัดผู้ตรวจสอบ → อยู่ระหว่างตรวจ → ตรวจเสร็จ → ออกเกียรติบัตรแล้ว)"""
+@budget(5, repeat=2)
+def update_gap_request_status(request_id: int, timeline_status: GapStatus):
+    """อัปเดตสถานะคำขอ (เช่น รอจัดผู้ตรวจสอบ → อยู่ระหว่างตรวจ → ตรวจเสร็จ → ออกเกียรติบัตรแล้ว)
+
+    UPDATE มีเงื่อนไขว่าสถานะยังเป็นค่าที่อ่านมา → สอง request แข่งกันเปลี่ยนจากสถานะเดิม
+    มีแค่ตัวเดียวที่เปลี่ยนได้ (และ bump rollup) อีกตัวได้ 409
+    """
+    timeline_status = timeline_status.value
     with Session(engine) as session:
         req = session.get(GAPRequestDB, request_id)
         if not req:
             raise HTTPException(404, "GAP request not found")
-        req.timeline_status = timeline_status
-        session.add(req); session.commit(); session.refresh(req)
-        return req
+        old_status = req.timeline_status
+        if timeline_status == old_status:
+            return req
+        row = session.connection().execute(
+            update(GAPRequestDB)
+            .where(GAPRequestDB.request_id == request_id, GAPRequestDB.timeline_status == old_status)
+            .values(timeline_status=timeline_status)
+            .returning(*columns(GAPRequestDB, GAPRequestOut))
+        ).first()
+        if row is None:
+            session.rollback()
+            raise HTTPException(409, "GAP request status was changed concurrently; reload and retry")
+        location = rollup.location_of(session, request_id=request_id)
+        month = rollup.month_of(req.request_date)
+        rollup.bump(session, {
+            rollup.key("gap_requests", location, timeline_status, month): 1,
+            rollup.key("gap_requests", location, old_status, month): -1,
+        })
+        session.commit()
+        return dict(row._mapping)
 
 
 @app.get("/gap-requests/by-user/{user_id}", response_model=List[GAPRequestOut], tags=["GAP/User"])
-def list_gap_requests_by_user(user_id: str):
+@budget(3)
+def list_gap_requests_by_user(user_id: int):
     with Session(engine) as session:
         _ensure_user(session, user_id)
         farm_ids = session.exec(select(FarmDB.farm_id).where(FarmDB.user_id == user_id)).all()
         if not farm_ids:
             return []
         rows = session.exec(
-            select(GAPRequestDB)
+            select(*columns(GAPRequestDB, GAPRequestOut))
             .where(GAPRequestDB.farm_id.in_(farm_ids))
             .order_by(desc(GAPRequestDB.request_id))
         ).all()
-        return rows
+        return fastjson.respond([r._asdict() for r in rows])
 
 
 @app.post("/inspections", response_model=InspectionOut, status_code=201, tags=["GAP/Admin"])
+@budget(5)
 def create_inspection(item: Inspection):
     with Session(engine) as session:
         if session.get(GAPRequestDB, item.request_id) is None:
             raise HTTPException(404, "Request not found")
         row = InspectionDB(**item.model_dump())
-        session.add(row); session.commit(); session.refresh(row)
+        session.add(row)
+        location = rollup.location_of(session, request_id=item.request_id)
+        rollup.bump(session, {rollup.key("inspections", location, row.status_result, rollup.month_of(row.complete_date)): 1})
+        session.commit(); session.refresh(row)
         return row
 
 
-@app.get("/inspections/by-request/{request_id}", response_model=List[InspectionOut], tags=["GAP/Admin"])
-def list_inspections_by_request(request_id: int):
+@app.get("/inspections/by-request/{request_id}", response_model=Page[InspectionOut], tags=["GAP/Admin"])
+@budget(1)
+def list_inspections_by_request(request_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    """ล่าสุดก่อน (inspector_id มาก → น้อย)"""
     with Session(engine) as session:
-        return session.exec(
-            select(InspectionDB).where(InspectionDB.request_id == request_id).order_by(desc(InspectionDB.inspector_id))
-        ).all()
+        stmt = select(*columns(InspectionDB, InspectionOut)).where(InspectionDB.request_id == request_id)
+        return fastjson.respond(keyset_page(session, stmt, InspectionDB.inspector_id, limit, after, descending=True))
+
+
+# ---------------- Inspection queue (workqueue.py) ----------------
+@app.get("/inspections/queue", response_model=Page[GAPRequestOut], tags=["GAP/Inspector"])
+@budget(1)
+def inspection_queue(limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
+    """คำขอที่ รอจัดผู้ตรวจสอบ และยังไม่มีใครรับ (หรือ lease หมดแล้ว) ยื่นก่อนอยู่ก่อน"""
+    with Session(engine) as session:
+        rows = session.exec(workqueue.queue_stmt(limit, after, workqueue.now())).all()
+        return fastjson.respond(keyset_result(rows, GAPRequestDB.request_id, limit))
+
+
+@app.post("/inspections/queue/claim", response_model=List[GAPRequestClaim], tags=["GAP/Inspector"])
+@budget(1)
+def claim_inspections(inspector: str = Query(min_length=1), limit: int = Query(1, ge=1, le=workqueue.CLAIM_LIMIT_MAX)):
+    """รับงานถัดไปจากคิวสูงสุด limit รายการ (คิวว่าง = [])"""
+    with Session(engine) as session:
+        # Core ไม่ผ่าน ORM bulk update (synchronize_session) — ไม่มี object ใน session ให้ sync อยู่แล้ว
+        rows = session.connection().execute(workqueue.claim_stmt(inspector, limit, workqueue.now())).all()
+        session.commit()
+        return workqueue.sort_claimed(rows)
+
+
+def _claim_conflict(session: Session, request_id: int):
+    if session.get(GAPRequestDB, request_id) is None:
+        raise HTTPException(404, "GAP request not found")
+    raise HTTPException(409, "Claim not held (expired, released or taken by another inspector)")
+
+
+@app.post("/inspections/queue/{request_id}/renew", response_model=GAPRequestClaim, tags=["GAP/Inspector"])
+@budget(2)
+def renew_claim(request_id: int, inspector: str = Query(min_length=1)):
+    with Session(engine) as session:
+        row = session.connection().execute(workqueue.renew_stmt(request_id, inspector, workqueue.now())).first()
+        if row is None:
+            _claim_conflict(session, request_id)
+        session.commit()
+        return row._asdict()
+
+
+@app.post("/inspections/queue/{request_id}/release", response_model=GAPRequestOut, tags=["GAP/Inspector"])
+@budget(2)
+def release_claim(request_id: int, inspector: str = Query(min_length=1)):
+    with Session(engine) as session:
+        row = session.connection().execute(workqueue.release_stmt(request_id, inspector)).first()
+        if row is None:
+            _claim_conflict(session, request_id)
+        session.commit()
+        return row._asdict()
 
 
 @app.post("/certifications", response_model=CertificationOut, status_code=201, tags=["GAP/Admin"])
+@budget(5)
 def create_cert(item: Certification):
     with Session(engine) as session:
         if session.get(GAPRequestDB, item.request_id) is None:
             raise HTTPException(404, "Request not found")
         row = CertificationDB(**item.model_dump())
-        session.add(row); session.commit(); session.refresh(row)
+        session.add(row)
+        location = rollup.location_of(session, farm_id=item.farm_id)
+        rollup.bump(session, {rollup.key("certifications", location, month=rollup.month_of(row.issue_date)): 1})
+        session.commit(); session.refresh(row)
         return row
 
 
-@app.get("/certifications/by-user/{user_id}", response_model=List[CertificationOut], tags=["GAP/User"])
-def list_certs_by_user(user_id: str):
+@app.get("/certifications/by-user/{user_id}", response_model=Page[CertificationOut], tags=["GAP/User"])
+@budget(2)
+def list_certs_by_user(user_id: int, limit: int = Query(PAGE_LIMIT, ge=1, le=PAGE_LIMIT_MAX), after: Optional[int] = None):
     """ให้ผู้ใช้ดูใบรับรองของตนเองสะดวก ๆ"""
     with Session(engine) as session:
         _ensure_user(session, user_id)
-        farm_ids = session.exec(select(FarmDB.farm_id).where(FarmDB.user_id == user_id)).all()
-        if not farm_ids:
-            return []
-        req_ids = session.exec(select(GAPRequestDB.request_id).where(GAPRequestDB.farm_id.in_(farm_ids))).all()
-        if not req_ids:
-            return []
-        return session.exec(select(CertificationDB).where(CertificationDB.request_id.in_(req_ids))).all()
+        stmt = (
+            select(*columns(CertificationDB, CertificationOut))
+            .join(GAPRequestDB, GAPRequestDB.request_id == CertificationDB.request_id)
+            .join(FarmDB, FarmDB.farm_id == GAPRequestDB.farm_id)
+            .where(FarmDB.user_id == user_id)
+        )
+        return fastjson.respond(keyset_page(session, stmt, CertificationDB.cert_id, limit, after))
+
+
+@app.get("/users/{user_id}/overview", response_model=UserOverview, tags=["GAP/User"])
+@budget(8)  # รวมอ่านเวอร์ชันของ rubric (TableVersionDB) 1 ครั้ง
+def user_overview(user_id: int):
+    """หน้าแรกของเกษตรกรใน request เดียว: โปรไฟล์ ฟาร์ม ทุเรียน คำขอ GAP (+ผลตรวจล่าสุด)
+    เกียรติบัตรที่ยังไม่หมดอายุ และผลประเมิน
+
+    จำนวน query คงที่ไม่ขึ้นกับจำนวนฟาร์ม/คำขอ: ผู้ใช้ 1 + selectinload ละ 1
+    (ฟาร์ม, ทุเรียน, คำขอ, ผลตรวจ, เกียรติบัตร) + summary 1
+    """
+    today = date.today()
+    with Session(engine) as session:
+        requests = selectinload(PersonalDB.farms).selectinload(FarmDB.requests)
+        person = session.exec(
+            select(PersonalDB).where(PersonalDB.user_id == user_id).options(
+                selectinload(PersonalDB.durians),
+                requests.selectinload(GAPRequestDB.inspections),
+                requests.selectinload(GAPRequestDB.certifications.and_(CertificationDB.expire_date >= today)),
+            )
+        ).first()
+        if person is None:
+            raise HTTPException(404, "User not found")
+        reqs = sorted((r for farm in person.farms for r in farm.requests), key=lambda r: r.request_id, reverse=True)
+        return {
+            "profile": person.model_dump(),
+            "farms": [farm.model_dump() for farm in person.farms],
+            "durians": [d.model_dump() for d in person.durians],
+            "requests": [
+                {**r.model_dump(), "latest_inspection": r.inspections[0].model_dump() if r.inspections else None}
+                for r in reqs
+            ],
+            "certifications": sorted(
+                (c.model_dump() for r in reqs for c in r.certifications), key=lambda c: c["cert_id"]),
+            "evaluation": evaluate_user(session, user_id),
+        }
+
+
+
+
+# ---------------- Stats (dashboard แอดมิน, อ่านจาก rollup) ----------------
+Month = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM")
+
+
+def _by_area(province: Optional[str]) -> List[str]:
+    # ไม่ระบุจังหวัด → แยกตามจังหวัด, ระบุ → แยกตามอำเภอในจังหวัดนั้น
+    return ["district"] if province else ["province"]
+
+
+@app.get("/stats/farmers", response_model=List[dict], tags=["Stats"])
+@budget(1)
+def stats_farmers(province: Optional[str] = None):
+    with Session(engine) as session:
+        return rollup.totals(session, "farmers", _by_area(province), province=province)
+
+
+@app.get("/stats/gap-requests", response_model=List[dict], tags=["Stats"])
+@budget(1)
+def stats_gap_requests(province: Optional[str] = None, district: Optional[str] = None,
+                       since: Optional[str] = Month, until: Optional[str] = Month):
+    """จำนวนคำขอต่อ timeline_status ปัจจุบัน (กรองเดือนที่ยื่นได้)"""
+    with Session(engine) as session:
+        return rollup.totals(session, "gap_requests", ["status"], province, district, since, until)
+
+
+@app.get("/stats/inspections", response_model=List[dict], tags=["Stats"])
+@budget(1)
+def stats_inspections(province: Optional[str] = None, district: Optional[str] = None,
+                      since: Optional[str] = Month, until: Optional[str] = Month):
+    """ผลตรวจ ผ่าน/ไม่ผ่าน ต่อเดือน"""
+    with Session(engine) as session:
+        return rollup.totals(session, "inspections", ["month", "status"], province, district, since, until)
+
+
+@app.get("/stats/certifications", response_model=List[dict], tags=["Stats"])
+@budget(1)
+def stats_certifications(province: Optional[str] = None, since: Optional[str] = Month, until: Optional[str] = Month):
+    """เกียรติบัตรที่ออกต่อจังหวัด (หรือต่ออำเภอเมื่อระบุจังหวัด)"""
+    with Session(engine) as session:
+        return rollup.totals(session, "certifications", _by_area(province), province=province, since=since, until=until)
+
+
+
+
+# ---------------- Export (CSV / NDJSON แบบ stream) ----------------
+ExportEntity = Literal["personals", "farms", "gap-requests", "certifications", "certified-farms"]
+
+
+@app.get("/export/{entity}", tags=["Export"])
+@budget(None)  # 1 fetch ต่อ 1,000 แถว
+def export_rows(
+    entity: ExportEntity,
+    format: Literal["csv", "ndjson"] = "csv",
+    province: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    status: Optional[str] = None,
+):
+    """ทั้งตาราง (หรือที่กรองแล้ว) ทีละชุด หน่วยความจำคงที่; certified-farms = ฟาร์ม + เจ้าของ + เกียรติบัตรล่าสุด"""
+    try:
+        stmt = export.build(entity, province, since, until, status)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    media = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{entity}.{format}"'}
+    return StreamingResponse(export.stream(engine, stmt, format), media_type=media, headers=headers)
+
+
+
+
+# ---------------- Import (CSV / XLSX จำนวนมาก) ----------------
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024  # ใหญ่กว่านี้พักไว้บนดิสก์
+
+
+@app.post("/import/{kind}", response_model=ImportResult, tags=["Import"])
+@budget(None)  # ~4 statement ต่อ 5,000 แถว
+async def bulk_import(request: Request, kind: Literal["personals", "farms", "durians"],
+                      format: Literal["csv", "xlsx"] = "csv"):
+    """นำเข้าจากไฟล์เป็น raw body เช่น
+    ``curl --data-binary @farmers.csv /import/personals``
 
+    farms / durians ระบุเจ้าของด้วยคอลัมน์ id_number; แถวที่ผิดรายงานใน errors ไม่ทำให้ทั้งไฟล์ล้ม
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+        async for chunk in request.stream():
+            await run_in_threadpool(body.write, chunk)
+        body.seek(0)
+        try:
+            return await run_in_threadpool(importer.import_file, engine, kind, body, format)
+        except RuntimeError as e:  # ไม่มี openpyxl
+            raise HTTPException(415, str(e))
+        except (UnicodeDecodeError, csv.Error, zipfile.BadZipFile) as e:
+            raise HTTPException(422, f"Unreadable {format}: {e}")
 
 
+if ASYNC_DB:
+    # endpoint อ่านที่มี handler async ใช้ตัว async แทน (route sync ถูกเอาออก ไม่ลงทะเบียนซ้ำ)
+    import async_api
+    async_api.install(app)
@@ -0,0 +1,201 @@
+"""metrics ของ API ในรูปแบบ Prometheus text (GET /metrics)
+
+- gap_http_requests_total / gap_http_request_duration_seconds   ต่อ method, route, status
+- gap_http_requests_in_flight                                   ต่อ method
+- gap_sql_statements_per_request / gap_sql_seconds_per_request   ต่อ route (ผ่าน sqltrace)
+- gap_db_commits_total                                           ต่อ route
+- gap_rubric_cache_*                                             จาก rubric.cache.stats()
+- gap_cert_expiry_*                                              ความคืบหน้าของตัวสแกนเกียรติบัตร (expiry.py)
+
+route คือ path template (เช่น /answers/score/{user_id}) ไม่ใช่ URL จริง กัน label บวม
+เขียนเองแทน prometheus_client เพื่อไม่เพิ่ม dependency
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import sqltrace
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name, self.doc, self.label_names = name, doc, tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, list] = {}  # labels → [นับต่อ bucket..., sum, count]
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * len(self.buckets) + [0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = self.header()
+        for k, v in items:
+            for b, n in zip(self.buckets, v):
+                le = _labels(self.label_names, k, 'le="%s"' % b)
+                out.append(f"{self.name}_bucket{le} {n}")
+            le = _labels(self.label_names, k, 'le="+Inf"')
+            out.append(f"{self.name}_bucket{le} {v[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, k)} {_num(v[-2])}")
+            out.append(f"{self.name}_count{_labels(self.label_names, k)} {v[-1]}")
+        return out
+
+
+class Collector(_Metric):
+    """ค่าที่อ่านสด ๆ ตอน render เช่นสถิติแคช"""
+
+    def __init__(self, name: str, doc: str, kind: str, read: Callable[[], float]):
+        self.kind = kind
+        super().__init__(name, doc)
+        self._read = read
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name} {_num(self._read())}"]
+
+
+REGISTRY: List[_Metric] = []
+
+http_requests = Counter("gap_http_requests_total", "HTTP requests", ("method", "route", "status"))
+http_latency = Histogram("gap_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+in_flight = Gauge("gap_http_requests_in_flight", "HTTP requests being served", ("method",))
+sql_statements = Histogram("gap_sql_statements_per_request", "SQL statements executed per request", ("route",),
+                           buckets=STATEMENT_BUCKETS)
+sql_seconds = Histogram("gap_sql_seconds_per_request", "Time spent in SQL per request", ("route",))
+db_commits = Counter("gap_db_commits_total", "Database transaction commits", ("route",))
+
+cert_expiry_scanned = Counter("gap_cert_expiry_scanned_total", "Certificates matched by the expiry scanner", ("window",))
+cert_expiry_queued = Counter("gap_cert_expiry_notifications_total", "Expiry notifications written to the outbox", ("window",))
+cert_expiry_chunks = Counter("gap_cert_expiry_chunks_total", "Expiry scanner chunks committed", ("window",))
+cert_expiry_runs = Counter("gap_cert_expiry_runs_total", "Expiry scanner runs", ("result",))
+cert_expiry_progress = Gauge("gap_cert_expiry_progress_ratio", "Share of the current (or last) scan done, per window",
+                             ("window",))
+cert_expiry_last_success = Gauge("gap_cert_expiry_last_success_timestamp_seconds", "End of the last successful scan")
+cert_expiry_duration = Histogram("gap_cert_expiry_run_duration_seconds", "Expiry scan duration",
+                                 buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+
+
+def _rubric_stat(key: str):
+    def read():
+        from rubric import cache
+        return cache.stats()[key]
+    return read
+
+
+for _key in ("hits", "misses", "reloads", "invalidations"):
+    Collector(f"gap_rubric_cache_{_key}_total", f"Rubric cache {_key}", "counter", _rubric_stat(_key))
+
+
+def render() -> str:
+    lines = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: จับเวลา request จนส่ง body ชิ้นสุดท้าย (รวม streaming response)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_flight.inc(method)
+        t0 = time.perf_counter()
+        try:
+            with sqltrace.track() as q:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            in_flight.dec(method)
+            route = _route_of(scope)
+            http_requests.inc(method, route, str(status[0]))
+            http_latency.observe(elapsed, method, route, str(status[0]))
+            sql_statements.observe(q.count, route)
+            sql_seconds.observe(q.seconds, route)
+            if q.commits:
+                db_commits.inc(route, amount=q.commits)
@@ -0,0 +1,244 @@
+"""อัปเกรด schema ของฐานข้อมูลที่มีอยู่แล้ว (ไม่ต้องสร้างไฟล์ .db ใหม่)
+
+    python migrate.py
+
+ขั้นที่แก้ข้อมูลเดิม (สร้างตารางลูกใหม่, ลบคำตอบซ้ำ, rebuild ตารางสรุป) รันจากคำสั่งนี้เท่านั้น
+ตอน start app (data.init_db → ensure_schema) แค่สร้างตารางให้ DB ว่าง หรือตรวจ TableVersionDB["schema"]
+แล้วไม่ยอม start ถ้าไม่ตรงกับ SCHEMA_VERSION — สำรอง DB แล้วรัน migrate.py ก่อน
+"""
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Engine, func, inspect, select, text, update
+from sqlalchemy.schema import AddConstraint
+from sqlmodel import SQLModel
+
+
+# เพิ่มทุกครั้งที่ upgrade() มีขั้นใหม่ที่ DB เดิมต้องรันก่อนใช้กับโค้ดนี้
+SCHEMA_VERSION = 2  # 2: timeline_status เป็นค่าของ GapStatus ทุกแถว
+SCHEMA_ROW = "schema"  # ชื่อแถวใน TableVersionDB
+
+
+def _dedupe_answers(conn):
+    # ก่อนสร้าง unique index (user_id, activity_id) ต้องลบคำตอบซ้ำ
+    # เก็บแถวแรกไว้ (answer_id น้อยสุด) ซึ่งเป็นแถวที่ handler เดิมใช้อยู่
+    res = conn.execute(text(
+        "DELETE FROM answerdb WHERE answer_id NOT IN ("
+        " SELECT MIN(answer_id) FROM answerdb GROUP BY user_id, activity_id)"
+    ))
+    return res.rowcount or 0
+
+
+def ensure_columns(engine: Engine) -> list:
+    """เพิ่มคอลัมน์ที่ประกาศใน model แต่ยังไม่มีใน DB (ต้องเป็นคอลัมน์ที่ว่างได้) คืน "ตาราง.คอลัมน์" ที่เพิ่ม"""
+    added = []
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        tables = set(insp.get_table_names())
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have:
+                    continue
+                if not col.nullable:
+                    raise RuntimeError(f"{table.name}.{col.name} is NOT NULL; add it with a data migration")
+                ddl = col.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}"))
+                added.append(f"{table.name}.{col.name}")
+    return added
+
+
+def ensure_indexes(engine: Engine) -> list:
+    """สร้าง index ที่ประกาศไว้ใน model แต่ยังไม่มีใน DB คืนชื่อ index ที่สร้างใหม่"""
+    created = []
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        tables = set(insp.get_table_names())
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            have = {ix["name"] for ix in insp.get_indexes(table.name)}
+            for ix in sorted(table.indexes, key=lambda i: i.name):
+                if ix.name in have:
+                    continue
+                if table.name == "answerdb" and ix.unique:
+                    _dedupe_answers(conn)
+                ix.create(conn)
+                created.append(ix.name)
+    return created
+
+
+# ---------------- user_id: TEXT → INTEGER + foreign key ----------------
+# schema เดิมเก็บ user_id ของตารางลูกเป็น VARCHAR ไม่มี foreign key
+USER_FK_TABLES = ("farmdb", "duriandb", "answerdb", "agreementanswerdb", "evaluationsummarydb")
+
+
+def _orphans(conn, name: str) -> int:
+    # เทียบแบบข้อความ (ใช้ได้ทั้ง SQLite / Postgres แม้ค่าเดิมไม่ใช่ตัวเลข)
+    # NOT IN (subquery) → ฐานข้อมูลทำ subquery ครั้งเดียวเป็น index/hash ชั่วคราว ไม่สแกน personaldb ทุกแถว
+    return conn.execute(text(
+        f"SELECT COUNT(*) FROM {name} WHERE user_id NOT IN (SELECT CAST(user_id AS VARCHAR) FROM personaldb)"
+    )).scalar_one()
+
+
+def _rebuild_sqlite(conn, table) -> None:
+    # SQLite เปลี่ยนชนิดคอลัมน์ / เพิ่ม foreign key ไม่ได้ → สร้างตารางใหม่แล้วคัดลอก (id เดิมทุกแถว)
+    old = f"{table.name}_old"
+    if table.name == "answerdb":
+        _dedupe_answers(conn)  # ตารางใหม่มี unique (user_id, activity_id) ตั้งแต่สร้าง
+    for ix in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f"DROP INDEX {ix['name']}"))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    table.create(conn)
+    cols = [c.name for c in table.columns]
+    picked = ["CAST(user_id AS INTEGER)" if c == "user_id" else c for c in cols]
+    conn.execute(text(f"INSERT INTO {table.name} ({', '.join(cols)}) SELECT {', '.join(picked)} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+
+def _alter_postgres(conn, table) -> None:
+    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN user_id TYPE INTEGER USING user_id::integer"))
+    for fk in table.foreign_key_constraints:
+        conn.execute(AddConstraint(fk))
+
+
+def convert_user_ids(engine: Engine) -> list:
+    """แปลง user_id ของตารางลูกเป็น INTEGER + foreign key ไป personaldb (ครั้งเดียว)
+
+    ทำใน transaction เดียว; ถ้ามีแถวที่อ้าง user ที่ไม่มีอยู่จริงจะไม่แตะอะไรเลยและแจ้งจำนวนต่อตาราง
+    """
+    converted = []
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        have = set(insp.get_table_names())
+        todo = [
+            SQLModel.metadata.tables[name] for name in USER_FK_TABLES
+            if name in have and not any(fk["referred_table"] == "personaldb" for fk in insp.get_foreign_keys(name))
+        ]
+        if not todo:
+            return converted
+        bad = {t.name: n for t in todo if (n := _orphans(conn, t.name))}
+        if bad:
+            raise RuntimeError(
+                f"user_id without a matching personaldb row: {bad}; fix or delete those rows and run migrate.py again"
+            )
+        if conn.dialect.name == "sqlite":
+            from search import drop_fts
+            # pysqlite ไม่เปิด transaction ให้ DDL → เปิดเอง ให้ rollback ได้ทั้งชุดถ้าพังกลางทาง
+            conn.exec_driver_sql("BEGIN")
+            drop_fts(conn)  # trigger ของ answer_fts ผูกกับ answerdb เดิม → ensure_fts สร้าง/rebuild ใหม่
+            for table in todo:
+                _rebuild_sqlite(conn, table)
+        else:
+            for table in todo:
+                _alter_postgres(conn, table)
+        converted = [t.name for t in todo]
+    return converted
+
+
+# ---------------- timeline_status: ข้อความอิสระ → ค่าของ GapStatus ----------------
+def normalize_statuses(engine: Engine) -> int:
+    """ตัดช่องว่างหัวท้ายของ timeline_status ที่ตรงกับ GapStatus หลังตัด คืนจำนวนแถวที่แก้
+
+    ค่าอื่นที่ไม่ใช่ GapStatus (GAPRequestOut จะตอบ 500) → ไม่แก้อะไรเลย แจ้งจำนวนต่อค่า
+    """
+    from model import GAPRequestDB, GapStatus
+
+    valid = [s.value for s in GapStatus]
+    col = GAPRequestDB.timeline_status
+    with engine.begin() as conn:
+        if GAPRequestDB.__tablename__ not in inspect(conn).get_table_names():
+            return 0
+        bad = dict(conn.execute(
+            select(col, func.count()).where(col.is_(None) | func.trim(col).not_in(valid)).group_by(col)
+        ).all())
+        if bad:
+            raise RuntimeError(
+                f"gaprequestdb.timeline_status outside {valid}: {bad}; "
+                "update those rows to one of these values and run migrate.py again"
+            )
+        return conn.execute(
+            update(GAPRequestDB).where(col.not_in(valid)).values(timeline_status=func.trim(col))
+        ).rowcount or 0
+
+
+def schema_version(engine: Engine) -> Optional[int]:
+    """None = DB ว่าง (ยังไม่มีตารางของแอป), 0 = DB เดิมที่ยังไม่เคยผ่าน migrate.py"""
+    from model import TableVersionDB
+
+    with engine.connect() as conn:
+        have = set(inspect(conn).get_table_names())
+        if not have & set(SQLModel.metadata.tables):
+            return None
+        if TableVersionDB.__tablename__ not in have:
+            return 0
+        row = conn.execute(
+            TableVersionDB.__table__.select().where(TableVersionDB.name == SCHEMA_ROW)
+        ).first()
+        return row.version if row else 0
+
+
+def _stamp(engine: Engine) -> None:
+    from model import TableVersionDB
+
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        res = conn.execute(update(TableVersionDB).where(TableVersionDB.name == SCHEMA_ROW)
+                           .values(version=SCHEMA_VERSION, updated_at=now))
+        if not res.rowcount:
+            conn.execute(TableVersionDB.__table__.insert().values(
+                name=SCHEMA_ROW, version=SCHEMA_VERSION, updated_at=now))
+
+
+def ensure_schema(engine: Engine) -> dict:
+    """ตอน start app: DB ว่าง → สร้างตารางทั้งหมด; DB เดิมต้องเป็น SCHEMA_VERSION อยู่แล้ว ไม่แก้อะไรเอง"""
+    ver = schema_version(engine)
+    if ver is None:
+        return upgrade(engine)
+    if ver < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"database schema is version {ver}, this code needs {SCHEMA_VERSION}: "
+            "back up the database, then run `python migrate.py`"
+        )
+    if ver > SCHEMA_VERSION:
+        raise RuntimeError(f"database schema is version {ver}, newer than this code ({SCHEMA_VERSION})")
+    return {}
+
+
+def upgrade(engine: Engine) -> dict:
+    before = set(inspect(engine).get_table_names())
+    # ตรวจก่อน create_all: ถ้าไม่ผ่าน DB ต้องเหมือนเดิมทุกอย่าง (ตารางใหม่ที่ยังไม่มีคือสัญญาณให้ rebuild ด้านล่าง)
+    out = {"statuses_normalized": normalize_statuses(engine)}
+    SQLModel.metadata.create_all(engine)
+    out["user_fk_converted"] = convert_user_ids(engine)
+    out["columns_added"] = ensure_columns(engine)
+    out["indexes_created"] = ensure_indexes(engine)
+    from search import ensure_fts
+    out["fts_created"] = ensure_fts(engine)
+    if ("answerdb" in before and "evaluationsummarydb" not in before) or \
+            "evaluationsummarydb.rubric_version" in out["columns_added"]:
+        # DB เดิมที่มีคำตอบอยู่แล้ว → เติม summary ครั้งแรก / ประทับ rubric_version ให้ summary เดิม
+        from evaluation import rebuild
+        out["evaluation_summary"] = rebuild(engine)
+    if "personaldb" in before and "personalgramdb" not in before:
+        from person_search import rebuild as rebuild_grams
+        out["person_grams"] = rebuild_grams(engine)
+    if "personaldb" in before and "rollupdb" not in before:
+        from rollup import rebuild as rebuild_rollups
+        out["rollups"] = rebuild_rollups(engine)
+    _stamp(engine)
+    out["schema_version"] = SCHEMA_VERSION
+    return out
+
+
+if __name__ == "__main__":
+    from data import engine
+    import model  # noqa: F401  (register tables)
+
+    try:
+        print(upgrade(engine))
+    except RuntimeError as e:  # เช่น user_id ที่ไม่มีเจ้าของ: ไม่ได้แก้อะไร แจ้งแล้วจบ
+        sys.exit(f"migrate: {e}")
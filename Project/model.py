@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import Optional, List
-from datetime import date
+from typing import Optional, List, Dict, Generic, TypeVar
+from datetime import date, datetime, timezone
 from enum import Enum
 from pydantic import BaseModel
-from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, JSON
+from sqlalchemy.orm import relationship
+from sqlmodel import SQLModel, Field, Relationship
 
 
 
@@ -16,21 +18,30 @@ class ActivityLevel(str, Enum):
     Minor = "Minor"
 
 
+class GapStatus(str, Enum):
+    Pending = "รอจัดผู้ตรวจสอบ"
+    Inspecting = "อยู่ระหว่างตรวจ"
+    Inspected = "ตรวจเสร็จ"
+    Certified = "ออกเกียรติบัตรแล้ว"
+
+
 
 
 # ===============================
 # 1) ผู้ใช้ / ฟาร์ม / ทุเรียน
 # ===============================
 class PersonalDB(SQLModel, table=True):
+    __table_args__ = (Index("ix_personaldb_name_surname", "name", "surname"),)
+
     user_id: Optional[int] = Field(default=None, primary_key=True)  # DB gen
     name: str
-    surname: str
-    phone_number: str
+    surname: str = Field(index=True)
+    phone_number: str = Field(index=True)
     user_type: str
     idcard_file: str
     birth: date
     religion: str
-    id_number: str
+    id_number: str = Field(index=True)
     village_name: str
     house_number: str
     road: str
@@ -39,6 +50,17 @@ class PersonalDB(SQLModel, table=True):
     district: str
     subdistrict: str
 
+    # ตารางลูกอ้าง user_id ด้วย foreign key (ON DELETE CASCADE) → ลบผ่าน DB ไม่โหลดลูกมาทีละแถว
+    # (ใช้ sa_relationship ตรง ๆ เพราะไฟล์นี้เปิด from __future__ import annotations)
+    farms: List["FarmDB"] = Relationship(sa_relationship=relationship(
+        back_populates="owner", order_by="FarmDB.farm_id", passive_deletes=True))
+    durians: List["DurianDB"] = Relationship(sa_relationship=relationship(
+        back_populates="owner", order_by="DurianDB.durian_id", passive_deletes=True))
+    answers: List["AnswerDB"] = Relationship(sa_relationship=relationship(
+        back_populates="owner", order_by="AnswerDB.activity_id", passive_deletes=True))
+    agreement_answers: List["AgreementAnswerDB"] = Relationship(sa_relationship=relationship(
+        back_populates="owner", passive_deletes=True))
+
 
 class Personal(BaseModel):  # ไม่ต้องมี user_id ตอนสร้าง
     name: str
@@ -65,18 +87,38 @@ class PersonalUpdate(Personal):
     user_id: int
 
 
+class PersonalGramDB(SQLModel, table=True):
+    # inverted index ของ trigram จากชื่อ-นามสกุล ใช้ค้นหาแบบ fuzzy
+    gram: str = Field(primary_key=True)
+    user_id: int = Field(primary_key=True, index=True)
+
+
+class PersonalHit(BaseModel):
+    user_id: int
+    name: str
+    surname: str
+    phone_number: str
+    id_number: str
+    score: float  # prefix = 1.0, fuzzy = ความคล้าย (Jaccard ของ trigram)
+
+
 
 
 class FarmDB(SQLModel, table=True):
     farm_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: str
+    user_id: int = Field(foreign_key="personaldb.user_id", ondelete="CASCADE", index=True)
     location: Optional[str] = None
     titledeed_num: Optional[str] = None
     titledeed_file: Optional[str] = None
 
+    owner: Optional["PersonalDB"] = Relationship(sa_relationship=relationship(back_populates="farms"))
+    requests: List["GAPRequestDB"] = Relationship(sa_relationship=relationship(
+        "GAPRequestDB", primaryjoin="foreign(GAPRequestDB.farm_id) == FarmDB.farm_id",
+        order_by="GAPRequestDB.request_id.desc()", viewonly=True))
+
 
 class Farm(BaseModel):
-    user_id: str
+    user_id: int
     location: Optional[str] = None
     titledeed_num: Optional[str] = None
     titledeed_file: Optional[str] = None
@@ -91,7 +133,7 @@ class FarmUpdate(Farm):
 
 class DurianDB(SQLModel, table=True):
     durian_id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: str
+    user_id: int = Field(foreign_key="personaldb.user_id", ondelete="CASCADE", index=True)
     durian_type: Optional[str] = None
     durian_age: Optional[int] = None
     tree_count: Optional[int] = None
@@ -99,9 +141,11 @@ class DurianDB(SQLModel, table=True):
     harvest_month: Optional[str] = None
     weight_expected: Optional[float] = None
 
+    owner: Optional["PersonalDB"] = Relationship(sa_relationship=relationship(back_populates="durians"))
+
 
 class Durian(BaseModel):
-    user_id: str
+    user_id: int
     durian_type: Optional[str] = None
     durian_age: Optional[int] = None
     tree_count: Optional[int] = None
@@ -136,7 +180,7 @@ class AssessmentCategoryOut(AssessmentCategory):
 
 class ActivityDB(SQLModel, table=True):
     activity_id: Optional[int] = Field(default=None, primary_key=True)
-    categoryapp_id: int
+    categoryapp_id: int = Field(index=True)
     activity_name: str
     activity_type: ActivityLevel
 
@@ -154,17 +198,23 @@ class ActivityOut(Activity):
 
 
 class AnswerDB(SQLModel, table=True):
+    # 1 คำตอบต่อ (user, activity) → upsert ใช้ index เดียว
+    __table_args__ = (Index("ux_answerdb_user_activity", "user_id", "activity_id", unique=True),)
+
     answer_id: Optional[int] = Field(default=None, primary_key=True)
     activity_id: int
-    user_id: str
+    # index ของ foreign key คือ ux_answerdb_user_activity (user_id นำหน้า)
+    user_id: int = Field(foreign_key="personaldb.user_id", ondelete="CASCADE")
     answer_file: Optional[str] = None
     answer_text: Optional[str] = None
     result_each: Optional[int] = None  # admin ใส่ 0/1 ภายหลัง
 
+    owner: Optional["PersonalDB"] = Relationship(sa_relationship=relationship(back_populates="answers"))
+
 
 class Answer(BaseModel):
     activity_id: int
-    user_id: str
+    user_id: int
     answer_file: Optional[str] = None
     answer_text: Optional[str] = None
     result_each: Optional[int] = None
@@ -174,6 +224,44 @@ class AnswerOut(Answer):
     answer_id: int
 
 
+class AnswerSheetItem(BaseModel):
+    activity_id: int
+    answer_file: Optional[str] = None
+    answer_text: Optional[str] = None
+    result_each: Optional[int] = None
+
+
+class AnswerSheet(BaseModel):  # ส่งคำตอบทั้งแบบประเมินใน request เดียว
+    user_id: int
+    items: List[AnswerSheetItem]
+
+
+class AnswerBulkItemResult(BaseModel):
+    activity_id: int
+    status: str  # created / updated / error
+    answer_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class AnswerBulkResult(BaseModel):
+    user_id: int
+    created: int
+    updated: int
+    errors: int
+    items: List[AnswerBulkItemResult]
+
+
+class ScoreItem(BaseModel):  # ให้คะแนนข้าม user ใน request เดียว
+    user_id: int
+    activity_id: int
+    result_each: Optional[int] = None
+
+
+class EvaluateBatch(BaseModel):  # ประเมินหลาย user; ไม่ระบุ user_ids = ทุกคน (หรือทั้งจังหวัด)
+    user_ids: Optional[List[int]] = None
+    province: Optional[str] = None
+
+
 
 
 class CriteriaDB(SQLModel, table=True):
@@ -195,6 +283,29 @@ class CriteriaOut(Criteria):
 
 
 
+class EvaluationSummaryDB(SQLModel, table=True):
+    # ผลประเมินสะสมต่อ user อัปเดตใน transaction เดียวกับการเขียน AnswerDB
+    user_id: int = Field(primary_key=True, foreign_key="personaldb.user_id", ondelete="CASCADE")
+    major_pass: Dict[str, int] = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))  # หมวด → Major ที่ได้ 1
+    minor_pass: int = 0
+    scored_ids: List[int] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))  # activity ที่ให้คะแนนแล้ว
+    missing_count: int = 0
+    eligible: bool = False
+    answer_version: int = 0  # เพิ่มทุกครั้งที่คำตอบของ user เปลี่ยน
+    rubric_version: Optional[int] = None  # TableVersionDB["master"] ที่ใช้คำนวณ (ไม่ตรง = ตัวนับเก่า)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+
+class TableVersionDB(SQLModel, table=True):
+    # เวอร์ชันของข้อมูลที่ client แคชได้ (ETag) เพิ่มใน transaction เดียวกับการเขียน
+    name: str = Field(primary_key=True)  # "master" = หมวด / กิจกรรม / เกณฑ์, "schema" = migrate.SCHEMA_VERSION
+    version: int = 0
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+
+
 # ===============================
 # 3) Agreement / GAP / Inspection / Certificate
 # ===============================
@@ -216,13 +327,15 @@ class AgreementOut(Agreement):
 class AgreementAnswerDB(SQLModel, table=True):
     ag_answer_id: Optional[int] = Field(default=None, primary_key=True)
     agreement_id: int
-    user_id: str
+    user_id: int = Field(foreign_key="personaldb.user_id", ondelete="CASCADE", index=True)
     agreement_answer: str  # "ยอมรับ" / "ไม่ยอมรับ"
 
+    owner: Optional["PersonalDB"] = Relationship(sa_relationship=relationship(back_populates="agreement_answers"))
+
 
 class AgreementAnswer(BaseModel):
     agreement_id: int
-    user_id: str
+    user_id: int
     agreement_answer: str
 
 
@@ -233,27 +346,47 @@ class AgreementAnswerOut(AgreementAnswer):
 
 
 class GAPRequestDB(SQLModel, table=True):
+    # คิวของผู้ตรวจ (workqueue.py): WHERE timeline_status = ? ORDER BY request_date, request_id
+    # claim_expires_at อยู่ท้าย index → ข้ามแถวที่มีคนรับไว้แล้วได้โดยไม่ต้องอ่านตาราง
+    __table_args__ = (
+        Index("ix_gaprequestdb_queue", "timeline_status", "request_date", "request_id", "claim_expires_at"),
+    )
+
     request_id: Optional[int] = Field(default=None, primary_key=True)
-    farm_id: int
+    farm_id: int = Field(index=True)
     request_date: date
-    timeline_status: str  # ex. รอจัดผู้ตรวจสอบ / อยู่ระหว่างตรวจ / ตรวจเสร็จ / ออกเกียรติบัตรแล้ว
+    timeline_status: str  # ค่าของ GapStatus (ไม่ใช้ชนิด Enum ของ SQLAlchemy ซึ่งเก็บชื่อ member แทนค่า)
+    claimed_by: Optional[str] = None  # ผู้ตรวจที่รับงานจากคิว
+    claim_expires_at: Optional[datetime] = None  # หมดเวลาแล้วไม่ต่อ → กลับเข้าคิว
+
+    inspections: List["InspectionDB"] = Relationship(sa_relationship=relationship(
+        "InspectionDB", primaryjoin="foreign(InspectionDB.request_id) == GAPRequestDB.request_id",
+        order_by="InspectionDB.inspector_id.desc()", viewonly=True))  # ล่าสุดก่อน
+    certifications: List["CertificationDB"] = Relationship(sa_relationship=relationship(
+        "CertificationDB", primaryjoin="foreign(CertificationDB.request_id) == GAPRequestDB.request_id",
+        order_by="CertificationDB.cert_id", viewonly=True))
 
 
 class GAPRequest(BaseModel):
     farm_id: int
     request_date: date
-    timeline_status: str = "รอจัดผู้ตรวจสอบ"
+    timeline_status: GapStatus = GapStatus.Pending
 
 
 class GAPRequestOut(GAPRequest):
     request_id: int
 
 
+class GAPRequestClaim(GAPRequestOut):
+    claimed_by: str
+    claim_expires_at: datetime
+
+
 
 
 class InspectionDB(SQLModel, table=True):
     inspector_id: Optional[int] = Field(default=None, primary_key=True)
-    request_id: int
+    request_id: int = Field(index=True)
     complete_date: date
     status_result: str  # "ผ่าน" / "ไม่ผ่าน"
 
@@ -272,10 +405,10 @@ class InspectionOut(Inspection):
 
 class CertificationDB(SQLModel, table=True):
     cert_id: Optional[int] = Field(default=None, primary_key=True)
-    request_id: int
+    request_id: int = Field(index=True)
     farm_id: int
     issue_date: date
-    expire_date: date
+    expire_date: date = Field(index=True)  # expiry.py ไล่ตามช่วงวันหมดอายุ
     cert_file: str
     addition: Optional[str] = None
 
@@ -296,7 +429,32 @@ class CertificationOut(Certification):
 
 
 # ===============================
-# 4) POST search activities (หลายฟิลด์)
+# 4) Pagination (keyset บน primary key)
+# ===============================
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[int] = None  # ส่งกลับมาเป็น ?after= เพื่อขอหน้าถัดไป (None = หน้าสุดท้าย)
+
+
+class CursorPage(BaseModel, Generic[T]):
+    # เหมือน Page แต่ key เรียงหลายคอลัมน์ → cursor เป็น token (paging.encode_cursor)
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PersonalBasic(BaseModel):
+    user_id: int
+    name: str
+    surname: str
+
+
+
+
+# ===============================
+# 5) POST search activities / answers (หลายฟิลด์)
 # ===============================
 class ActivitySearch(BaseModel):
     categoryapp_ids: Optional[List[int]] = None
@@ -304,4 +462,105 @@ class ActivitySearch(BaseModel):
     keyword: Optional[str] = None
 
 
+class AnswerSearch(BaseModel):  # แอดมินค้นคำตอบแบบข้อความของทุกเกษตรกร
+    keyword: str
+    user_id: Optional[int] = None
+    activity_ids: Optional[List[int]] = None
+    limit: int = Field(default=50, ge=1, le=500)
+
+
+
+
+
+
+
+# ===============================
+# 6) ไฟล์ (blob store) — blob_id = SHA-256 ของเนื้อหา
+# ===============================
+class BlobDB(SQLModel, table=True):
+    blob_id: str = Field(primary_key=True, max_length=64)
+    size: int
+    content_type: str = "application/octet-stream"
+    filename: Optional[str] = None  # ชื่อไฟล์ตอนอัปโหลดครั้งแรก
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class BlobOut(BaseModel):
+    blob_id: str
+    size: int
+    content_type: str
+    filename: Optional[str] = None
+    deduplicated: bool = False  # True = มีไฟล์เนื้อหาเดียวกันอยู่แล้ว ไม่ได้เก็บซ้ำ
+
 
+
+
+# ===============================
+# 7) ตัวเลขสรุปสำหรับ dashboard (rollup.py) — นับล่วงหน้าต่อกลุ่ม
+# ===============================
+class RollupDB(SQLModel, table=True):
+    # ช่องที่ไม่ใช้ของ metric นั้นเป็น "" (primary key ห้าม NULL)
+    metric: str = Field(primary_key=True)  # farmers / gap_requests / inspections / certifications
+    province: str = Field(primary_key=True)
+    district: str = Field(primary_key=True)
+    status: str = Field(primary_key=True)  # timeline_status / status_result
+    month: str = Field(primary_key=True)  # "YYYY-MM"
+    count: int = 0
+
+
+
+
+# ===============================
+# 8) นำเข้าข้อมูลจำนวนมาก (importer.py)
+# ===============================
+class ImportRowError(BaseModel):
+    row: int  # เลขแถวในไฟล์ (หัวตาราง = 1)
+    errors: List[str]
+
+
+class ImportResult(BaseModel):
+    kind: str
+    rows: int
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]  # แสดงไม่เกิน importer.MAX_ERRORS แถว
+
+
+
+
+# ===============================
+# 9) หน้ารวมของเกษตรกร (GET /users/{user_id}/overview)
+# ===============================
+class GAPRequestOverview(GAPRequestOut):
+    latest_inspection: Optional[InspectionOut] = None
+
+
+class UserOverview(BaseModel):
+    profile: PersonalOut
+    farms: List[FarmOut]
+    durians: List[DurianOut]
+    requests: List[GAPRequestOverview]  # ใหม่สุดก่อน
+    certifications: List[CertificationOut]  # เฉพาะที่ยังไม่หมดอายุ
+    evaluation: dict  # เหมือน /assessment/evaluate
+
+
+
+
+# ===============================
+# 10) แจ้งเตือนเกียรติบัตรใกล้หมดอายุ (expiry.py) — outbox ให้ตัวส่งข้อความมาอ่านไปส่ง
+# ===============================
+class NotificationOutboxDB(SQLModel, table=True):
+    # 1 แถวต่อ (เกียรติบัตร, ช่วงเตือน) → สแกนซ้ำกี่รอบก็ไม่เตือนซ้ำ (ON CONFLICT DO NOTHING)
+    __table_args__ = (
+        Index("ux_notificationoutboxdb_cert_window", "cert_id", "window_days", unique=True),
+        Index("ix_notificationoutboxdb_pending", "sent_at", "notification_id"),  # ตัวส่ง: WHERE sent_at IS NULL
+    )
+
+    notification_id: Optional[int] = Field(default=None, primary_key=True)
+    cert_id: int
+    window_days: int  # เตือนล่วงหน้า 90 / 30 / 7 วัน
+    user_id: Optional[int] = Field(default=None, foreign_key="personaldb.user_id", ondelete="CASCADE", index=True)
+    farm_id: int
+    expire_date: date
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    sent_at: Optional[datetime] = None
@@ -0,0 +1,64 @@
+"""keyset pagination บน primary key (ใช้ร่วมกันทั้ง handler sync และ async)"""
+import base64
+import json
+import math
+from typing import Optional, Tuple
+
+from sqlmodel import Session
+
+
+PAGE_LIMIT = 100
+PAGE_LIMIT_MAX = 1000
+
+
+def columns(entity, out_model):
+    # select เฉพาะคอลัมน์ที่ response model ใช้จริง
+    return [getattr(entity, f) for f in out_model.model_fields]
+
+
+def keyset_stmt(stmt, key, limit: int, after: Optional[int], descending: bool = False):
+    # ดึง limit+1 แถวเพื่อรู้ว่ามีหน้าถัดไปไหม
+    if after is not None:
+        stmt = stmt.where(key < after if descending else key > after)
+    return stmt.order_by(key.desc() if descending else key).limit(limit + 1)
+
+
+def keyset_result(rows, key, limit: int) -> dict:
+    items = [dict(r._mapping) for r in rows[:limit]]
+    next_cursor = items[-1][key.key] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def keyset_page(session: Session, stmt, key, limit: int, after: Optional[int], descending: bool = False) -> dict:
+    rows = session.exec(keyset_stmt(stmt, key, limit, after, descending)).all()
+    return keyset_result(rows, key, limit)
+
+
+# ---------------- cursor หลายคอลัมน์ (เช่น (คะแนน, user_id) ของผลค้นหา) ----------------
+def encode_cursor(*values) -> str:
+    """ค่า key ของแถวสุดท้าย → token ทึบสำหรับ ?after= (client ไม่ต้องรู้รูปแบบ)"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _typed(value, types) -> bool:
+    # bool เป็น subclass ของ int; NaN / Infinity ที่ json.loads รับได้เทียบลำดับไม่ได้
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def decode_cursor(token: str, *types) -> Tuple:
+    """ValueError ถ้า token ไม่ได้มาจาก encode_cursor (จำนวนหรือชนิดของค่าไม่ตรงกับ types)
+
+        decode_cursor(after, str, int)            # (ค่าที่ตรง, user_id)
+        decode_cursor(after, (int, float), int)   # (คะแนน, user_id)
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("invalid cursor") from None
+    if not isinstance(values, list) or len(values) != len(types) or \
+            not all(_typed(v, t) for v, t in zip(values, types)):
+        raise ValueError("invalid cursor")
+    return tuple(values)
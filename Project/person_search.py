@@ -0,0 +1,195 @@
+"""ค้นหาบุคคลด้วย index แทนการสแกน/ดาวน์โหลด /personals ทั้งหมด
+
+- prefix: ช่วงค่า (col >= q AND col < q + U+10FFFF) บน name / surname หรือ phone_number / id_number
+  (ถ้าคำค้นเป็นตัวเลข) ใช้ B-tree index ได้ตรง ๆ ต่างจาก LIKE 'q%' ที่ SQLite มักใช้ index ไม่ได้
+- fuzzy: trigram ของ "ชื่อ นามสกุล" เก็บใน PersonalGramDB (gram, user_id)
+  หา candidate ที่มี trigram ร่วมกันมากสุด แล้วให้คะแนนด้วย Jaccard similarity
+  ทนต่อการพิมพ์ผิด/สะกดต่าง/พิมพ์บางส่วน
+
+สร้าง index ใหม่ทั้งหมด:  python person_search.py rebuild
+"""
+import sys
+import unicodedata
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import Engine, delete, insert, tuple_, union_all
+from sqlmodel import Session, select
+
+from model import PersonalDB, PersonalGramDB
+from paging import decode_cursor, encode_cursor
+
+
+HIT_COLUMNS = (PersonalDB.user_id, PersonalDB.name, PersonalDB.surname, PersonalDB.phone_number, PersonalDB.id_number)
+MAX_CHAR = chr(0x10FFFF)
+FUZZY_CANDIDATES = 500  # จำนวน candidate สูงสุดที่นำมาคำนวณคะแนน
+GRAM_POSTINGS_CAP = 500  # trigram ที่มีคนใช้มากกว่านี้ไม่ช่วยแยกผล (เหมือน stop-word)
+MIN_SIMILARITY = 0.25
+
+
+def normalize(s: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", s).casefold().split())
+
+
+def trigrams(s: str) -> Set[str]:
+    s = normalize(s)
+    if not s:
+        return set()
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def person_grams(name: str, surname: str) -> Set[str]:
+    return trigrams(f"{name} {surname}")
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+# ---------------- maintenance ----------------
+def index_people(session: Session, people: Iterable, new: bool = False) -> None:
+    """(re)index trigram ของบุคคล — people คือแถวที่มี user_id / name / surname
+    new=True: เพิ่งสร้าง ยังไม่มี trigram เดิมให้ลบ"""
+    people = list(people)
+    if not people:
+        return
+    if not new:
+        session.exec(delete(PersonalGramDB).where(PersonalGramDB.user_id.in_([p.user_id for p in people])))
+    rows = [{"gram": g, "user_id": p.user_id} for p in people for g in person_grams(p.name, p.surname)]
+    if rows:
+        # executemany ผ่าน Core (connection เดียวกับ session) — เร็วกว่า ORM bulk insert หลายเท่า
+        session.connection().execute(insert(PersonalGramDB), rows)
+
+
+def rebuild(engine: Engine, batch: int = 5000) -> dict:
+    n = 0
+    with Session(engine) as session:
+        session.exec(delete(PersonalGramDB))
+        last = 0
+        while True:
+            people = session.exec(
+                select(PersonalDB.user_id, PersonalDB.name, PersonalDB.surname)
+                .where(PersonalDB.user_id > last).order_by(PersonalDB.user_id).limit(batch)
+            ).all()
+            if not people:
+                break
+            rows = [{"gram": g, "user_id": p.user_id} for p in people for g in person_grams(p.name, p.surname)]
+            if rows:
+                session.exec(insert(PersonalGramDB), params=rows)
+            session.commit()
+            last = people[-1].user_id
+            n += len(people)
+    return {"people": n}
+
+
+# ---------------- search ----------------
+def _hit(row, score: float) -> dict:
+    return {**dict(row._mapping), "score": round(score, 4)}
+
+
+def _prefix_columns(q: str):
+    # ตัวเลขล้วน → เบอร์โทร/เลขบัตร, นอกนั้น → ชื่อ/นามสกุล (ลด OR ที่ต้องรวมผล)
+    digits = q.replace("-", "").isdigit()
+    return (PersonalDB.phone_number, PersonalDB.id_number) if digits else (PersonalDB.name, PersonalDB.surname)
+
+
+def _prefix(col, q: str):
+    return (col >= q) & (col < q + MAX_CHAR)
+
+
+def _prefix_key(row, cols, q: str) -> tuple:
+    # user เดียวอาจตรงหลายคอลัมน์ (ชื่อและนามสกุล) → ใช้ค่าที่เรียงก่อนสุด
+    return min((getattr(row, c.key), row.user_id) for c in cols if q <= getattr(row, c.key) < q + MAX_CHAR)
+
+
+def search_prefix(session: Session, q: str, limit: int, after: Optional[str] = None) -> dict:
+    """เรียงตามค่าที่ตรง (ตัวอักษร) แล้ว user_id; after = next_cursor ของหน้าก่อน (ค่าที่ตรง, user_id)
+
+    แต่ละคอลัมน์อ่านจาก index ต่อจาก cursor ไม่เกิน limit+1 แถว ไม่ต้อง sort ทั้งชุดที่ตรง
+    และไม่ต้องข้ามแถวของหน้าก่อน ๆ (หน้าลึกเร็วเท่าหน้าแรก)
+    """
+    cursor = decode_cursor(after, str, int) if after is not None else None
+    q = q.strip()
+    cols = _prefix_columns(q)
+    best = {}
+    for col in cols:
+        stmt = select(*HIT_COLUMNS).where(_prefix(col, q))
+        if cursor is not None:
+            value, uid = cursor
+            stmt = stmt.where(col >= value, tuple_(col, PersonalDB.user_id) > tuple_(value, uid))
+            for other in cols:
+                if other is not col:
+                    # ตรงอีกคอลัมน์ด้วยค่าที่ไม่เกิน cursor = แสดงไปแล้วในหน้าก่อน
+                    stmt = stmt.where(~(_prefix(other, q) & (tuple_(other, PersonalDB.user_id) <= tuple_(value, uid))))
+        for r in session.exec(stmt.order_by(col, PersonalDB.user_id).limit(limit + 1)).all():
+            best[r.user_id] = (_prefix_key(r, cols, q), r)
+    ordered = sorted(best.values(), key=lambda x: x[0])
+    page = ordered[:limit]
+    nxt = encode_cursor(*page[-1][0]) if len(ordered) > limit else None
+    return {"items": [_hit(r, 1.0) for _, r in page], "next_cursor": nxt}
+
+
+def _candidates(session: Session, grams: Set[str]) -> Dict[int, int]:
+    """นับ trigram ที่ตรงต่อ user; trigram ที่พบบ่อยเกิน GRAM_POSTINGS_CAP ถือเป็น stop-gram ข้ามไป
+
+    posting ของทุก gram (ตัดที่ cap+1 แถว) ดึงใน statement เดียวด้วย UNION ALL
+    """
+    parts = [
+        select(PersonalGramDB.gram, PersonalGramDB.user_id)
+        .where(PersonalGramDB.gram == g).limit(GRAM_POSTINGS_CAP + 1).subquery().select()
+        for g in sorted(grams)
+    ]
+    postings: Dict[str, list] = {}
+    for gram, uid in session.exec(union_all(*parts)).all():
+        postings.setdefault(gram, []).append(uid)
+    counts: Dict[int, int] = {}
+    common = []
+    for users in postings.values():
+        if len(users) > GRAM_POSTINGS_CAP:
+            common.append(users)
+            continue
+        for u in users:
+            counts[u] = counts.get(u, 0) + 1
+    if not counts:
+        # ทุก trigram พบบ่อยมาก (ชื่อยอดนิยม) → ใช้ posting ช่วงแรกของแต่ละ gram แทน
+        for users in common:
+            for u in users:
+                counts[u] = counts.get(u, 0) + 1
+    return counts
+
+
+def search_fuzzy(session: Session, q: str, limit: int, after: Optional[str] = None,
+                 min_similarity: float = MIN_SIMILARITY) -> dict:
+    """เรียงตามคะแนนมากไปน้อยแล้ว user_id; after = next_cursor ของหน้าก่อน (คะแนน, user_id)"""
+    cursor = decode_cursor(after, (int, float), int) if after is not None else None  # ผิดรูป → 400 เสมอ
+    grams = trigrams(q)
+    if not grams:
+        return {"items": [], "next_cursor": None}
+    counts = _candidates(session, grams)
+    cand = sorted(counts, key=lambda u: (-counts[u], u))[:FUZZY_CANDIDATES]
+    if not cand:
+        return {"items": [], "next_cursor": None}
+    rows = session.exec(select(*HIT_COLUMNS).where(PersonalDB.user_id.in_(cand))).all()
+    scored = []
+    for r in rows:
+        score = similarity(grams, person_grams(r.name, r.surname))
+        if score >= min_similarity:
+            scored.append((score, r))
+    scored.sort(key=lambda x: (-x[0], x[1].user_id))
+    if cursor is not None:
+        score, uid = cursor
+        scored = [x for x in scored if (-x[0], x[1].user_id) > (-score, uid)]
+    page = scored[:limit]
+    nxt = encode_cursor(page[-1][0], page[-1][1].user_id) if len(scored) > limit else None
+    return {"items": [_hit(r, s) for s, r in page], "next_cursor": nxt}
+
+
+if __name__ == "__main__":
+    from data import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        sys.exit("usage: python person_search.py rebuild")
+    print(rebuild(engine))
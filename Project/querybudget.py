@@ -0,0 +1,154 @@
+"""งบจำนวน SQL ต่อ route — จับ N+1 ตั้งแต่ตอนเทสต์
+
+ประกาศงบที่ route (ใต้ @app.get/post/...):
+
+    @app.get("/assessment/evaluate")
+    @budget(2)                 # ไม่เกิน 2 statement
+    def evaluate(...): ...
+
+    @budget(8, repeat=3)       # statement รูปเดียวกันซ้ำได้ไม่เกิน 3 ครั้ง (ค่าเริ่มต้น 1)
+    @budget(None)              # ไม่จำกัด — route ที่ stream ทีละ chunk ตามขนาดข้อมูล
+
+หรือครอบโค้ดใด ๆ เป็น context manager (raise QueryBudgetExceeded ตอนออก):
+
+    with budget(3):
+        ...
+
+ตรวจทุก request ผ่าน QueryBudgetMiddleware:
+- pytest:  pytest -p querybudget  แล้วใช้ fixture ``query_budget`` — เทสต์ fail ถ้ามี request เกินงบ
+- runtime: GAP_QUERY_BUDGET=warn (log) หรือ raise (exception ลง log ของ server หลังส่ง response)
+  ค่าเริ่มต้นปิด ไม่เสียเวลาเก็บ SQL
+
+"รูป" ของ statement = SQL ที่ยุบช่องว่างและรายการ parameter ใน IN (...) / VALUES แล้ว
+"""
+import logging
+import os
+import re
+from collections import Counter
+from typing import List, Optional
+
+import sqltrace
+
+
+log = logging.getLogger("gap.querybudget")
+
+_PARAM = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PARAM_LIST = re.compile(r"\(\s*" + _PARAM + r"(?:\s*,\s*" + _PARAM + r")*\s*\)")
+_VALUES_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def shape(statement: str) -> str:
+    s = _SPACE.sub(" ", statement).strip()
+    s = _PARAM_LIST.sub("(?)", s)
+    return _VALUES_ROWS.sub(r"\1", s)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Budget:
+    def __init__(self, max_queries: Optional[int], repeat: int = 1):
+        self.max_queries = max_queries
+        self.repeat = repeat
+        self._tracker = None
+        self._stats = None
+
+    def __repr__(self):
+        return f"budget({self.max_queries}, repeat={self.repeat})"
+
+    # ---- decorator: แค่ติดงบไว้ที่ฟังก์ชัน (FastAPI ยังเห็น signature เดิม) ----
+    def __call__(self, fn):
+        fn.__query_budget__ = self
+        return fn
+
+    # ---- context manager ----
+    def __enter__(self):
+        self._tracker = sqltrace.track(record=True)
+        self._stats = self._tracker.__enter__()
+        return self._stats
+
+    def __exit__(self, exc_type, exc, tb):
+        self._tracker.__exit__(exc_type, exc, tb)
+        problems = self.violations(self._stats.statements)
+        if problems and exc_type is None:
+            raise QueryBudgetExceeded("; ".join(problems))
+        return False
+
+    def violations(self, statements: List[str]) -> List[str]:
+        out = []
+        if self.max_queries is None:
+            return out
+        if len(statements) > self.max_queries:
+            out.append(f"{len(statements)} statements > budget {self.max_queries}")
+        for s, n in Counter(shape(s) for s in statements).most_common():
+            if n <= self.repeat:
+                break
+            out.append(f"statement repeated {n}x > {self.repeat}: {s[:160]}")
+        return out
+
+
+budget = Budget
+
+
+def budget_of(endpoint) -> Optional[Budget]:
+    return getattr(endpoint, "__query_budget__", None)
+
+
+# ---------------- enforcement ----------------
+class _State:
+    mode = os.environ.get("GAP_QUERY_BUDGET", "off").lower()  # off / warn / raise / collect
+    violations: List[str] = []
+
+
+state = _State()
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or state.mode == "off":
+            return await self.app(scope, receive, send)
+        with sqltrace.track(record=True) as q:
+            await self.app(scope, receive, send)
+        route = scope.get("route")
+        b = budget_of(getattr(route, "endpoint", None))
+        if b is None:
+            if route is not None:
+                problems = ["route has no @budget"]
+            else:
+                return
+        else:
+            problems = b.violations(q.statements)
+        if not problems:
+            return
+        msg = f"{scope['method']} {route.path}: " + "; ".join(problems)
+        if state.mode == "warn":
+            log.warning(msg)
+        elif state.mode == "raise":
+            raise QueryBudgetExceeded(msg)
+        else:
+            state.violations.append(msg)
+
+
+# ---------------- pytest plugin (pytest -p querybudget) ----------------
+try:
+    import pytest
+except ImportError:  # ใช้ใน production ไม่ต้องมี pytest
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """เทสต์ที่ใช้ fixture นี้จะ fail ถ้ามี request ใดเกินงบของ route"""
+        prev = state.mode
+        state.mode, state.violations = "collect", []
+        try:
+            yield state.violations
+        finally:
+            state.mode = prev
+        if state.violations:
+            pytest.fail("query budget exceeded:\n" + "\n".join(state.violations), pytrace=False)
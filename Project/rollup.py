@@ -0,0 +1,191 @@
+"""ตัวเลขสรุปสำหรับ dashboard ของแอดมิน (GET /stats/*)
+
+RollupDB เก็บจำนวนต่อกลุ่ม (metric, จังหวัด, อำเภอ, สถานะ, เดือน):
+- farmers          เกษตรกรต่อจังหวัด/อำเภอ
+- gap_requests     คำขอ GAP ต่อ timeline_status ปัจจุบัน, เดือน = request_date
+- inspections      ผลตรวจ (ผ่าน/ไม่ผ่าน), เดือน = complete_date
+- certifications   เกียรติบัตร, เดือน = issue_date
+จังหวัด/อำเภอของคำขอ/ผลตรวจ/เกียรติบัตร = ที่อยู่ของเจ้าของฟาร์ม
+
+handler ที่เขียนข้อมูลเหล่านี้เรียก bump() ใน transaction เดียวกัน (upsert count = count + n)
+dashboard จึงอ่านแค่จำนวนกลุ่ม ไม่ต้องนับทุกแถว
+
+ตรวจ/สร้างใหม่ทั้งหมดจากตารางจริง:
+    python rollup.py rebuild [--check]
+"""
+import sys
+from collections import Counter
+from datetime import date
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import Engine, delete, func
+from sqlalchemy import select as sa_select
+from sqlmodel import Session, select
+
+from model import CertificationDB, FarmDB, GAPRequestDB, InspectionDB, PersonalDB, RollupDB
+
+
+Key = Tuple[str, str, str, str, str]  # (metric, province, district, status, month)
+DIMENSIONS = ("province", "district", "status", "month")
+NO_LOCATION = ("", "")
+BUMP_BATCH = 1000  # แถวต่อ statement (SQLite จำกัดจำนวน parameter)
+
+
+def month_of(d: Optional[date]) -> str:
+    return d.strftime("%Y-%m") if d else ""
+
+
+def key(metric: str, location: Tuple[str, str], status: str = "", month: str = "") -> Key:
+    return (metric, location[0] or "", location[1] or "", status or "", month or "")
+
+
+# ---------------- incremental ----------------
+def _upsert(session: Session):
+    name = session.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"rollup upsert not supported on {name}")
+    return insert(RollupDB)
+
+
+def bump(session: Session, deltas: Mapping[Key, int]) -> None:
+    """บวก/ลบจำนวนของหลายกลุ่มด้วย statement เดียว (เรียกก่อน commit ของ handler)"""
+    rows = [
+        {"metric": k[0], "province": k[1], "district": k[2], "status": k[3], "month": k[4], "count": n}
+        for k, n in sorted(deltas.items()) if n
+    ]
+    for i in range(0, len(rows), BUMP_BATCH):
+        stmt = _upsert(session).values(rows[i:i + BUMP_BATCH])
+        session.exec(stmt.on_conflict_do_update(
+            index_elements=["metric", *DIMENSIONS],
+            set_={"count": RollupDB.count + stmt.excluded.count},
+        ))
+
+
+def location_of(session: Session, *, user_id=None, farm_id=None, request_id=None) -> Tuple[str, str]:
+    """(จังหวัด, อำเภอ) ของเจ้าของ จาก user / ฟาร์ม / คำขอ — query เดียว"""
+    stmt = select(PersonalDB.province, PersonalDB.district)
+    if user_id is not None:
+        stmt = stmt.where(PersonalDB.user_id == int(user_id))
+    else:
+        stmt = stmt.join(FarmDB, FarmDB.user_id == PersonalDB.user_id)
+        if farm_id is not None:
+            stmt = stmt.where(FarmDB.farm_id == farm_id)
+        else:
+            stmt = stmt.join(GAPRequestDB, GAPRequestDB.farm_id == FarmDB.farm_id).where(
+                GAPRequestDB.request_id == request_id)
+    row = session.exec(stmt).first()
+    return tuple(row) if row else NO_LOCATION
+
+
+def move_user(session: Session, user_id, old: Tuple[str, str]) -> None:
+    """ย้ายทุกกลุ่มของ user ไปที่อยู่ใหม่ หลังแก้จังหวัด/อำเภอใน PersonalDB (ยังไม่ commit)"""
+    session.flush()
+    deltas: Counter = Counter()
+    for k, n in counts(session, user_id=user_id).items():
+        deltas[k] += n
+        deltas[key(k[0], old, k[3], k[4])] -= n
+    bump(session, deltas)
+
+
+# ---------------- นับจากตารางจริง ----------------
+def _month_sql(session: Session, col):
+    if session.get_bind().dialect.name == "postgresql":
+        return func.to_char(col, "YYYY-MM")
+    return func.strftime("%Y-%m", col)
+
+
+def _grouped(session: Session, metric: str, stmt, status, month, user_id) -> List[Tuple[Key, int]]:
+    groups = [func.coalesce(PersonalDB.province, ""), func.coalesce(PersonalDB.district, "")]
+    if status is not None:
+        groups.append(func.coalesce(status, ""))
+    if month is not None:
+        groups.append(func.coalesce(_month_sql(session, month), ""))
+    if user_id is not None:
+        stmt = stmt.where(PersonalDB.user_id == int(user_id))
+    stmt = stmt.add_columns(*groups, func.count()).group_by(*groups)
+    out = []
+    for row in session.exec(stmt):
+        province, district, *rest = row[:-1]
+        st = rest.pop(0) if status is not None else ""
+        mo = rest.pop(0) if month is not None else ""
+        out.append(((metric, province, district, st, mo), row[-1]))
+    return out
+
+
+def counts(session: Session, user_id=None) -> Dict[Key, int]:
+    """จำนวนทุกกลุ่มคำนวณใหม่ด้วย GROUP BY (เฉพาะของ user เดียวถ้าระบุ)"""
+    owner = FarmDB.user_id == PersonalDB.user_id
+    sources = (
+        ("farmers", sa_select().select_from(PersonalDB), None, None),
+        ("gap_requests",
+         sa_select().select_from(GAPRequestDB)
+         .outerjoin(FarmDB, FarmDB.farm_id == GAPRequestDB.farm_id).outerjoin(PersonalDB, owner),
+         GAPRequestDB.timeline_status, GAPRequestDB.request_date),
+        ("inspections",
+         sa_select().select_from(InspectionDB)
+         .outerjoin(GAPRequestDB, GAPRequestDB.request_id == InspectionDB.request_id)
+         .outerjoin(FarmDB, FarmDB.farm_id == GAPRequestDB.farm_id).outerjoin(PersonalDB, owner),
+         InspectionDB.status_result, InspectionDB.complete_date),
+        ("certifications",
+         sa_select().select_from(CertificationDB)
+         .outerjoin(FarmDB, FarmDB.farm_id == CertificationDB.farm_id).outerjoin(PersonalDB, owner),
+         None, CertificationDB.issue_date),
+    )
+    out: Dict[Key, int] = {}
+    for metric, stmt, status, month in sources:
+        out.update(_grouped(session, metric, stmt, status, month, user_id))
+    return out
+
+
+def rebuild(engine: Engine, check: bool = False) -> dict:
+    """เทียบ RollupDB กับจำนวนจริง; check=True แค่รายงาน ไม่เขียน"""
+    with Session(engine) as session:
+        want = counts(session)
+        have = {
+            (r.metric, r.province, r.district, r.status, r.month): r.count
+            for r in session.exec(select(RollupDB)).all() if r.count
+        }
+        drift = sum(1 for k in set(want) | set(have) if want.get(k, 0) != have.get(k, 0))
+        if not check and (drift or len(have) != len(want)):
+            session.exec(delete(RollupDB))
+            bump(session, want)
+            session.commit()
+    return {"groups": len(want), "drift": drift, "written": 0 if check else drift}
+
+
+# ---------------- อ่าน ----------------
+def totals(
+    session: Session,
+    metric: str,
+    by: Sequence[str],
+    province: Optional[str] = None,
+    district: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> List[dict]:
+    """SUM(count) ต่อกลุ่มของมิติใน by (ช่วงเดือน since..until รวมปลาย, รูปแบบ YYYY-MM)"""
+    cols = [getattr(RollupDB, d) for d in by]
+    total = func.sum(RollupDB.count)
+    stmt = select(*cols, total).where(RollupDB.metric == metric)
+    if province is not None:
+        stmt = stmt.where(RollupDB.province == province)
+    if district is not None:
+        stmt = stmt.where(RollupDB.district == district)
+    if since is not None:
+        stmt = stmt.where(RollupDB.month >= since)
+    if until is not None:
+        stmt = stmt.where(RollupDB.month <= until)
+    stmt = stmt.group_by(*cols).having(total != 0).order_by(*cols)
+    return [{**dict(zip(by, row[:-1])), "count": row[-1]} for row in session.exec(stmt)]
+
+
+if __name__ == "__main__":
+    from data import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        sys.exit("usage: python rollup.py rebuild [--check]")
+    print(rebuild(engine, check="--check" in sys.argv))
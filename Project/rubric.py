@@ -0,0 +1,227 @@
+"""แคช master data ของแบบประเมิน (หมวด / กิจกรรม / เกณฑ์) ในหน่วยความจำ
+
+โหลดครั้งเดียวแล้วเก็บเป็นโครงสร้าง immutable และจะล้างแคชเองเมื่อมีการเขียน
+AssessmentCategoryDB / ActivityDB / CriteriaDB ผ่าน Session ใดก็ตามใน process นี้
+การเขียนเดียวกันเพิ่ม TableVersionDB["master"] ก่อน commit; get_rubric อ่านแถวนั้น
+(primary key lookup เดียวต่อ Session) แล้วโหลดใหม่ถ้าไม่ตรงกับที่แคชไว้
+→ process อื่น (worker อื่น / python migrate.py / import) แก้ master แล้ว ETag และข้อมูลเปลี่ยนตามทันที
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, update
+from sqlmodel import Session, select
+
+from model import ActivityDB, ActivityLevel, AnswerDB, AssessmentCategoryDB, CriteriaDB, TableVersionDB
+
+
+MASTER_TABLES = (AssessmentCategoryDB, ActivityDB, CriteriaDB)
+MASTER_VERSION = "master"  # ชื่อแถวใน TableVersionDB
+
+
+# ลำดับฟิลด์ตาม AssessmentCategoryOut / ActivityOut (โหมด GAP_FAST_JSON ส่ง _asdict() ออกไปตรง ๆ)
+class CategoryRow(NamedTuple):
+    category_name: str
+    categoryapp_id: int
+
+
+class ActivityRow(NamedTuple):
+    categoryapp_id: int
+    activity_name: str
+    activity_type: ActivityLevel
+    activity_id: int
+
+
+@dataclass(frozen=True)
+class Rubric:
+    categories: Tuple[CategoryRow, ...]
+    activities: Tuple[ActivityRow, ...]
+    category_names: Mapping[int, str]
+    activity_map: Mapping[int, Tuple[int, ActivityLevel]]  # activity_id → (หมวด, Major/Minor)
+    major_ids: Mapping[int, Tuple[int, ...]]  # หมวด → activity_id ที่เป็น Major
+    minor_ids: Mapping[int, Tuple[int, ...]]
+    major_require: Mapping[int, int]  # หมวด → คะแนน Major ขั้นต่ำ
+    minor_require: Optional[int]  # เกณฑ์ Minor รวม (None = ไม่มีเกณฑ์)
+    version: int = 0  # TableVersionDB["master"] ตอนโหลด
+    updated_at: Optional[datetime] = None
+
+    @property
+    def category_ids(self) -> Tuple[int, ...]:
+        # หมวดที่มีกิจกรรมอย่างน้อย 1 ข้อ เรียงตาม id
+        return tuple(sorted(set(self.major_ids) | set(self.minor_ids)))
+
+
+def load_rubric(session: Session, ver: Optional[TableVersionDB]) -> Rubric:
+    # ver = TableVersionDB["master"] ที่ผู้เรียกอ่านไว้ก่อนข้อมูล (None = ยังไม่มีแถว)
+    # ถ้ามีการเขียนแทรกระหว่างนี้ ETag จะเก่ากว่าข้อมูล (client แค่โหลดซ้ำ) ไม่มีทางกลับกันที่ ETag ใหม่คู่กับข้อมูลเก่า
+    cats = session.exec(select(AssessmentCategoryDB).order_by(AssessmentCategoryDB.categoryapp_id)).all()
+    acts = session.exec(select(ActivityDB).order_by(ActivityDB.activity_id)).all()
+    crits = session.exec(select(CriteriaDB).order_by(CriteriaDB.criteria_id)).all()
+
+    major: Dict[int, list] = {}
+    minor: Dict[int, list] = {}
+    for a in acts:
+        major.setdefault(a.categoryapp_id, [])
+        minor.setdefault(a.categoryapp_id, [])
+        (major if a.activity_type == ActivityLevel.Major else minor)[a.categoryapp_id].append(a.activity_id)
+
+    major_req = {c.categoryapp_id: c.score_require for c in crits if c.activity_type == ActivityLevel.Major}
+    minor_req = next((c.score_require for c in crits if c.activity_type == ActivityLevel.Minor), None)
+
+    return Rubric(
+        categories=tuple(CategoryRow(c.category_name, c.categoryapp_id) for c in cats),
+        activities=tuple(ActivityRow(a.categoryapp_id, a.activity_name, a.activity_type, a.activity_id) for a in acts),
+        category_names=MappingProxyType({c.categoryapp_id: c.category_name for c in cats}),
+        activity_map=MappingProxyType({a.activity_id: (a.categoryapp_id, a.activity_type) for a in acts}),
+        major_ids=MappingProxyType({k: tuple(v) for k, v in major.items()}),
+        minor_ids=MappingProxyType({k: tuple(v) for k, v in minor.items()}),
+        major_require=MappingProxyType(major_req),
+        minor_require=minor_req,
+        version=ver.version if ver else 0,
+        updated_at=ver.updated_at if ver else None,
+    )
+
+
+class RubricCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rubric: Optional[Rubric] = None
+        self._generation = 0  # เพิ่มทุกครั้งที่ invalidate กันโหลดค้างเขียนทับ
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.invalidations = 0
+
+    def get(self, session: Session) -> Rubric:
+        rubric = session.info.get("rubric")
+        if rubric is not None:  # ตรวจเวอร์ชันไปแล้วใน transaction นี้
+            self.hits += 1
+            return rubric
+        # ส่งต่อให้ load_rubric: ถ้ายังไม่มีแถว session.get จะ query ซ้ำทุกครั้ง (identity map ไม่จำว่าไม่มี)
+        ver = session.get(TableVersionDB, MASTER_VERSION)
+        version = ver.version if ver else 0
+        rubric = self._rubric
+        if rubric is not None and rubric.version == version:
+            self.hits += 1
+        else:
+            # โหลดนอก lock: ใต้ AsyncSession.run_sync ทุก query คืน event loop ให้ coroutine อื่น
+            # ถ้าถือ threading.Lock ข้าม query ไว้ coroutine ถัดไปที่รอ lock จะบล็อก loop thread เดียว → deadlock
+            # miss พร้อมกันจึงอาจโหลดซ้ำกันได้ แต่เก็บเข้าแคชเฉพาะผลที่ไม่มี invalidate แทรกระหว่างโหลด
+            # และไม่เก่ากว่าของที่อยู่ในแคช
+            gen = self._generation
+            rubric = load_rubric(session, ver)
+            with self._lock:
+                self.misses += 1
+                self.reloads += 1
+                if gen == self._generation and (self._rubric is None or self._rubric.version <= rubric.version):
+                    self._rubric = rubric
+        session.info["rubric"] = rubric
+        return rubric
+
+    def invalidate(self):
+        with self._lock:
+            self._rubric = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._rubric is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "invalidations": self.invalidations,
+        }
+
+
+cache = RubricCache()
+
+
+def get_rubric(session: Session) -> Rubric:
+    return cache.get(session)
+
+
+def master_etag(rubric: Rubric) -> str:
+    return f'"m{rubric.version}"'
+
+
+# คอลัมน์ของ AnswerDB ที่ with_status ใช้ — select เป็น tuple ไม่ต้องสร้าง ORM object
+ANSWER_STATUS_COLUMNS = (
+    AnswerDB.answer_id, AnswerDB.activity_id, AnswerDB.answer_text, AnswerDB.answer_file, AnswerDB.result_each,
+)
+
+
+def with_status(rubric: Rubric, answers) -> list:
+    """กิจกรรมทุกข้อพร้อมสถานะคำตอบของ user (ใช้โดย /activities/with-status)"""
+    ans_map = {a.activity_id: a for a in answers}
+    out = []
+    for a in rubric.activities:
+        rec = ans_map.get(a.activity_id)
+        out.append({
+            "activity_id": a.activity_id,
+            "categoryapp_id": a.categoryapp_id,
+            "activity_type": a.activity_type,
+            "activity_name": a.activity_name,
+            "answered": rec is not None,
+            "scored": (rec is not None and rec.result_each is not None),
+            "result_each": (rec.result_each if rec else None),
+            "answer_id": (rec.answer_id if rec else None),
+            "answer_text": (rec.answer_text if rec else None),
+            "answer_file": (rec.answer_file if rec else None),
+        })
+    return out
+
+
+# ---------------- invalidation ----------------
+# ล้างตอน flush (กันการอ่านซ้ำใน transaction เดียวกัน) และอีกครั้งหลัง commit
+# (กัน session อื่นโหลดข้อมูลเก่าเข้าแคชระหว่าง flush กับ commit)
+@event.listens_for(Session, "after_flush")
+def _mark_master_write(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, MASTER_TABLES):
+            session.info["rubric_dirty"] = True
+            session.info.pop("rubric", None)
+            cache.invalidate()
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_master_write(state):
+    # session.execute(update(ActivityDB)...) ไม่ผ่าน unit-of-work จึงต้องดักแยก
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and mapper.class_ in MASTER_TABLES:
+        state.session.info["rubric_dirty"] = True
+        state.session.info.pop("rubric", None)
+        cache.invalidate()
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_master_version(session):
+    session.flush()  # ให้ after_flush ตรวจของที่ยังค้างอยู่ก่อน
+    if not session.info.get("rubric_dirty"):
+        return
+    now = datetime.now(timezone.utc)
+    res = session.execute(
+        update(TableVersionDB).where(TableVersionDB.name == MASTER_VERSION)
+        .values(version=TableVersionDB.version + 1, updated_at=now)
+    )
+    if not res.rowcount:
+        session.add(TableVersionDB(name=MASTER_VERSION, version=1, updated_at=now))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    session.info.pop("rubric", None)  # transaction ถัดไปตรวจเวอร์ชันใหม่
+    if session.info.pop("rubric_dirty", False):
+        cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_mark(session):
+    session.info.pop("rubric", None)
+    session.info.pop("rubric_dirty", None)
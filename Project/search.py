@@ -0,0 +1,139 @@
+"""ค้นหาข้อความเต็ม (full-text) บนชื่อกิจกรรมและคำตอบแบบข้อความ
+
+SQLite: ตาราง FTS5 แบบ external content + tokenizer ``trigram`` (ตัดเป็นชุด 3 ตัวอักษร
+จึงใช้กับภาษาไทยที่ไม่มีเว้นวรรคได้) ซิงก์กับตารางจริงด้วย trigger และเรียงผลด้วย bm25
+Postgres: GIN index แบบ pg_trgm แล้วเรียงด้วย similarity()
+
+คำค้นที่สั้นกว่า 3 ตัวอักษร trigram จับไม่ได้ → ใช้ LIKE แทน
+"""
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Engine, column, func, literal_column, table, text
+from sqlmodel import Session, select
+
+from model import ActivityDB, AnswerDB
+
+
+MIN_TERM = 3
+
+# (ชื่อตาราง FTS, ตารางจริง, คอลัมน์ primary key, คอลัมน์ข้อความ)
+FTS_TABLES = (
+    ("activity_fts", "activitydb", "activity_id", "activity_name"),
+    ("answer_fts", "answerdb", "answer_id", "answer_text"),
+)
+
+
+def fts5_trigram_available() -> bool:
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def _sqlite_ddl(fts: str, src: str, pk: str, col: str) -> List[str]:
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{col}, content='{src}', content_rowid='{pk}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {src} BEGIN "
+        f"INSERT INTO {fts}(rowid, {col}) VALUES (new.{pk}, new.{col}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {src} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.{pk}, old.{col}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col} ON {src} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.{pk}, old.{col}); "
+        f"INSERT INTO {fts}(rowid, {col}) VALUES (new.{pk}, new.{col}); END",
+    ]
+
+
+def drop_fts(conn):
+    """ลบ trigger/ตาราง FTS (ใช้ตอน migrate ที่ต้องสร้างตารางจริงใหม่)"""
+    if conn.dialect.name != "sqlite":
+        return
+    for fts, _src, _pk, _col in FTS_TABLES:
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+
+def ensure_fts(engine: Engine) -> List[str]:
+    """สร้าง index ค้นหาที่ยังไม่มี คืนชื่อที่สร้าง/rebuild ใหม่"""
+    created = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            if not fts5_trigram_available():
+                return created
+            have = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'")).scalars())
+            for fts, src, pk, col in FTS_TABLES:
+                for stmt in _sqlite_ddl(fts, src, pk, col):
+                    conn.execute(text(stmt))
+                if fts not in have:
+                    # ตารางเพิ่งสร้าง → ดึงข้อมูลเดิมเข้า index
+                    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                    created.append(fts)
+        elif conn.dialect.name == "postgresql":
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for fts, src, _pk, col in FTS_TABLES:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{fts}_trgm ON {src} USING gin ({col} gin_trgm_ops)"))
+    return created
+
+
+def _terms(keyword: str) -> Tuple[List[str], List[str]]:
+    """แยกคำค้น → (คำที่ใช้ FTS ได้, คำสั้นที่ต้องใช้ LIKE)"""
+    words = keyword.split()
+    return [w for w in words if len(w) >= MIN_TERM], [w for w in words if len(w) < MIN_TERM]
+
+
+def _match_expr(words: Sequence[str]) -> str:
+    # ทุกคำเป็น phrase ("...") ต่อกันด้วย AND; กัน syntax ของ FTS5 ในคำค้น
+    return " AND ".join('"' + w.replace('"', '""') + '"' for w in words)
+
+
+def _use_fts(session: Session) -> bool:
+    return session.get_bind().dialect.name == "sqlite" and fts5_trigram_available()
+
+
+def search_ids(session: Session, fts: str, src_col, keyword: str, limit: Optional[int] = None,
+               where=()) -> List[int]:
+    """คืน primary key ที่ตรงกับคำค้น เรียงจากเกี่ยวข้องมาก → น้อย"""
+    long_terms, short_terms = _terms(keyword)
+    if not long_terms and not short_terms:
+        return []
+    pk = src_col.table.primary_key.columns.values()[0]
+    if _use_fts(session) and long_terms:
+        f = table(fts, column("rowid"), column("rank"))
+        stmt = (
+            select(pk)
+            .select_from(f.join(src_col.table, pk == f.c.rowid))
+            .where(literal_column(fts).op("MATCH")(_match_expr(long_terms)))
+            .order_by(f.c.rank)
+        )
+        for w in short_terms:
+            stmt = stmt.where(src_col.contains(w))
+    else:
+        stmt = select(pk)
+        for w in long_terms + short_terms:
+            stmt = stmt.where(src_col.contains(w))
+        if session.get_bind().dialect.name == "postgresql":
+            stmt = stmt.order_by(func.similarity(src_col, keyword).desc(), pk)
+        else:
+            stmt = stmt.order_by(pk)
+    for cond in where:
+        stmt = stmt.where(cond)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return list(session.exec(stmt).all())
+
+
+def search_activity_ids(session: Session, keyword: str) -> List[int]:
+    return search_ids(session, "activity_fts", ActivityDB.activity_name, keyword)
+
+
+def search_answers(session: Session, keyword: str, limit: int, user_id: Optional[int] = None,
+                   activity_ids: Optional[List[int]] = None) -> List[AnswerDB]:
+    where = []
+    if user_id is not None:
+        where.append(AnswerDB.user_id == user_id)
+    if activity_ids:
+        where.append(AnswerDB.activity_id.in_(activity_ids))
+    ids = search_ids(session, "answer_fts", AnswerDB.answer_text, keyword, limit=limit, where=where)
+    if not ids:
+        return []
+    rows = {r.answer_id: r for r in session.exec(select(AnswerDB).where(AnswerDB.answer_id.in_(ids))).all()}
+    return [rows[i] for i in ids if i in rows]
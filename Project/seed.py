@@ -0,0 +1,94 @@
+"""master data ของแบบประเมิน GAP ทุเรียน (หมวด / กิจกรรม / เกณฑ์)
+
+ใช้ทั้ง POST /seed/master และ bench.synth — import ได้โดยไม่ต้องสร้าง app
+"""
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from model import ActivityDB, ActivityLevel, AssessmentCategoryDB, CriteriaDB
+
+
+CATEGORIES = [
+    "การจัดการน้ำ", "การจัดการที่ดิน", "การใช้ปุ๋ยและยา",
+    "ยานพาหนะและอุปกรณ์", "การเก็บเกี่ยว", "การพักผลผลิต",
+    "สถานที่ต่างๆ", "ผู้ปฏิบัติงาน"
+]
+
+ACTIVITIES = [  # (หมวด, ข้อกิจกรรม, Major/Minor) เรียงตาม activity_id
+    # 1–7 (cat1)
+    (1,"แหล่งน้ำที่ใช้ในการปลูกมาจากไหน?", "Major"),
+    (1,"อัปโหลดรูปภาพ แหล่งน้ํา การเพาะปลูก", "Major"),
+    (1,"แหล่งน้ําที่ใช้ในการปลูกทุเรียนผ่านการบําบัดมาก่อนหรือไม่?", "Major"),
+    (1,"อัปโหลดรูปภาพการบำบัดน้ำ", "Major"),
+    (1,"แหล่งน้ำที่ใช้หลังจากเก็บเกี่ยวผลผลิตมาจากไหน?", "Major"),
+    (1,"มีเก็บตัวอย่างน้ำวิเคราะห์การปนเปื้อนในระยะเริ่มการผลิตหรือไม่?", "Minor"),
+    (1,"วิธีที่ใช้บำบัดน้ำเสียคืออะไร?", "Minor"),
+    # 8–15 (cat2)
+    (2,"พื้นที่เพาะปลูกของคุณไม่เสี่ยงต่อการปนเปื้อนวัตถุหรือสิ่งอันตรายใช่หรือไม่?", "Major"),
+    (2,"ถ้าพื้นที่ของคุณมีความเสี่ยง คุณมีการบำบัดให้อยู่ในระดับปลอดภัยหรือไม่?", "Major"),
+    (2,"พื้นที่ปลูกเป็นไปตามข้อกำหนดของกฎหมายที่เกี่ยวข้องหรือไม่?", "Major"),
+    (2,"มีการบันทึกการใช้สารเคมีกับพื้นที่ปลูก ครบถ้วนหรือไม่?", "Major"),
+    (2,"มีการเก็บตัวอย่างดินเพื่อตรวจวิเคราะห์การปนเปื้อนในระยะเริ่มต้น และมีใบแจ้งผลวิเคราะห์ยืนยันหรือไม่?", "Minor"),
+    (2,"พื้นที่ปลูกใหม่ไม่ส่งผลกระทบต่อสิ่งแวดล้อม หรือมีมาตรการป้องกันผลกระทบไว้แล้วใช่หรือไม่?", "Minor"),
+    (2,"แนบรูปผังแปลง พร้อมคำอธิบายว่าคำนึงถึงสิ่งแวดล้อมอย่างไร", "Minor"),
+    (2,"มีการจัดทำรหัสแปลงปลูกและข้อมูลประจำแปลง ครบถ้วน", "Minor"),
+    # 16–21 (cat3)
+    (3,"คุณใช้สิ่งขับถ่ายของคนเป็นปุ๋ยหรือไม่?", "Major"),
+    (3,"ใช้สารเคมีตามคำแนะนำ และหยุดใช้ก่อนเก็บเกี่ยวตามฉลากหรือไม่?", "Major"),
+    (3,"หากเคยตรวจพบสารพิษตกค้างเกินค่ามาตรฐาน มีการป้องกันซ้ำหรือไม่?", "Major"),
+    (3,"ใช้วัตถุอันตรายที่ห้ามตามกฎหมายหรือไม่?", "Major"),
+    (3,"ส่งออกปฏิบัติตามข้อกำหนดประเทศคู่ค้าหรือไม่?", "Major"),
+    (3,"เลือกใช้ปุ๋ย/ปรับปรุงดินที่ขึ้นทะเบียนหรือไม่?", "Minor"),
+    # 22–26 (cat4)
+    (4,"วัสดุสัมผัสผลผลิตไม่ก่อปนเปื้อนหรือไม่?", "Major"),
+    (4,"ล้างอุปกรณ์ทุกครั้งและจัดการน้ำล้างถูกต้องหรือไม่?", "Major"),
+    (4,"ภาชนะของเสีย/สารเคมี/ปุ๋ย แยกจากภาชนะเก็บเกี่ยวหรือไม่?", "Minor"),
+    (4,"ตรวจสอบเครื่องมือที่ต้องการความแม่นยำอย่างน้อยปีละครั้งหรือไม่?", "Minor"),
+    (4,"สถานที่ปฏิบัติงานมีสุขลักษณะเพียงพอหรือไม่?", "Minor"),
+    # 27–30 (cat5)
+    (5,"เก็บเกี่ยวเมื่ออายุเหมาะสม/ตามข้อกำหนด", "Major"),
+    (5,"คัดแยกผลผลิตไม่ได้คุณภาพออกก่อนส่ง", "Minor"),
+    (5,"มีวิธีป้องกันการเสื่อมคุณภาพก่อนขนส่ง", "Minor"),
+    (5,"มีการดูแลก่อนขนส่ง", "Minor"),
+    # 31 (cat6)
+    (6,"ผลผลิตที่คัดเลือก/บรรจุ/พัก ไม่สัมผัสพื้นดินโดยตรง", "Minor"),
+    # 32–38 (cat7)
+    (7,"มีที่เก็บสารเคมีเฉพาะ แยกชนิด ป้องกันปนเปื้อน", "Major"),
+    (7,"สารเคมีเหลือใช้ปิดฝาสนิท/ติดข้อมูลครบ", "Minor"),
+    (7,"กำจัดภาชนะสารเคมีหมดแล้วอย่างถูกต้อง", "Minor"),
+    (7,"ภาชนะหมดอายุ/เสื่อมสภาพถูกแยกเก็บ/ทำลายถูกต้อง", "Minor"),
+    (7,"ที่เก็บภาชนะ/อุปกรณ์ แยกจากสารเคมี/ปุ๋ย และกันสัตว์พาหะ", "Minor"),
+    (7,"มีมาตรการกันสัตว์เลี้ยงในพื้นที่ปฏิบัติงาน", "Minor"),
+    (7,"พื้นที่จัดการปุ๋ย/ปรับปรุงดิน/หมักอินทรีย์ เป็นสัดส่วน", "Minor"),
+    (7,"สถานที่พัก/ขนย้าย/เก็บรักษา มีสุขลักษณะ", "Minor"),
+    # 39–46 (cat8)
+    (8,"จัดการสุขลักษณะป้องกันปนเปื้อน", "Major"),
+    (8,"ผู้สัมผัสผลผลิตดูแลสุขลักษณะ", "Major"),
+    (8,"มีความรู้สารเคมีและวิธีใช้", "Major"),
+    (8,"ตรวจสุขภาพประจำปี", "Minor"),
+    (8,"รู้สุขลักษณะส่วนบุคคล", "Minor"),
+    (8,"รู้การปฐมพยาบาลเบื้องต้น", "Minor"),
+    (8,"สวมอุปกรณ์ป้องกันครบ", "Minor"),
+    (8,"อาบน้ำเปลี่ยนเสื้อผ้าหลังฉีดพ่น", "Minor"),
+]
+
+MAJOR_REQUIRE = {1:5, 2:4, 3:5, 4:2, 5:1, 6:0, 7:1, 8:3}  # หมวด → คะแนน Major ขั้นต่ำ
+MINOR_REQUIRE = 16  # Minor ที่ผ่านรวมทุกหมวด
+
+
+def seed_master(session: Session) -> bool:
+    """เติม master data ถ้ายังว่าง แล้ว commit ครั้งเดียว คืน False ถ้ามีอยู่แล้ว"""
+    if session.exec(select(AssessmentCategoryDB)).first():
+        return False
+    # insert แบบ executemany ทีละตาราง (ORM บน SQLite จะยิง INSERT ... RETURNING ทีละแถว)
+    session.exec(insert(AssessmentCategoryDB), params=[{"category_name": name} for name in CATEGORIES])
+    session.exec(insert(ActivityDB), params=[
+        {"categoryapp_id": cid, "activity_name": name, "activity_type": ActivityLevel(typ)} for cid, name, typ in ACTIVITIES
+    ])
+    session.exec(insert(CriteriaDB), params=[
+        *({"categoryapp_id": cid, "activity_type": ActivityLevel.Major, "score_require": req}
+          for cid, req in MAJOR_REQUIRE.items()),
+        {"categoryapp_id": None, "activity_type": ActivityLevel.Minor, "score_require": MINOR_REQUIRE},
+    ])
+    session.commit()  # commit เดียว: seed ครบทั้งชุดหรือไม่มีเลย, เวอร์ชัน master เพิ่มครั้งเดียว
+    return True
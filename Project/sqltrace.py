@@ -0,0 +1,81 @@
+"""นับจำนวน/เวลาของ SQL และจำนวน commit แยกตามงาน (request, benchmark step)
+
+    with sqltrace.track() as q:
+        ...
+    q.count, q.seconds, q.commits
+
+    with sqltrace.track(record=True) as q:   # เก็บข้อความ SQL ไว้ใน q.statements ด้วย
+
+ใช้ ContextVar จึงแยกกันได้ระหว่าง request ที่ทำงานพร้อมกัน
+(threadpool ของ Starlette/anyio คัดลอก context ไปยัง worker thread ด้วย)
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "commits", "statements")
+
+    def __init__(self, record: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.commits = 0
+        self.statements: Optional[List[str]] = [] if record else None
+
+
+_active: ContextVar[Optional[List[QueryStats]]] = ContextVar("sqltrace_active", default=None)
+
+
+@contextmanager
+def track(record: bool = False):
+    """ซ้อนกันได้ — query ถูกนับให้ทุกชั้นที่เปิดอยู่"""
+    stats = QueryStats(record)
+    token = _active.set((_active.get() or []) + [stats])
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("sqltrace_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    active = _active.get()
+    if active is None:
+        return
+    stack = conn.info.get("sqltrace_t0")
+    elapsed = time.perf_counter() - stack.pop() if stack else 0.0
+    for stats in active:
+        stats.count += 1
+        stats.seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append(statement)
+
+
+def _error(ctx):
+    # statement ที่ล้มไม่ผ่าน after_cursor_execute → เอาเวลาเริ่มออกจาก stack ที่นี่
+    # ไม่งั้นค่าที่ค้างอยู่จะถูกใช้เป็นเวลาเริ่มของ statement อื่นบน connection เดียวกัน
+    conn = ctx.connection
+    if conn is not None and conn.info.get("sqltrace_t0"):
+        _after(conn, None, ctx.statement, ctx.parameters, ctx.execution_context, False)
+
+
+def _commit(conn):
+    for stats in _active.get() or ():
+        stats.commits += 1
+
+
+def install(sync_engine) -> None:
+    if event.contains(sync_engine, "before_cursor_execute", _before):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before)
+    event.listen(sync_engine, "after_cursor_execute", _after)
+    event.listen(sync_engine, "handle_error", _error)
+    event.listen(sync_engine, "commit", _commit)
@@ -0,0 +1,54 @@
+"""เทสต์รันกับ DB ชั่วคราว (ไม่แตะ database_project.db)
+
+    cd Project && python -m pytest -q tests
+    GAP_TEST_DB_URL=postgresql://... python -m pytest -q tests   # รันกับ Postgres (DB ว่างสำหรับเทสต์)
+
+engine ของแอปถูกสร้างตอน import data → ตั้ง GAP_DB_URL ที่นี่ก่อนเทสต์ใด ๆ import โมดูลของแอป
+"""
+import itertools
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench.common import PERSON, temp_db_url  # noqa: E402
+
+os.environ["GAP_DB_URL"] = os.environ.get("GAP_TEST_DB_URL") or temp_db_url("gap_tests_")
+os.environ["GAP_EXPIRY_SCAN_INTERVAL"] = "0"
+
+from querybudget import query_budget  # noqa: E402,F401  (fixture)
+
+
+_id_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """engine ของแอป: schema ล่าสุด + master data ชุดเดียวกับ POST /seed/master"""
+    from sqlmodel import Session
+    from data import engine, init_db
+    import seed
+
+    init_db()
+    with Session(engine) as session:
+        seed.seed_master(session)
+    return engine
+
+
+@pytest.fixture
+def make_user(engine):
+    """สร้างเกษตรกรใหม่ คืน user_id"""
+    from sqlmodel import Session
+    from model import PersonalDB
+
+    def make(**fields) -> int:
+        row = PersonalDB(**{**PERSON, "birth": date(1980, 1, 1), "id_number": f"{next(_id_numbers):013d}", **fields})
+        with Session(engine) as session:
+            session.add(row)
+            session.commit()
+            return row.user_id
+    return make
@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+
+
+def _bulk(client, uid, *items):
+    return client.post("/answers/bulk", json={"user_id": uid, "items": list(items)})
+
+
+def test_bad_items_reported_valid_items_saved(engine, make_user):
+    import main
+
+    client = TestClient(main.app)
+    uid = make_user()
+    r = _bulk(client, uid,
+              {"activity_id": 1, "answer_text": "มี"},
+              {"activity_id": 999999, "answer_text": "มี"},
+              {"activity_id": 2},
+              {"activity_id": 3, "answer_text": "มี", "result_each": 2},
+              {"activity_id": 4, "answer_text": "ครั้งแรก"},
+              {"activity_id": 4, "answer_text": "ครั้งหลัง", "result_each": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["created"], body["updated"], body["errors"]) == (2, 0, 4)
+    assert [(it["activity_id"], it["status"], it["detail"]) for it in body["items"]] == [
+        (1, "created", None),
+        (999999, "error", "Activity not found"),
+        (2, "error", "Require answer_text or answer_file"),
+        (3, "error", "result_each must be 0 or 1"),
+        (4, "error", "duplicate activity_id (later item wins)"),
+        (4, "created", None),
+    ]
+
+    rows = {a["activity_id"]: a for a in client.get(f"/activities/with-status?user_id={uid}").json()}
+    assert rows[4]["answer_text"] == "ครั้งหลัง" and rows[4]["result_each"] == 1
+    assert rows[2]["answer_text"] is None and rows[3]["answer_text"] is None
+
+    again = _bulk(client, uid, {"activity_id": 1, "answer_text": "แก้"}).json()
+    assert (again["created"], again["updated"]) == (0, 1)
+    assert again["items"][0]["answer_id"] == body["items"][0]["answer_id"]
+
+
+def test_unknown_user_is_404(engine):
+    import main
+
+    assert _bulk(TestClient(main.app), 987654321, {"activity_id": 1, "answer_text": "มี"}).status_code == 404
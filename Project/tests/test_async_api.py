@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import httpx
+from fastapi import FastAPI
+
+import async_api
+import seed
+from rubric import cache as rubric_cache
+
+
+def _run_with_timeout(coro_fn, timeout=20):
+    # ถ้า event loop ค้าง (deadlock) wait_for ใน loop เดียวกันก็ไม่ทำงาน → รันใน thread แล้วรอจากข้างนอก
+    out = {}
+
+    def run():
+        out["result"] = asyncio.run(coro_fn())
+
+    th = threading.Thread(target=run, daemon=True)
+    th.start()
+    th.join(timeout)
+    assert not th.is_alive(), "event loop hung"
+    return out["result"]
+
+
+def test_cold_rubric_cache_concurrent_requests(engine):
+    """cache ว่าง + หลาย request พร้อมกัน: ทุกตัวโหลด rubric ผ่าน run_sync โดยไม่ค้าง"""
+    app = FastAPI()
+    app.include_router(async_api.router)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            rubric_cache.invalidate()
+            first = await asyncio.gather(*(client.get("/activities") for _ in range(8)))
+            rubric_cache.invalidate()
+            second = await asyncio.gather(*(client.get("/categories") for _ in range(8)))
+            return first + second
+
+    responses = _run_with_timeout(burst)
+    assert [r.status_code for r in responses] == [200] * 16
+    assert len(responses[0].json()) == len(seed.ACTIVITIES)
+
+
+def test_install_keeps_one_handler_per_route(engine):
+    """GAP_DB_ASYNC=1: route sync ที่มีตัว async ถูกแทนที่ ไม่ลงทะเบียนซ้ำ → openapi ไม่เตือน operation id ซ้ำ"""
+    import warnings
+    from fastapi.routing import APIRoute
+    import main
+
+    if main.ASYNC_DB:  # main ติดตั้งไปแล้วตอน import → ตรวจ app จริง
+        app = main.app
+    else:
+        app = FastAPI()
+        app.router.routes.extend(r for r in main.app.router.routes
+                                 if isinstance(r, APIRoute) and r.endpoint.__module__ == "main")
+        before = [(r.path, tuple(sorted(r.methods))) for r in app.router.routes if isinstance(r, APIRoute)]
+        async_api.install(app)
+        after = [(r.path, tuple(sorted(r.methods))) for r in app.router.routes if isinstance(r, APIRoute)]
+        assert after == before  # ลำดับเดิม ไม่มีซ้ำ
+    routes = [r for r in app.router.routes if isinstance(r, APIRoute)]
+    assert len({(r.path, m) for r in routes for m in r.methods}) == sum(len(r.methods) for r in routes)
+    replaced = {r.path for r in routes if r.endpoint.__module__ == "async_api"}
+    assert replaced == {r.path for r in async_api.router.routes}
+    # POST /personals (เขียน) ยังเป็น sync
+    assert next(r for r in routes if r.path == "/personals" and "POST" in r.methods).endpoint.__module__ == "main"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        app.openapi()
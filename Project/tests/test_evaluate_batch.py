@@ -0,0 +1,66 @@
+import json
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from bench.common import temp_db_url
+import evaluation
+from evaluation import evaluate_many, evaluate_user, iter_user_ids
+
+
+SYNTH_FARMERS = 400
+
+
+@pytest.fixture(scope="module")
+def synth_engine(engine):
+    """DB แยกที่เติมด้วย bench.synth (มีทั้งคนยังไม่เริ่ม / ตอบบางส่วน / รอให้คะแนน / ให้คะแนนแล้ว)"""
+    import migrate
+    from bench import synth
+    from data import EngineProfile, make_engine
+
+    eng = make_engine(EngineProfile.from_env({"GAP_DB_URL": temp_db_url("gap_synth_")}))
+    migrate.upgrade(eng)
+    synth.generate(eng, SYNTH_FARMERS, seed=7, batch=100, progress=None)
+    yield eng
+    eng.dispose()
+
+
+def test_batch_matches_single_on_synth_data(synth_engine):
+    with Session(synth_engine) as session:
+        ids = list(iter_user_ids(session))
+        assert len(ids) == SYNTH_FARMERS
+        batch = list(evaluate_many(session, ids, chunk=64))
+        single = [evaluate_user(session, uid) for uid in ids]
+    assert batch == single
+    # ชุดข้อมูลครอบคลุม: ยังไม่ได้คะแนน (ยังไม่ตอบ / ตอบแล้วรอให้คะแนน), ครบแล้วผ่าน / ไม่ผ่าน
+    statuses = Counter((r["status"], r.get("eligible_for_request")) for r in single)
+    assert statuses[("incomplete", None)] and statuses[("complete", True)] and statuses[("complete", False)]
+
+
+def _stream(client, body):
+    r = client.post("/assessment/evaluate/batch", json=body)
+    assert r.status_code == 200, r.text
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_stream_chunks_match_single(engine, make_user, monkeypatch):
+    import main
+
+    users = [make_user(province="แบทช์ทดสอบ") for _ in range(5)]
+    make_user(province="จังหวัดอื่น")
+    monkeypatch.setattr(main, "BATCH_CHUNK", 2)
+    monkeypatch.setattr(main, "user_id_page", lambda s, p, after: evaluation.user_id_page(s, p, after, 2))
+    client = TestClient(main.app)
+    with Session(engine) as session:
+        expected = [json.loads(json.dumps(evaluate_user(session, uid))) for uid in users]
+    assert _stream(client, {"province": "แบทช์ทดสอบ"}) == expected
+    assert _stream(client, {"user_ids": users[::-1]}) == expected[::-1]
+
+
+def test_user_ids_and_province_rejected(engine):
+    import main
+
+    r = TestClient(main.app).post("/assessment/evaluate/batch", json={"user_ids": [1], "province": "จันทบุรี"})
+    assert r.status_code == 422
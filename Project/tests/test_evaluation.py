@@ -0,0 +1,80 @@
+from sqlalchemy import update
+from sqlmodel import Session
+
+import evaluation
+import seed
+from evaluation import apply_changes, evaluate_scores, evaluate_user, get_summary, scored_maps
+from model import ActivityLevel, AnswerDB, CriteriaDB
+from rubric import get_rubric
+
+
+def _answer_all(engine, user_id, result=1):
+    with Session(engine) as session:
+        ids = list(get_rubric(session).activity_map)
+        for aid in ids:
+            session.add(AnswerDB(user_id=user_id, activity_id=aid, answer_text="มี", result_each=result))
+        apply_changes(session, user_id, [(aid, None, result) for aid in ids])
+        session.commit()
+
+
+def _set_minor_require(engine, n):
+    with Session(engine) as session:
+        session.execute(update(CriteriaDB).where(CriteriaDB.activity_type == ActivityLevel.Minor)
+                        .values(score_require=n))
+        session.commit()
+
+
+def test_summary_recomputed_after_criteria_change(engine, make_user):
+    uid = make_user()
+    _answer_all(engine, uid)
+    with Session(engine) as session:
+        assert evaluate_user(session, uid)["eligible_for_request"]
+
+    _set_minor_require(engine, 999)
+    try:
+        with Session(engine) as session:
+            rubric = get_rubric(session)
+            assert not evaluation.is_current(rubric, get_summary(session, uid))
+            res = evaluate_user(session, uid)
+            assert res["minor_require"] == 999 and not res["eligible_for_request"]
+            assert res == evaluate_scores(rubric, uid, scored_maps(session, [uid])[uid])
+
+            # การเขียนครั้งถัดไปของ user คำนวณ summary ใหม่ทั้งแถวตาม rubric ปัจจุบัน
+            apply_changes(session, uid, [])
+            session.commit()
+            summary = get_summary(session, uid)
+            assert summary.rubric_version == rubric.version
+            assert not summary.eligible
+            assert evaluate_user(session, uid) == res
+    finally:
+        _set_minor_require(engine, seed.MINOR_REQUIRE)
+
+
+def test_concurrent_first_write_reuses_summary(engine, make_user, monkeypatch):
+    """อีก request สร้าง summary ของ user เดียวกันระหว่างที่ request นี้ยังเห็นว่าไม่มี → ไม่ IntegrityError"""
+    uid = make_user()
+    with Session(engine) as session:
+        aid = min(get_rubric(session).activity_map)
+
+    lock_summaries = evaluation._lock_summaries
+    raced = []
+
+    def racing(session, user_ids):
+        found = lock_summaries(session, user_ids)
+        if not raced:
+            raced.append(True)
+            with Session(engine) as other:
+                other.add(AnswerDB(user_id=uid, activity_id=aid, answer_text="มี", result_each=1))
+                apply_changes(other, uid, [(aid, None, 1)])
+                other.commit()
+        return found
+
+    monkeypatch.setattr(evaluation, "_lock_summaries", racing)
+    with Session(engine) as session:
+        apply_changes(session, uid, [])
+        session.commit()
+
+    with Session(engine) as session:
+        summary = get_summary(session, uid)
+        assert summary.answer_version == 2
+        assert summary.scored_ids == [aid]
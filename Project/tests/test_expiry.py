@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+import expiry
+import migrate
+from bench.common import temp_db_url
+from model import CertificationDB, NotificationOutboxDB
+
+
+TODAY = date(2026, 1, 1)
+
+
+@pytest.fixture
+def eng(engine):
+    """DB แยก: นับแถวใน outbox ได้ตรง ๆ ไม่ปนกับเทสต์อื่น"""
+    from data import EngineProfile, make_engine
+
+    eng = make_engine(EngineProfile.from_env({"GAP_DB_URL": temp_db_url("gap_expiry_")}))
+    migrate.ensure_schema(eng)
+    yield eng
+    eng.dispose()
+
+
+def _certs(eng, *days_left) -> list:
+    with Session(eng) as session:
+        rows = [CertificationDB(request_id=1, farm_id=1, issue_date=TODAY - timedelta(days=700),
+                                expire_date=TODAY + timedelta(days=d), cert_file="cert.pdf") for d in days_left]
+        session.add_all(rows)
+        session.commit()
+        return [r.cert_id for r in rows]
+
+
+def _outbox(eng) -> set:
+    with Session(eng) as session:
+        return set(session.exec(select(NotificationOutboxDB.cert_id, NotificationOutboxDB.window_days)).all())
+
+
+def test_bands_do_not_overlap():
+    out = expiry.bands(TODAY, [30, 7, 90, 30])
+    assert [w for w, _, _ in out] == [7, 30, 90]
+    assert out[0][1] == TODAY and out[-1][2] == TODAY + timedelta(days=90)
+    for (_, _, hi), (_, lo, _) in zip(out, out[1:]):
+        assert lo == hi + timedelta(days=1)
+
+
+def test_each_cert_gets_the_narrowest_window_once(eng):
+    # ขอบแถบ: เหลือ 7 วัน → เตือน 7, เหลือ 8 วัน → เตือน 30; เลย 90 วันหรือหมดไปแล้วไม่เตือน
+    in7, edge7, in30, edge30, in90, later, expired = _certs(eng, 0, 7, 8, 30, 31, 91, -1)
+    out = expiry.scan(eng, TODAY, chunk=2)
+    assert {w: s["queued"] for w, s in out["windows"].items()} == {7: 2, 30: 2, 90: 1}
+    assert _outbox(eng) == {(in7, 7), (edge7, 7), (in30, 30), (edge30, 30), (in90, 90)}
+
+    again = expiry.scan(eng, TODAY, chunk=2)
+    assert sum(s["queued"] for s in again["windows"].values()) == 0
+    assert len(_outbox(eng)) == 5
+
+
+def test_chunks_continue_across_equal_expire_dates(eng):
+    # 5 ใบหมดวันเดียวกัน chunk ละ 2: keyset ต้องต่อด้วย cert_id ไม่ข้ามหรือซ้ำแถวที่ expire_date เท่ากัน
+    ids = _certs(eng, *[20] * 5)
+    stats = expiry.scan(eng, TODAY, chunk=2)["windows"][30]
+    assert stats == {"matched": 5, "queued": 5, "chunks": 3}
+    assert _outbox(eng) == {(c, 30) for c in ids}
+
+
+def test_scan_stops_between_chunks(eng):
+    _certs(eng, *[20] * 5)
+    stop = threading.Event()
+    stop.set()
+    assert expiry.scan(eng, TODAY, chunk=2, stop=stop)["windows"][7]["chunks"] == 0
+    assert _outbox(eng) == set()
+
+
+def test_runner_stop_does_not_wait_for_interval(eng):
+    runner = expiry.Runner(eng, interval=3600).start()
+    t0 = time.perf_counter()
+    runner.stop(timeout=10)
+    assert not runner._thread.is_alive()
+    assert time.perf_counter() - t0 < 5
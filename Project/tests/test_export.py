@@ -0,0 +1,104 @@
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import export
+import migrate
+from bench.common import temp_db_url
+from model import CertificationDB, FarmDB, GAPRequestDB, GapStatus
+
+
+PROVINCE = "ส่งออกทดสอบ"
+
+
+@pytest.fixture
+def client(engine):
+    import main
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def farm(engine, make_user):
+    """คืนฟังก์ชันสร้างฟาร์มของเกษตรกรใน PROVINCE พร้อมคำขอ/เกียรติบัตร"""
+    def make(requests=(), certs=()) -> int:
+        uid = make_user(province=PROVINCE)
+        with Session(engine) as session:
+            row = FarmDB(user_id=uid)
+            session.add(row)
+            session.flush()
+            for day, status in requests:
+                session.add(GAPRequestDB(farm_id=row.farm_id, request_date=day, timeline_status=status.value))
+            for issued, expires in certs:  # ตามลำดับ → cert_id เพิ่มขึ้นตามลำดับที่ให้มา
+                session.add(CertificationDB(request_id=0, farm_id=row.farm_id, issue_date=issued,
+                                            expire_date=expires, cert_file="c.pdf"))
+                session.flush()
+            session.commit()
+            return row.farm_id
+    return make
+
+
+def _rows(client, entity, **params) -> list:
+    r = client.get(f"/export/{entity}", params={"format": "ndjson", "province": PROVINCE, **params})
+    assert r.status_code == 200, r.text
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_gap_requests_filters(client, farm):
+    inside = farm(requests=[(date(2025, 3, 1), GapStatus.Pending), (date(2025, 3, 31), GapStatus.Certified),
+                            (date(2025, 4, 1), GapStatus.Pending)])
+    rows = _rows(client, "gap-requests", since="2025-03-01", until="2025-03-31")
+    assert [(r["farm_id"], r["request_date"]) for r in rows] == [(inside, "2025-03-01"), (inside, "2025-03-31")]
+    assert {r["province"] for r in rows} == {PROVINCE}
+
+    pending = _rows(client, "gap-requests", status=GapStatus.Pending.value, since="2025-03-01")
+    assert [r["request_date"] for r in pending] == ["2025-03-01", "2025-04-01"]
+    assert _rows(client, "gap-requests", province="ไม่มีจังหวัดนี้") == []
+
+
+def test_certification_status(client, farm):
+    fid = farm(certs=[(date(2000, 1, 1), date(2002, 1, 1)), (date(2024, 1, 1), date(2999, 1, 1))])
+    valid = [r for r in _rows(client, "certifications", status="valid") if r["farm_id"] == fid]
+    expired = [r for r in _rows(client, "certifications", status="expired") if r["farm_id"] == fid]
+    assert [r["expire_date"] for r in valid] == ["2999-01-01"]
+    assert [r["expire_date"] for r in expired] == ["2002-01-01"]
+
+
+def test_certified_farms_take_latest_cert(client, farm):
+    # issue_date ใหม่สุดชนะแม้ cert_id น้อยกว่า; issue_date เท่ากันใช้ cert_id มากสุด
+    newer_first = farm(certs=[(date(2025, 6, 1), date(2027, 6, 1)), (date(2024, 6, 1), date(2026, 6, 1))])
+    tie = farm(certs=[(date(2025, 1, 1), date(2027, 1, 1)), (date(2025, 1, 1), date(2027, 1, 2))])
+    no_cert = farm()
+    rows = {r["farm_id"]: r for r in _rows(client, "certified-farms")}
+    assert no_cert not in rows
+    assert rows[newer_first]["issue_date"] == "2025-06-01"
+    assert rows[tie]["expire_date"] == "2027-01-02"
+    # since/until กรองด้วยวันออกของเกียรติบัตรล่าสุด ไม่ใช่ใบไหนก็ได้
+    old = _rows(client, "certified-farms", until="2024-12-31")
+    assert newer_first not in {r["farm_id"] for r in old}
+
+
+@pytest.mark.parametrize("entity,params", [
+    ("personals", {"since": "2025-01-01"}),
+    ("farms", {"status": "valid"}),
+    ("certifications", {"status": GapStatus.Pending.value}),
+])
+def test_filters_that_do_not_apply_are_400(client, entity, params):
+    assert client.get(f"/export/{entity}", params=params).status_code == 400
+
+
+def test_csv_header_on_empty_table(engine):
+    from data import EngineProfile, make_engine
+
+    eng = make_engine(EngineProfile.from_env({"GAP_DB_URL": temp_db_url("gap_export_")}))
+    try:
+        migrate.ensure_schema(eng)
+        out = "".join(export.stream(eng, export.build("certified-farms")))
+    finally:
+        eng.dispose()
+    assert out.splitlines() == [
+        "farm_id,user_id,location,titledeed_num,titledeed_file,owner_name,owner_surname,province,district,"
+        "phone_number,cert_id,request_id,issue_date,expire_date,cert_file"
+    ]
@@ -0,0 +1,61 @@
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+import fastjson
+from model import FarmDB, GAPRequestDB, GapStatus
+
+
+@pytest.fixture
+def urls(engine, make_user):
+    """เกษตรกรหนึ่งคนที่มีข้อมูลครบทุก endpoint ที่ใช้ fastjson.respond"""
+    import main
+
+    client = TestClient(main.app)
+    uid = make_user(name="เร็วเจสัน", surname="ทดสอบ")
+    assert client.post("/farms", json={"user_id": uid, "location": "แปลง \"ก\"\n2"}).status_code == 201
+    assert client.post("/durians", json={"user_id": uid, "durian_type": "หมอนทอง", "tree_count": 12,
+                                         "flowering_startdate": "2025-01-15", "weight_expected": 2.5}).status_code == 201
+    assert client.post("/answers", json={"user_id": uid, "activity_id": 1, "answer_text": "มี", "result_each": 1}).status_code == 201
+    with Session(engine) as session:
+        farm_id = session.exec(select(FarmDB.farm_id).where(FarmDB.user_id == uid)).one()
+        req = GAPRequestDB(farm_id=farm_id, request_date=date(2025, 5, 1), timeline_status=GapStatus.Pending.value)
+        session.add(req)
+        session.commit()
+        rid = req.request_id
+    assert client.post("/inspections", json={"request_id": rid, "complete_date": "2025-05-10",
+                                             "status_result": "ผ่าน"}).status_code == 201
+    assert client.post("/certifications", json={"request_id": rid, "farm_id": farm_id, "issue_date": "2025-06-01",
+                                                "expire_date": "2028-06-01", "cert_file": "c.pdf"}).status_code == 201
+    return [
+        "/personals?limit=500", "/personals/search?q=เร็วเจสัน", "/personals/search?q=เร็วเจสน&mode=fuzzy",
+        "/personals/by-name-surname/เร็วเจสัน/ทดสอบ", f"/farms/by-user/{uid}", f"/durians/by-user/{uid}",
+        "/categories", "/activities", f"/activities/with-status?user_id={uid}", f"/gap-requests/by-user/{uid}",
+        f"/inspections/by-request/{rid}", "/inspections/queue?limit=500", f"/certifications/by-user/{uid}",
+    ]
+
+
+def test_fast_mode_returns_same_json(urls, monkeypatch):
+    import main
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(fastjson, "enabled", False)
+    default = {u: client.get(u) for u in urls}
+    monkeypatch.setattr(fastjson, "enabled", True)
+    fast = {u: client.get(u) for u in urls}
+    for u in urls:
+        assert fast[u].status_code == default[u].status_code == 200, u
+        assert fast[u].json() == default[u].json(), u
+        assert fast[u].headers.get("etag") == default[u].headers.get("etag"), u
+        assert fast[u].headers["content-type"].startswith("application/json"), u
+
+
+def test_stdlib_encoder_without_orjson(monkeypatch):
+    monkeypatch.setattr(fastjson, "orjson", None)
+    row = {"d": date(2025, 1, 2), "s": GapStatus.Pending, "t": "ไทย \"q\""}
+    out = fastjson.dumps([row])
+    assert json.loads(out) == [{"d": "2025-01-02", "s": GapStatus.Pending.value, "t": "ไทย \"q\""}]
+    assert "ไทย".encode() in out  # ไม่ escape เป็น \uXXXX
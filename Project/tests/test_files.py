@@ -0,0 +1,82 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import blobstore
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+
+
+@pytest.fixture
+def client(engine, tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(blobstore, "store", blobstore.LocalDiskStore(tmp_path / "blobs"))
+    return TestClient(main.app)
+
+
+def _upload(client, body, filename=None, content_type="image/png"):
+    return client.post("/files", content=body, params={"filename": filename} if filename else {},
+                       headers={"Content-Type": content_type})
+
+
+def test_import_does_not_touch_disk(tmp_path, monkeypatch):
+    monkeypatch.setenv("GAP_BLOB_DIR", str(tmp_path / "blobs"))
+    try:
+        importlib.reload(blobstore)
+        assert not (tmp_path / "blobs").exists()
+        blobstore.store.writer().abort()
+        assert (tmp_path / "blobs" / "tmp").is_dir()
+    finally:
+        monkeypatch.delenv("GAP_BLOB_DIR")
+        importlib.reload(blobstore)
+
+
+def test_upload_and_dedupe(client):
+    first = _upload(client, PNG, "a.png")
+    assert first.status_code == 201
+    body = first.json()
+    assert body["content_type"] == "image/png" and body["size"] == len(PNG) and not body["deduplicated"]
+
+    # ไฟล์เดียวกัน ต่างชื่อ/ต่าง Content-Type: เก็บครั้งเดียว ชนิดตามเนื้อไฟล์ ชื่อเป็นของ request นี้
+    again = _upload(client, PNG, "b.png", content_type="text/html")
+    assert again.status_code == 201
+    assert again.json() == {**body, "filename": "b.png", "deduplicated": True}
+
+
+def test_download_and_range(client):
+    blob_id = _upload(client, PNG, "a.png").json()["blob_id"]
+    r = client.get(f"/files/{blob_id}")
+    assert r.status_code == 200 and r.content == PNG
+    assert r.headers["content-type"] == "image/png"
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert r.headers["content-disposition"] == f'inline; filename="{blob_id}.png"'
+
+    part = client.get(f"/files/{blob_id}", headers={"Range": "bytes=0-7"})
+    assert part.status_code == 206 and part.content == PNG[:8]
+    assert part.headers["content-range"] == f"bytes 0-7/{len(PNG)}"
+
+
+def test_html_is_served_as_attachment(client):
+    blob_id = _upload(client, b"<script>alert(1)</script>", content_type="text/html").json()["blob_id"]
+    r = client.get(f"/files/{blob_id}")
+    assert r.headers["content-type"] == "application/octet-stream"
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert r.headers["content-disposition"] == f'attachment; filename="{blob_id}.bin"'
+
+
+def test_too_large_and_empty(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "MAX_BYTES", 100)
+    assert _upload(client, PNG).status_code == 413
+    assert _upload(client, b"").status_code == 422
+    # ไฟล์ชั่วคราวที่เขียนไม่จบถูกลบ
+    assert list((tmp_path / "blobs" / "tmp").iterdir()) == []
+
+
+def test_sniff_type():
+    assert blobstore.sniff_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert blobstore.sniff_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert blobstore.sniff_type(b"%PDF-1.7") == "application/pdf"
+    assert blobstore.sniff_type(b"<svg xmlns=") == "application/octet-stream"
@@ -0,0 +1,86 @@
+from datetime import date
+
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from model import FarmDB, GAPRequestDB, GapStatus, RollupDB
+
+
+PROVINCE = "สถานะทดสอบ"
+
+
+def _make_request(engine, make_user) -> int:
+    uid = make_user(province=PROVINCE)
+    with Session(engine) as session:
+        farm = FarmDB(user_id=uid)
+        session.add(farm)
+        session.flush()
+        req = GAPRequestDB(farm_id=farm.farm_id, request_date=date(2025, 5, 1),
+                           timeline_status=GapStatus.Pending.value)
+        session.add(req)
+        session.commit()
+        return req.request_id
+
+
+def _counts(engine) -> dict:
+    with Session(engine) as session:
+        rows = session.exec(
+            select(RollupDB.status, func.sum(RollupDB.count))
+            .where(RollupDB.metric == "gap_requests", RollupDB.province == PROVINCE)
+            .group_by(RollupDB.status)
+        ).all()
+    return {status: n for status, n in rows if n}
+
+
+def _patch(client, request_id, status):
+    return client.patch(f"/gap-requests/status/{request_id}", params={"timeline_status": status.value})
+
+
+def test_status_change_bumps_rollup_once(engine, make_user):
+    import main
+
+    client = TestClient(main.app)
+    rid = _make_request(engine, make_user)
+    before = _counts(engine)
+    r = _patch(client, rid, GapStatus.Inspecting)
+    assert r.status_code == 200 and r.json()["timeline_status"] == GapStatus.Inspecting.value
+    # สถานะเดิมซ้ำ = ไม่เปลี่ยนอะไร
+    assert _patch(client, rid, GapStatus.Inspecting).status_code == 200
+    after = _counts(engine)
+    assert after.get(GapStatus.Inspecting.value, 0) - before.get(GapStatus.Inspecting.value, 0) == 1
+    assert after.get(GapStatus.Pending.value, 0) - before.get(GapStatus.Pending.value, 0) == -1
+
+
+def test_concurrent_change_is_rejected(engine, make_user, monkeypatch):
+    # อีก request เปลี่ยนสถานะระหว่างที่ handler อ่านสถานะเดิมไปแล้ว → UPDATE ไม่เจอแถว → 409, rollup ไม่ถูกแตะ
+    import main
+
+    rid = _make_request(engine, make_user)
+    before = _counts(engine)
+    fired = []
+
+    def racing_update(table):
+        if not fired:
+            fired.append(True)
+            with Session(engine) as other:
+                other.get(GAPRequestDB, rid).timeline_status = GapStatus.Inspected.value
+                other.commit()
+        return sqlalchemy.update(table)
+
+    monkeypatch.setattr(main, "update", racing_update)
+    r = _patch(TestClient(main.app), rid, GapStatus.Inspecting)
+    assert fired and r.status_code == 409
+    with Session(engine) as session:
+        assert session.get(GAPRequestDB, rid).timeline_status == GapStatus.Inspected.value
+    assert _counts(engine) == before
+
+
+def test_export_leaves_out_claim_columns(engine, make_user):
+    import main
+
+    _make_request(engine, make_user)
+    r = TestClient(main.app).get("/export/gap-requests", params={"province": PROVINCE})
+    assert r.status_code == 200
+    header = r.text.splitlines()[0].split(",")
+    assert header == ["request_id", "farm_id", "request_date", "timeline_status", "user_id", "province", "district"]
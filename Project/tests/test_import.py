@@ -0,0 +1,95 @@
+import csv
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.common import PERSON
+
+
+PROVINCE = "นำเข้าทดสอบ"
+
+
+@pytest.fixture
+def client(engine):
+    import main
+    return TestClient(main.app)
+
+
+def _csv(rows) -> bytes:
+    out = io.StringIO()
+    w = csv.DictWriter(out, fieldnames=list(rows[0]))
+    w.writeheader()
+    w.writerows(rows)
+    return out.getvalue().encode("utf-8-sig")
+
+
+def _person(id_number, **fields) -> dict:
+    return {**PERSON, "province": PROVINCE, "district": "นำเข้า", "id_number": id_number, **fields}
+
+
+def _import(client, kind, body, format="csv"):
+    return client.post(f"/import/{kind}", content=body, params={"format": format})
+
+
+def test_personals_report_bad_rows_and_duplicates(client, make_user):
+    make_user(id_number="9100000000009")
+    r = _import(client, "personals", _csv([
+        _person("9100000000001", name="นำเข้าหนึ่ง"),
+        _person("9100000000002", name=""),            # ขาดชื่อ
+        _person("9100000000003", birth="31/02/2020"),  # วันที่ผิด
+        _person("9100000000001"),                      # ซ้ำในไฟล์
+        _person("9100000000009"),                      # ซ้ำกับที่มีอยู่
+        _person("9100000000004", name="นำเข้าสอง"),
+    ]))
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["rows"], body["inserted"], body["failed"]) == (6, 2, 4)
+    errors = {e["row"]: e["errors"] for e in body["errors"]}
+    assert sorted(errors) == [3, 4, 5, 6]
+    assert errors[3][0].startswith("name:") and errors[4][0].startswith("birth:")
+    assert errors[5] == ["id_number: 9100000000001 already exists"]
+    assert errors[6] == ["id_number: 9100000000009 already exists"]
+
+
+def _farmers(client) -> int:
+    stats = client.get("/stats/farmers", params={"province": PROVINCE}).json()
+    return sum(s["count"] for s in stats)
+
+
+def test_personals_fill_rollup_and_search(client):
+    before = _farmers(client)
+    r = _import(client, "personals", _csv([_person(f"92000000000{i:02d}", name=f"ทุเรียนนำเข้า{i}") for i in range(3)]))
+    assert r.json()["inserted"] == 3
+    assert _farmers(client) - before == 3
+    hits = client.get("/personals/search", params={"q": "ทุเรียนนำเข้", "mode": "fuzzy"}).json()["items"]
+    assert len(hits) == 3
+
+
+def test_farms_resolve_owner_by_id_number(client, make_user):
+    uid = make_user(id_number="9300000000001")
+    r = _import(client, "farms", _csv([
+        {"id_number": "9300000000001", "user_id": "", "location": "แปลงนำเข้า 1"},
+        {"id_number": "9399999999999", "user_id": "", "location": "ไม่มีเจ้าของ"},
+        {"id_number": "", "user_id": str(uid), "location": "แปลงนำเข้า 2"},
+        {"id_number": "", "user_id": "987654321", "location": "user ไม่มี"},
+    ]))
+    body = r.json()
+    assert (body["inserted"], body["failed"]) == (2, 2)
+    assert body["errors"] == [
+        {"row": 3, "errors": ["id_number: 9399999999999 not found"]},
+        {"row": 5, "errors": ["user_id: 987654321 not found"]},
+    ]
+    farms = client.get(f"/farms/by-user/{uid}").json()["items"]
+    assert sorted(f["location"] for f in farms) == ["แปลงนำเข้า 1", "แปลงนำเข้า 2"]
+
+
+def test_unreadable_file_is_422(client):
+    assert _import(client, "personals", b"name,surname\n\xff\xfe,x\n").status_code == 422
+    pytest.importorskip("openpyxl")
+    assert _import(client, "personals", b"not a workbook", format="xlsx").status_code == 422
+    other = io.BytesIO()
+    with zipfile.ZipFile(other, "w") as z:
+        z.writestr("a.txt", "x")
+    assert _import(client, "personals", other.getvalue(), format="xlsx").status_code == 422
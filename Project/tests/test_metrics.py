@@ -0,0 +1,41 @@
+import re
+
+from fastapi.testclient import TestClient
+
+
+def _requests_total(client) -> dict:
+    text = client.get("/metrics").text
+    return {
+        labels: float(n)
+        for labels, n in re.findall(r'^gap_http_requests_total\{(.*)\} (\S+)$', text, re.M)
+    }
+
+
+def test_routes_are_labelled_by_template(engine, make_user):
+    import main
+
+    client = TestClient(main.app)
+    uid, other = make_user(), make_user()
+    before = _requests_total(client)
+    for u in (uid, other):
+        assert client.get(f"/farms/by-user/{u}").status_code == 200
+    assert client.get("/no-such-path/123").status_code == 404
+    after = _requests_total(client)
+
+    by_user = 'method="GET",route="/farms/by-user/{user_id}",status="200"'
+    unmatched = 'method="GET",route="<unmatched>",status="404"'
+    assert after[by_user] - before.get(by_user, 0) == 2
+    assert after[unmatched] - before.get(unmatched, 0) == 1
+    # ไม่มี label ที่เป็น URL จริง
+    assert not [k for k in after if f"/farms/by-user/{uid}" in k or "/no-such-path" in k]
+
+
+def test_exposition_format(engine):
+    import main
+
+    client = TestClient(main.app)
+    client.get("/metrics")  # request ถูกนับหลังส่ง response → ครั้งที่สองจึงเห็นของครั้งแรก
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE gap_http_request_duration_seconds histogram" in r.text
+    assert re.search(r'^gap_sql_statements_per_request_bucket\{route="/metrics",le="\+Inf"\} \d+$', r.text, re.M)
@@ -0,0 +1,74 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from sqlalchemy import inspect, text
+
+import migrate
+from bench.common import temp_db_url
+from model import GapStatus
+
+
+LEGACY_DB = Path(__file__).parents[1] / "database_project.db"
+
+
+def _engine(url):
+    from data import EngineProfile, make_engine
+    return make_engine(EngineProfile.from_env({"GAP_DB_URL": url}))
+
+
+@pytest.fixture
+def legacy_engine(engine):
+    """สำเนาของ database_project.db (schema เดิม: user_id เป็นข้อความ ไม่มี foreign key)"""
+    url = temp_db_url("gap_legacy_")
+    shutil.copyfile(LEGACY_DB, url[len("sqlite:///"):])
+    eng = _engine(url)
+    yield eng
+    eng.dispose()
+
+
+def test_fresh_database_is_created_at_startup(engine):
+    eng = _engine(temp_db_url("gap_fresh_"))
+    try:
+        assert migrate.schema_version(eng) is None
+        assert migrate.ensure_schema(eng)["schema_version"] == migrate.SCHEMA_VERSION
+        assert migrate.schema_version(eng) == migrate.SCHEMA_VERSION
+        assert migrate.ensure_schema(eng) == {}
+    finally:
+        eng.dispose()
+
+
+def test_outdated_database_refuses_to_start_until_migrated(legacy_engine):
+    assert migrate.schema_version(legacy_engine) == 0
+    with pytest.raises(RuntimeError, match="python migrate.py"):
+        migrate.ensure_schema(legacy_engine)
+    # ตอน start ไม่แตะ DB เดิมเลย
+    assert not inspect(legacy_engine).get_foreign_keys("farmdb")
+
+    out = migrate.upgrade(legacy_engine)
+    assert "farmdb" in out["user_fk_converted"]
+    assert migrate.ensure_schema(legacy_engine) == {}
+
+
+def _add_request(eng, status):
+    with eng.begin() as conn:
+        conn.execute(text("INSERT INTO gaprequestdb (farm_id, request_date, timeline_status) VALUES (1, '2025-05-01', :s)"),
+                     {"s": status})
+
+
+def test_free_text_status_is_normalized_or_refused(legacy_engine):
+    _add_request(legacy_engine, " ตรวจเสร็จ ")
+    _add_request(legacy_engine, "กำลังตรวจ")
+    with pytest.raises(RuntimeError, match="กำลังตรวจ"):
+        migrate.upgrade(legacy_engine)
+    # ไม่แก้อะไรเลย: ไม่สร้างตารางใหม่ ไม่แปลง user_id ไม่ประทับเวอร์ชัน
+    assert "evaluationsummarydb" not in inspect(legacy_engine).get_table_names()
+    assert migrate.schema_version(legacy_engine) == 0
+
+    with legacy_engine.begin() as conn:
+        conn.execute(text("UPDATE gaprequestdb SET timeline_status = 'อยู่ระหว่างตรวจ' WHERE timeline_status = 'กำลังตรวจ'"))
+    out = migrate.upgrade(legacy_engine)
+    assert out["statuses_normalized"] == 1 and "evaluation_summary" in out
+    with legacy_engine.connect() as conn:
+        statuses = {s for (s,) in conn.execute(text("SELECT timeline_status FROM gaprequestdb"))}
+    assert statuses <= {s.value for s in GapStatus}
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import sqltrace
+from model import CertificationDB, DurianDB, FarmDB, GAPRequestDB, GapStatus, InspectionDB
+
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def farmer(engine, make_user):
+    """เกษตรกรที่มี farms ฟาร์ม ฟาร์มละ 2 คำขอ คำขอละ 2 ผลตรวจ + เกียรติบัตรหมดอายุ/ยังไม่หมดอย่างละใบ"""
+    def make(farms: int) -> int:
+        uid = make_user()
+        with Session(engine) as session:
+            session.add_all([DurianDB(user_id=uid, durian_type="หมอนทอง"), DurianDB(user_id=uid, durian_type="ชะนี")])
+            for f in range(farms):
+                farm = FarmDB(user_id=uid, location=f"แปลง {f}")
+                session.add(farm)
+                session.flush()
+                for r in range(2):
+                    req = GAPRequestDB(farm_id=farm.farm_id, request_date=date(2025, 1 + r, 1),
+                                       timeline_status=GapStatus.Inspected.value)
+                    session.add(req)
+                    session.flush()
+                    session.add_all([
+                        InspectionDB(request_id=req.request_id, complete_date=date(2025, 2, 1), status_result="ไม่ผ่าน"),
+                        InspectionDB(request_id=req.request_id, complete_date=date(2025, 3, 1), status_result="ผ่าน"),
+                    ])
+                    session.add_all([
+                        CertificationDB(request_id=req.request_id, farm_id=farm.farm_id, issue_date=date(2020, 1, 1),
+                                        expire_date=TODAY - timedelta(days=1), cert_file="old.pdf"),
+                        CertificationDB(request_id=req.request_id, farm_id=farm.farm_id, issue_date=date(2025, 1, 1),
+                                        expire_date=TODAY, cert_file="new.pdf"),
+                    ])
+            session.commit()
+        return uid
+    return make
+
+
+def test_overview_shape(engine, farmer, query_budget):
+    import main
+
+    uid = farmer(farms=2)
+    client = TestClient(main.app)
+    client.get("/activities")  # งบของ overview นับกรณีแคช rubric อุ่นแล้ว (ตอนแคชว่างมี query โหลด rubric เพิ่ม)
+    r = client.get(f"/users/{uid}/overview")
+    assert r.status_code == 200
+    body = r.json()
+    assert set(body) == {"profile", "farms", "durians", "requests", "certifications", "evaluation"}
+    assert body["profile"]["user_id"] == uid
+    assert [f["location"] for f in body["farms"]] == ["แปลง 0", "แปลง 1"]
+    assert len(body["durians"]) == 2
+
+    ids = [req["request_id"] for req in body["requests"]]
+    assert len(ids) == 4 and ids == sorted(ids, reverse=True)  # ใหม่สุดก่อน
+    assert {req["latest_inspection"]["status_result"] for req in body["requests"]} == {"ผ่าน"}
+    # เฉพาะใบที่ยังไม่หมดอายุ (หมดวันนี้ยังนับ)
+    assert [c["cert_file"] for c in body["certifications"]] == ["new.pdf"] * 4
+    assert body["evaluation"]["status"] == "incomplete"
+
+    assert client.get("/users/987654321/overview").status_code == 404
+
+
+def test_overview_query_count_does_not_grow(engine, farmer):
+    import main
+
+    counts = []
+    TestClient(main.app).get("/activities")
+    for farms in (1, 4):
+        uid = farmer(farms)
+        with sqltrace.track(record=True) as q:
+            main.user_overview(uid)
+        counts.append(len(q.statements))
+    assert counts[0] == counts[1] <= main.user_overview.__query_budget__.max_queries
@@ -0,0 +1,83 @@
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.common import PERSON
+from paging import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def client(engine):
+    import main
+    return TestClient(main.app)
+
+
+def _add(client, name, surname, id_number):
+    r = client.post("/personals", json={**PERSON, "name": name, "surname": surname, "id_number": id_number})
+    assert r.status_code == 201
+    return r.json()["user_id"]
+
+
+def _pages(client, **params):
+    items, after = [], None
+    while True:
+        r = client.get("/personals/search", params={**params, **({"after": after} if after else {})})
+        assert r.status_code == 200
+        body = r.json()
+        items += body["items"]
+        after = body["next_cursor"]
+        if after is None:
+            return items
+
+
+def test_prefix_pages_match_single_page(client):
+    # บางคนตรงทั้งชื่อและนามสกุล → ต้องออกครั้งเดียว ตามค่าที่เรียงก่อน
+    for i in range(7):
+        _add(client, f"ปพก{i % 3}", f"ปพก{6 - i}" if i % 2 else "อื่น", f"91000000000{i:02d}")
+    full = client.get("/personals/search", params={"q": "ปพก", "limit": 100}).json()
+    assert full["next_cursor"] is None and len(full["items"]) == 7
+    paged = _pages(client, q="ปพก", limit=2)
+    assert [h["user_id"] for h in paged] == [h["user_id"] for h in full["items"]]
+
+
+def test_prefix_cursor_stable_under_inserts(client):
+    ids = [_add(client, f"ปคส{i}", "นามสกุล", f"92000000000{i:02d}") for i in range(6)]
+    first = client.get("/personals/search", params={"q": "ปคส", "limit": 3}).json()
+    assert [h["user_id"] for h in first["items"]] == ids[:3]
+    # คนใหม่ที่เรียงก่อน cursor ไม่ทำให้หน้าถัดไปซ้ำหรือข้ามแถว
+    _add(client, "ปคส0", "ก่อนหน้า", "9200000000099")
+    rest = _pages(client, q="ปคส", limit=3, after=first["next_cursor"])
+    assert [h["user_id"] for h in rest] == ids[3:]
+
+
+def test_fuzzy_pages_match_single_page(client):
+    for i in range(6):
+        _add(client, f"สมฟัซ{i}", "ทดสอบฟัซซี่", f"93000000000{i:02d}")
+    full = client.get("/personals/search", params={"q": "สมฟัซ ทดสอบฟัซซี่", "mode": "fuzzy", "limit": 100}).json()
+    assert len(full["items"]) >= 6
+    paged = _pages(client, q="สมฟัซ ทดสอบฟัซซี่", mode="fuzzy", limit=4)
+    assert [h["user_id"] for h in paged] == [h["user_id"] for h in full["items"]]
+
+
+def test_invalid_cursor(client):
+    assert client.get("/personals/search", params={"q": "ก", "after": "12"}).status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["prefix", "fuzzy"])
+@pytest.mark.parametrize("values", [
+    [None, None], [[1], [2]], [{"a": 1}, 1], ["ก", "1"], [True, 1], [1, 2, 3], "ก",
+])
+def test_cursor_with_wrong_types_is_400(client, mode, values):
+    after = encode_cursor(*values) if isinstance(values, list) else encode_cursor(values)
+    r = client.get("/personals/search", params={"q": "กขค", "mode": mode, "after": after})
+    assert r.status_code == 400, r.text
+
+
+def test_cursor_types_per_mode():
+    assert decode_cursor(encode_cursor("สม", 3), str, int) == ("สม", 3)
+    assert decode_cursor(encode_cursor(0.5, 3), (int, float), int) == (0.5, 3)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(0.5, 3), str, int)
+    with pytest.raises(ValueError):
+        decode_cursor(base64.urlsafe_b64encode(b"[NaN, 1]").decode(), (int, float), int)
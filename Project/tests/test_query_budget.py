@@ -0,0 +1,101 @@
+"""เล่น client.http ทั้งไฟล์ผ่าน TestClient ภายใต้ fixture query_budget
+→ route ไหนยิง query เกินงบ หรือยิง statement รูปเดิมซ้ำเกินกำหนด (N+1) เทสต์นี้ fail
+
+client.http เขียนไว้สำหรับ DB ใหม่ (user 1, 2 / farm 1 / request 1 ...) แต่ DB ของเทสต์ใช้ร่วมกัน
+จึงแปลง id ในไฟล์เป็น id จริงที่ได้จากการสร้างตามลำดับ
+"""
+import json
+import re
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+
+CLIENT_HTTP = Path(__file__).parents[1] / "client.http"
+
+# POST path ที่สร้าง entity → (ชนิด, field ใน response)
+CREATES = {
+    "/personals": ("user", "user_id"),
+    "/farms": ("farm", "farm_id"),
+    "/agreements": ("agreement", "agreement_id"),
+    "/gap-requests": ("request", "request_id"),
+}
+BODY_KEYS = {"user_id": "user", "farm_id": "farm", "agreement_id": "agreement", "request_id": "request"}
+URL_IDS = [
+    (re.compile(r"(user_id=)(\d+)"), "user"),
+    (re.compile(r"(/answers/score/)(\d+)"), "user"),
+    (re.compile(r"(/gap-requests/by-user/)(\d+)"), "user"),
+    (re.compile(r"(/gap-requests/status/)(\d+)"), "request"),
+]
+
+
+def parse(text: str):
+    """[(method, path, body)] ตามลำดับในไฟล์"""
+    out = []
+    for block in re.split(r"^(?=(?:GET|POST|PUT|PATCH|DELETE) http)", text, flags=re.M)[1:]:
+        lines = block.split("\n")
+        method, url = lines[0].split()[:2]
+        body = "\n".join(
+            l for l in lines[1:] if not l.startswith("#") and not l.startswith("Content-Type")
+        ).split("###")[0].strip()
+        out.append((method, url.replace("http://127.0.0.1:8000", ""), json.loads(body) if body else None))
+    return out
+
+
+class IdMap:
+    def __init__(self):
+        self.ids = {kind: [] for kind, _ in CREATES.values()}
+
+    def created(self, method: str, path: str, response) -> None:
+        kind = CREATES.get(path.split("?")[0])
+        if method == "POST" and kind is not None and response.status_code < 300:
+            self.ids[kind[0]].append(response.json()[kind[1]])
+
+    def get(self, kind: str, n) -> int:
+        # id ในไฟล์ = ลำดับที่สร้าง (นับจาก 1); ที่สร้างไม่สำเร็จ (4xx) → 0 ซึ่งไม่มีจริง ได้ 404/400 แทน
+        created = self.ids[kind]
+        return created[int(n) - 1] if int(n) <= len(created) else 0
+
+    def url(self, path: str) -> str:
+        for pattern, kind in URL_IDS:
+            path = pattern.sub(lambda m: f"{m.group(1)}{self.get(kind, m.group(2))}", path)
+        return path
+
+    def body(self, body):
+        if isinstance(body, list):
+            return [self.body(b) for b in body]
+        if isinstance(body, dict):
+            return {k: (type(v)(self.get(BODY_KEYS[k], v)) if k in BODY_KEYS else v) for k, v in body.items()}
+        return body
+
+
+def test_client_http_within_budget(engine, query_budget):
+    import main
+
+    requests = parse(CLIENT_HTTP.read_text(encoding="utf-8"))
+    assert requests
+    client = TestClient(main.app, raise_server_exceptions=False)
+    ids = IdMap()
+    for method, path, body in requests:
+        r = client.request(method, ids.url(path), json=ids.body(body))
+        assert r.status_code < 500, f"{method} {path}: {r.status_code} {r.text[:300]}"
+        ids.created(method, path, r)
+    assert len(ids.ids["user"]) == 2 and len(ids.ids["farm"]) == 2
+
+    # client.http ตอบไม่ครบทุกข้อ (ไม่มีข้อ 47) → ทั้งสองคนยัง incomplete และยื่นคำขอ GAP ไม่ได้
+    for user_id in ids.ids["user"]:
+        assert client.get("/assessment/evaluate", params={"user_id": user_id}).json()["status"] == "incomplete"
+
+
+def test_over_budget_is_recorded(engine, monkeypatch):
+    # fixture จับได้จริง: ลดงบของ /categories เหลือ 0 แล้วต้องมี violation
+    import main
+    import querybudget
+
+    route = next(r for r in main.app.routes if getattr(r, "path", None) == "/categories")
+    monkeypatch.setattr(route.endpoint, "__query_budget__", querybudget.budget(0))
+    monkeypatch.setattr(querybudget.state, "mode", "collect")
+    monkeypatch.setattr(querybudget.state, "violations", [])
+    main.rubric_cache.invalidate()
+    assert TestClient(main.app).get("/categories").status_code == 200
+    assert querybudget.state.violations and "GET /categories" in querybudget.state.violations[0]
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from model import AssessmentCategoryDB, TableVersionDB
+from rubric import MASTER_VERSION
+
+
+@pytest.fixture
+def other_process(engine):
+    """engine แยก + เขียนด้วย Core (ไม่ผ่าน Session event ของ process นี้) = เหมือน process อื่นแก้ master"""
+    from data import EngineProfile, make_engine
+
+    eng = make_engine(EngineProfile.from_env({"GAP_DB_URL": os.environ["GAP_DB_URL"]}))
+
+    def rename(categoryapp_id: int, name: str) -> None:
+        with eng.begin() as conn:
+            conn.execute(update(AssessmentCategoryDB).where(AssessmentCategoryDB.categoryapp_id == categoryapp_id)
+                         .values(category_name=name))
+            bumped = conn.execute(update(TableVersionDB).where(TableVersionDB.name == MASTER_VERSION).values(
+                version=TableVersionDB.version + 1, updated_at=datetime.now(timezone.utc)))
+            assert bumped.rowcount == 1
+    yield rename
+    eng.dispose()
+
+
+def test_etag_follows_writes_from_another_process(engine, other_process):
+    import main
+
+    client = TestClient(main.app)
+    first = client.get("/categories")
+    etag = first.headers["etag"]
+    original = first.json()[0]["category_name"]
+    assert client.get("/categories", headers={"If-None-Match": etag}).status_code == 304
+
+    other_process(1, "แก้จาก process อื่น")
+    try:
+        r = client.get("/categories", headers={"If-None-Match": etag})
+        assert r.status_code == 200 and r.headers["etag"] != etag
+        assert r.json()[0]["category_name"] == "แก้จาก process อื่น"
+    finally:
+        other_process(1, original)
+    assert client.get("/categories").json()[0]["category_name"] == original
+
+
+def test_cold_load_reads_version_once(engine):
+    """DB ที่ยังไม่มีแถว TableVersionDB["master"]: โหลด rubric = เวอร์ชัน + หมวด + กิจกรรม + เกณฑ์ (4 query)"""
+    from sqlalchemy import delete
+    from sqlmodel import Session
+    import migrate
+    import seed
+    import sqltrace
+    from bench.common import temp_db_url
+    from data import EngineProfile, make_engine
+    from rubric import RubricCache
+
+    eng = make_engine(EngineProfile.from_env({"GAP_DB_URL": temp_db_url("gap_rubric_")}))
+    try:
+        migrate.ensure_schema(eng)
+        with Session(eng) as session:
+            seed.seed_master(session)
+            session.exec(delete(TableVersionDB).where(TableVersionDB.name == MASTER_VERSION))
+            session.commit()
+        with Session(eng) as session, sqltrace.track(record=True) as q:
+            rubric = RubricCache().get(session)
+        assert rubric.version == 0 and rubric.activities
+        assert len(q.statements) == 4, q.statements
+    finally:
+        eng.dispose()
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(engine):
+    import main
+    return TestClient(main.app)
+
+
+def _answered_user(client, make_user, n=2):
+    uid = make_user()
+    for aid in range(1, n + 1):
+        assert client.post("/answers", json={"user_id": uid, "activity_id": aid, "answer_text": "มี"}).status_code == 201
+    return uid
+
+
+def test_if_match_stale_etag_rejected(client, make_user):
+    uid = _answered_user(client, make_user)
+    r = client.patch(f"/answers/score/{uid}", json=[{"user_id": uid, "activity_id": 1, "result_each": 1}])
+    etag = r.headers["ETag"]
+    ok = client.patch(f"/answers/score/{uid}", headers={"If-Match": etag},
+                      json=[{"user_id": uid, "activity_id": 2, "result_each": 1}])
+    assert ok.status_code == 200 and ok.headers["ETag"] != etag
+    stale = client.patch(f"/answers/score/{uid}", headers={"If-Match": etag},
+                         json=[{"user_id": uid, "activity_id": 2, "result_each": 0}])
+    assert stale.status_code == 412
+    assert stale.json()["detail"]["etag"] == ok.headers["ETag"]
+
+
+def test_if_match_concurrent_admins_one_wins(client, make_user, monkeypatch):
+    """admin สองคนส่ง ETag เดียวกันพร้อมกัน: คนแรกค้างอยู่หลังผ่านการตรวจ คนที่สองต้องได้ 412 ไม่ใช่เขียนทับ"""
+    import main
+
+    uid = _answered_user(client, make_user)
+    etag = client.patch(f"/answers/score/{uid}", json=[{"user_id": uid, "activity_id": 1, "result_each": 0}]).headers["ETag"]
+
+    checked, release = threading.Event(), threading.Event()
+    score_answers = main._score_answers
+
+    def slow_score(session, items, **kw):
+        if items[0].result_each == 1:  # เฉพาะ admin คนแรก
+            checked.set()
+            release.wait(10)
+        return score_answers(session, items, **kw)
+
+    monkeypatch.setattr(main, "_score_answers", slow_score)
+    results = {}
+
+    def admin(name, value):
+        results[name] = TestClient(main.app).patch(
+            f"/answers/score/{uid}", headers={"If-Match": etag},
+            json=[{"user_id": uid, "activity_id": 1, "result_each": value}],
+        ).status_code
+
+    first = threading.Thread(target=admin, args=("first", 1))
+    first.start()
+    assert checked.wait(10)
+    second = threading.Thread(target=admin, args=("second", 0))
+    second.start()
+    time.sleep(0.3)  # คนที่สองไปถึงการตรวจ If-Match (รอ lock) ก่อนคนแรก commit
+    release.set()
+    first.join(10)
+    second.join(10)
+    assert results == {"first": 200, "second": 412}
+    rows = client.get(f"/activities/with-status?user_id={uid}").json()
+    assert next(a for a in rows if a["activity_id"] == 1)["result_each"] == 1
+
+
+def _summary_matches_answers(engine, uid) -> bool:
+    from types import SimpleNamespace
+    from sqlmodel import Session
+    from evaluation import fill_summary, get_summary, scored_maps
+    from rubric import get_rubric
+
+    with Session(engine) as session:
+        summary = get_summary(session, uid)
+        expected = SimpleNamespace(user_id=uid, answer_version=summary.answer_version)
+        fill_summary(get_rubric(session), expected, scored_maps(session, [uid])[uid])
+        return (summary.scored_ids, summary.major_pass, summary.minor_pass) == \
+            (expected.scored_ids, expected.major_pass, expected.minor_pass)
+
+
+def test_concurrent_scorers_do_not_double_count(client, engine, make_user, monkeypatch):
+    """ผู้ให้คะแนนสองคน (ไม่มี If-Match) ให้ข้อเดียวกัน None → 1 แทรกกัน: summary ต้องนับครั้งเดียว
+
+    คนแรกอ่านคำตอบแล้ว (ก่อนปรับ summary) คนที่สองเริ่มทั้ง request: ต้องรอ lock ของคนแรก
+    แล้วเห็นค่า 1 ที่ commit แล้ว ไม่ใช่อ่าน None เดิมแล้วบวกซ้ำ
+    """
+    import main
+
+    uid = _answered_user(client, make_user)
+    apply_many = main.apply_changes_many
+    second = []
+
+    def score():
+        return TestClient(main.app).patch(f"/answers/score/{uid}",
+                                          json=[{"user_id": uid, "activity_id": 1, "result_each": 1}]).status_code
+
+    def interleaved(session, changes):
+        if not second:
+            th = threading.Thread(target=lambda: second.append(score()))
+            second.append(th)
+            th.start()
+            th.join(1)  # แบบเดิม (ไม่มี lock) คนที่สองเขียนเสร็จตรงนี้
+        return apply_many(session, changes)
+
+    monkeypatch.setattr(main, "apply_changes_many", interleaved)
+    assert score() == 200
+    second[0].join(10)
+    assert second[1:] == [200]
+    assert _summary_matches_answers(engine, uid)
+
+
+def test_concurrent_answer_writes_do_not_double_count(client, engine, make_user, monkeypatch):
+    """POST /answers ข้อเดียวกันพร้อมกัน (ให้คะแนนมาด้วย None → 1): เหมือนกรณีผู้ให้คะแนน"""
+    import main
+
+    uid = _answered_user(client, make_user)
+    apply_one = main.apply_changes
+    second = []
+
+    def post():
+        return TestClient(main.app).post("/answers", json={
+            "user_id": uid, "activity_id": 1, "answer_text": "มี", "result_each": 1}).status_code
+
+    def interleaved(session, user_id, changes):
+        if not second:
+            th = threading.Thread(target=lambda: second.append(post()))
+            second.append(th)
+            th.start()
+            th.join(1)
+        return apply_one(session, user_id, changes)
+
+    monkeypatch.setattr(main, "apply_changes", interleaved)
+    assert post() == 201
+    second[0].join(10)
+    assert second[1:] == [201]
+    assert _summary_matches_answers(engine, uid)
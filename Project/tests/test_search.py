@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import search
+import seed
+
+
+@pytest.fixture
+def client(engine):
+    import main
+    return TestClient(main.app)
+
+
+def _answers(client, user_id, keyword):
+    r = client.post("/answers/search", json={"keyword": keyword, "user_id": user_id})
+    assert r.status_code == 200
+    return {a["activity_id"] for a in r.json()}
+
+
+def test_fts_index_is_used_on_sqlite(engine):
+    with Session(engine) as session:
+        if not search._use_fts(session):
+            pytest.skip("ต้องใช้ SQLite ที่มี FTS5 trigram")
+    assert not search.ensure_fts(engine)  # init_db สร้างไว้แล้ว
+
+
+def test_answer_search_follows_writes(client, make_user):
+    uid = make_user()
+    for aid, text in [(1, "บ่อบาดาลหลังบ้าน"), (2, "คลองชลประทาน ข้อ A1"), (3, "บ่อบาดาลของเพื่อนบ้าน")]:
+        assert client.post("/answers", json={"user_id": uid, "activity_id": aid, "answer_text": text}).status_code == 201
+    assert _answers(client, uid, "บาดาล") == {1, 3}
+    assert _answers(client, uid, "บาดาล เพื่อน") == {3}  # ทุกคำต้องตรง
+    # คำสั้นกว่า 3 ตัวอักษร → LIKE (ทั้งคำเดียว และปนกับคำยาว)
+    assert _answers(client, uid, "A1") == {2}
+    assert _answers(client, uid, "ชลประทาน A1") == {2}
+    assert _answers(client, uid, "บาดาล A1") == set()
+
+    # trigger ของ FTS ตามการแก้ข้อความ
+    assert client.put("/answers", json={"user_id": uid, "activity_id": 1, "answer_text": "ประปาหมู่บ้าน"}).status_code == 201
+    assert _answers(client, uid, "บาดาล") == {3}
+    assert _answers(client, uid, "ประปา") == {1}
+
+
+def test_activity_search_ranks_by_keyword(client):
+    ids = [a["activity_id"] for a in client.post("/activities/search", json={"keyword": "บำบัดน้ำ"}).json()]
+    expected = {i for i, (_, name, _) in enumerate(seed.ACTIVITIES, 1) if "บำบัดน้ำ" in name}
+    assert expected and set(ids) == expected
+    short = client.post("/activities/search", json={"keyword": "ไห"}).json()
+    assert {a["activity_id"] for a in short} == {i for i, (_, name, _) in enumerate(seed.ACTIVITIES, 1) if "ไห" in name}
@@ -0,0 +1,18 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqltrace
+
+
+def test_failed_statement_does_not_leave_start_time():
+    engine = create_engine("sqlite://")
+    sqltrace.install(engine)
+    with engine.connect() as conn, sqltrace.track(record=True) as q:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.info["sqltrace_t0"] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["sqltrace_t0"] == []
+    assert q.count == 2
+    assert q.statements == ["SELECT * FROM no_such_table", "SELECT 1"]
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+from sqlmodel import Session
+
+import workqueue
+from model import FarmDB, GAPRequestDB, GapStatus
+
+
+def _pending(engine, make_user, n):
+    # วันที่ยื่นเก่ามาก → อยู่หัวคิว
+    uid = make_user()
+    with Session(engine) as session:
+        farm = FarmDB(user_id=uid)
+        session.add(farm)
+        session.flush()
+        rows = [GAPRequestDB(farm_id=farm.farm_id, request_date=date(1900, 1, 1),
+                             timeline_status=GapStatus.Pending.value) for _ in range(n)]
+        session.add_all(rows)
+        session.commit()
+        return [r.request_id for r in rows]
+
+
+def _claim(conn, inspector, limit=1):
+    return [r.request_id for r in conn.execute(workqueue.claim_stmt(inspector, limit, workqueue.now()))]
+
+
+def test_claims_never_overlap(engine, make_user):
+    _pending(engine, make_user, 2)
+    with engine.begin() as conn:
+        a = _claim(conn, "ทดสอบ-A")
+    with engine.begin() as conn:
+        b = _claim(conn, "ทดสอบ-B")
+    assert len(a) == len(b) == 1 and a != b
+
+
+def test_postgres_skips_rows_locked_by_another_claim(engine, make_user):
+    # FOR UPDATE SKIP LOCKED render เฉพาะ Postgres: GAP_TEST_DB_URL=postgresql://... python -m pytest tests
+    if engine.dialect.name != "postgresql":
+        pytest.skip("SKIP LOCKED claim path needs GAP_TEST_DB_URL=postgresql://...")
+    from sqlalchemy import text
+
+    _pending(engine, make_user, 2)
+    with engine.connect() as first, engine.connect() as second:
+        with first.begin():
+            a = _claim(first, "ทดสอบ-A")  # ยังไม่ commit → ถือ row lock ไว้
+            with second.begin():
+                second.execute(text("SET LOCAL lock_timeout = '2s'"))  # ถ้ารอ lock ของ first = เทสต์ fail
+                b = _claim(second, "ทดสอบ-B")
+                second.rollback()
+            first.rollback()
+    assert len(a) == len(b) == 1 and a != b
@@ -0,0 +1,97 @@
+"""คิวงานของผู้ตรวจ: คำขอ GAP ที่ รอจัดผู้ตรวจสอบ เรียงตาม request_date (ยื่นก่อนได้ตรวจก่อน)
+
+    GET  /inspections/queue                              ดูคิว (keyset, cursor = request_id)
+    POST /inspections/queue/claim?inspector=A&limit=5    รับงานถัดไป (ไม่มีวันได้ซ้ำกับคนอื่น)
+    POST /inspections/queue/{request_id}/renew           ต่อเวลา lease
+    POST /inspections/queue/{request_id}/release         คืนงานเข้าคิว
+
+- claim = UPDATE ... WHERE request_id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED) RETURNING
+  statement เดียว: Postgres ข้ามแถวที่ผู้ตรวจคนอื่นกำลัง claim อยู่ (ไม่ต้องรอ lock กัน)
+  SQLite ไม่มี FOR UPDATE แต่ UPDATE ถือ write lock ตั้งแต่ต้น statement → claim เรียงกันทีละคน
+  (ทาง Postgres ทดสอบเมื่อรัน tests ด้วย GAP_TEST_DB_URL=postgresql://... เท่านั้น ดู tests/test_workqueue.py)
+- lease: claim_expires_at = ตอนนี้ + GAP_CLAIM_LEASE_SECONDS (ค่าเริ่มต้น 1800)
+  แถวที่ lease หมดถือว่าว่าง → กลับเข้าคิวเองโดยไม่ต้องมี job กวาด
+- เปลี่ยน timeline_status ออกจาก รอจัดผู้ตรวจสอบ (PATCH /gap-requests/status) = เริ่มงานแล้ว ออกจากคิว
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, tuple_, update
+from sqlmodel import select
+
+from model import GAPRequestClaim, GAPRequestDB, GAPRequestOut, GapStatus
+from paging import columns
+
+
+LEASE_SECONDS = int(os.environ.get("GAP_CLAIM_LEASE_SECONDS", "1800"))
+CLAIM_LIMIT_MAX = 50
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _available(at: datetime):
+    return (GAPRequestDB.timeline_status == GapStatus.Pending.value) & or_(
+        GAPRequestDB.claim_expires_at.is_(None), GAPRequestDB.claim_expires_at < at
+    )
+
+
+def _held_by(request_id: int, inspector: str, at: Optional[datetime] = None):
+    cond = (
+        (GAPRequestDB.request_id == request_id)
+        & (GAPRequestDB.timeline_status == GapStatus.Pending.value)
+        & (GAPRequestDB.claimed_by == inspector)
+    )
+    return cond if at is None else cond & (GAPRequestDB.claim_expires_at >= at)
+
+
+def queue_stmt(limit: int, after: Optional[int], at: datetime):
+    """หน้าถัดไปของคิว (limit+1 แถว ให้ paging.keyset_result ตัดสินว่ามีหน้าถัดไปไหม)"""
+    order = (GAPRequestDB.request_date, GAPRequestDB.request_id)
+    stmt = select(*columns(GAPRequestDB, GAPRequestOut)).where(_available(at))
+    if after is not None:
+        # cursor เป็น request_id ตัวเดียว (เข้ากับ Page เดิม) → หา request_date ของมันใน subquery
+        cursor_date = select(GAPRequestDB.request_date).where(GAPRequestDB.request_id == after).scalar_subquery()
+        stmt = stmt.where(tuple_(*order) > tuple_(cursor_date, after))
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def claim_stmt(inspector: str, limit: int, at: datetime):
+    picked = (
+        select(GAPRequestDB.request_id).where(_available(at))
+        .order_by(GAPRequestDB.request_date, GAPRequestDB.request_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)  # SQLite: ไม่ render
+    )
+    return (
+        update(GAPRequestDB)
+        .where(GAPRequestDB.request_id.in_(picked.scalar_subquery()))
+        .values(claimed_by=inspector, claim_expires_at=at + timedelta(seconds=LEASE_SECONDS))
+        .returning(*columns(GAPRequestDB, GAPRequestClaim))
+    )
+
+
+def renew_stmt(request_id: int, inspector: str, at: datetime):
+    # lease ที่หมดไปแล้วต่อไม่ได้ (อาจมีคนอื่นรับไปแล้ว) ต้อง claim ใหม่
+    return (
+        update(GAPRequestDB)
+        .where(_held_by(request_id, inspector, at))
+        .values(claim_expires_at=at + timedelta(seconds=LEASE_SECONDS))
+        .returning(*columns(GAPRequestDB, GAPRequestClaim))
+    )
+
+
+def release_stmt(request_id: int, inspector: str):
+    return (
+        update(GAPRequestDB)
+        .where(_held_by(request_id, inspector))
+        .values(claimed_by=None, claim_expires_at=None)
+        .returning(*columns(GAPRequestDB, GAPRequestOut))
+    )
+
+
+def sort_claimed(rows) -> list:
+    # RETURNING ไม่รับประกันลำดับ → เรียงตามคิว
+    return sorted((dict(r._mapping) for r in rows), key=lambda r: (r["request_date"], r["request_id"]))
@@ -55,8 +55,9 @@ class PersonalOut(Personal):
 app = FastAPI()
 
 
+# def ธรรมดา (ไม่ใช่ async) → FastAPI รันใน threadpool ไม่บล็อก event loop ระหว่างรอ SQLite
 @app.get("/personals/{personal_id}")
-async def read_personal_by_id(personal_id: int) -> PersonalOut:
+def read_personal_by_id(personal_id: int) -> PersonalOut:
     with Session(engine) as session:
         statement = select(PersonalDB).where(PersonalDB.id == personal_id)
         personal = session.exec(statement).first()